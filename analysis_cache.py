@@ -0,0 +1,154 @@
+import sqlite3
+import hashlib
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = "analysis_cache.db"
+
+DEFAULT_MAX_ENTRIES = 20000
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+DEFAULT_MAX_AGE_DAYS = 30
+EVICT_EVERY = 200  # 每写入多少条检查一次淘汰
+
+
+def _digest(value) -> str:
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """
+    按内容寻址的分阶段缓存 (SQLite)。
+    key = hash(阶段, prompt 版本, 模型名, 各输入的 hash)，每个 Agent 阶段独立缓存，
+    因此只改 JD 时 Agent 1 的提取结果仍可命中。多线程共享同一个连接，用锁串行化。
+    """
+
+    def __init__(self, path: str = CACHE_FILE, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES, max_age_days: float = DEFAULT_MAX_AGE_DAYS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.hits = {}
+        self.misses = {}
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS stage_cache (
+                    key TEXT PRIMARY KEY,
+                    stage TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_stage_cache_accessed ON stage_cache(accessed)")
+        self.evict()
+
+    @staticmethod
+    def make_key(stage: str, prompt_version: str, model_name: str, parts: list) -> str:
+        return _digest([stage, prompt_version, model_name] + [_digest(p) for p in parts])
+
+    def get(self, key: str, stage: str = ""):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM stage_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses[stage] = self.misses.get(stage, 0) + 1
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE stage_cache SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.hits[stage] = self.hits.get(stage, 0) + 1
+        return json.loads(row[0])
+
+    def contains(self, key: str) -> bool:
+        """只检查是否存在，不计入命中率、不更新访问时间 (用于预取前判断哪些需要调用 LLM)"""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM stage_cache WHERE key = ?", (key,)).fetchone() is not None
+
+    def set(self, key: str, stage: str, prompt_version: str, value) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stage_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, stage, prompt_version, payload, len(payload.encode("utf-8")), now, now),
+            )
+            self._writes += 1
+            need_evict = self._writes % EVICT_EVERY == 0
+        if need_evict:
+            self.evict()
+
+    def get_or_compute(self, stage: str, prompt_version: str, model_name: str, parts: list, compute):
+        """
+        命中则直接返回；否则调用 compute()，成功后写入缓存 (compute 的异常不缓存，直接抛出)。
+        写入失败 (例如 database is locked) 只记日志，仍返回已算出的结果，不浪费这次 LLM 调用。
+        """
+        key = self.make_key(stage, prompt_version, model_name, parts)
+        cached = self.get(key, stage)
+        if cached is not None:
+            return cached
+        value = compute()
+        try:
+            self.set(key, stage, prompt_version, value)
+        except Exception as e:
+            logger.warning("分析缓存写入失败 [%s]: %s: %s", stage, type(e).__name__, e)
+        return value
+
+    def evict(self) -> int:
+        """按年龄、条数、总字节数淘汰 (最久未访问的先淘汰)，返回删除条数"""
+        removed = 0
+        with self._lock, self._conn:
+            cutoff = time.time() - self.max_age_days * 86400
+            removed += self._conn.execute("DELETE FROM stage_cache WHERE created < ?", (cutoff,)).rowcount
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM stage_cache").fetchone()
+            if count > self.max_entries or total > self.max_bytes:
+                rows = self._conn.execute("SELECT key, size FROM stage_cache ORDER BY accessed ASC").fetchall()
+                doomed = []
+                for key, size in rows:
+                    if count <= self.max_entries and total <= self.max_bytes:
+                        break
+                    doomed.append((key,))
+                    count -= 1
+                    total -= size
+                self._conn.executemany("DELETE FROM stage_cache WHERE key = ?", doomed)
+                removed += len(doomed)
+        return removed
+
+    def invalidate(self, stage: str = None) -> int:
+        """清空某个阶段 (或全部) 的缓存"""
+        with self._lock, self._conn:
+            if stage is None:
+                return self._conn.execute("DELETE FROM stage_cache").rowcount
+            return self._conn.execute("DELETE FROM stage_cache WHERE stage = ?", (stage,)).rowcount
+
+    def purge_stale_versions(self, prompt_versions: dict) -> int:
+        """删除 prompt 版本已过期的条目。修改 prompt 后只需在 PROMPT_VERSIONS 中升级版本号"""
+        removed = 0
+        with self._lock, self._conn:
+            for stage, version in prompt_versions.items():
+                removed += self._conn.execute(
+                    "DELETE FROM stage_cache WHERE stage = ? AND prompt_version != ?", (stage, version)
+                ).rowcount
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM stage_cache").fetchone()
+            hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        return {
+            "entries": count,
+            "bytes": total,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "by_stage": {s: {"hits": self.hits.get(s, 0), "misses": self.misses.get(s, 0)} for s in sorted(set(self.hits) | set(self.misses))},
+        }
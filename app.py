@@ -1,17 +1,64 @@
+import os
+import time
+import logging
 import streamlit as st
 import pandas as pd
-from utils import configure_ai, extract_text_from_file, analyze_batch_candidate, generate_recruitment_email, send_real_email
+from utils import configure_ai, generate_recruitment_email, draft_emails_batch, send_real_email, default_mode, PROMPT_VERSIONS, PIPELINE_MODES
 # 引入新写的存储管理器
-from preset_manager import load_presets, save_preset, delete_preset
+from preset_manager import load_presets, save_preset, delete_preset, list_preset_versions, restore_preset_version
+from batch_engine import DEFAULT_CONCURRENCY
+from analysis_cache import AnalysisCache
+from job_runner import JobRunner
+from llm_scheduler import get_scheduler, interactive
+from ingest import ingest
+from prescreen import prescreen
+from llm_backend import MockBackend, set_backend
+from pipeline_metrics import summarize, to_jsonl, to_prometheus
+from candidate_store import CandidateStore
+from mailer import BulkMailer, SMTP_HOST, SMTP_PORT, DEFAULT_RATE_PER_MINUTE
+
+# 离线模拟模式：MEDRECRUIT_MOCK_LLM=1 时不调用 Gemini，用于演示和压测
+USE_MOCK_LLM = os.environ.get("MEDRECRUIT_MOCK_LLM") == "1"
+if USE_MOCK_LLM: set_backend(MockBackend())
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
 
 # --- 页面配置 ---
 st.set_page_config(page_title="医学人才智能招聘系统", page_icon="🏥", layout="wide")
 
+# --- 分析缓存 (进程内所有会话共享) ---
+@st.cache_resource
+def get_analysis_cache():
+    cache = AnalysisCache()
+    cache.purge_stale_versions(PROMPT_VERSIONS)
+    return cache
+
+analysis_cache = get_analysis_cache()
+
+# --- 后台分析任务 (进程内所有会话共享一个任务线程) ---
+@st.cache_resource
+def get_job_runner():
+    return JobRunner(cache=analysis_cache)
+
+job_runner = get_job_runner()
+
+def load_job_results(job_id):
+    """把任务结果 (可以是部分结果) 载入本会话的候选人存储"""
+    job = job_runner.get(job_id)
+    st.session_state["candidates"] = CandidateStore(job_runner.results(job_id))
+    st.session_state["drafts"] = {}
+    st.session_state["batch_wall_seconds"] = job["busy_seconds"] or None
+    st.session_state["loaded_job"] = (job_id, job["done"])
+
 # --- Session State 初始化 ---
-if "batch_data" not in st.session_state: st.session_state["batch_data"] = [] 
+# candidates: 本会话的候选人存储 (稳定 ID + 索引)，见 candidate_store.CandidateStore
+if "candidates" not in st.session_state: st.session_state["candidates"] = CandidateStore()
 if "jd_text" not in st.session_state: st.session_state["jd_text"] = ""
 if "must_haves" not in st.session_state: st.session_state["must_haves"] = ""
 if "role_type" not in st.session_state: st.session_state["role_type"] = "🧪 PI / 博士后 (Postdoc)"
+if "drafts" not in st.session_state: st.session_state["drafts"] = {}  # (candidate_id, 发信人) -> 邮件草稿
+# active_job 同时写入 URL (?job=...)，刷新页面或断线重连后仍能找回正在运行的任务
+if "active_job" not in st.session_state: st.session_state["active_job"] = st.query_params.get("job")
 
 # --- CSS 样式 ---
 st.markdown("""
@@ -53,12 +100,85 @@ with st.sidebar:
         if st.button("🗑️ 删除此模板"):
             delete_preset(selected_preset)
             st.rerun()
+
+        with st.expander(f"🕘 历史版本 (当前 v{data.get('version', 1)})"):
+            versions = list_preset_versions(selected_preset)
+            restore_to = st.selectbox("选择版本", [v["version"] for v in versions], format_func=lambda v: f"v{v}")
+            if st.button("恢复到此版本", disabled=restore_to == data.get("version")):
+                restore_preset_version(selected_preset, restore_to)
+                st.rerun()
             
     st.divider()
     
     api_key = st.text_input("Google API Key", type="password")
     if api_key: configure_ai(api_key)
-    st.success(f"当前候选人: {len(st.session_state['batch_data'])}")
+    if USE_MOCK_LLM: st.caption("🧪 离线模拟模式：AI 结果为模拟数据")
+    st.success(f"当前候选人: {len(st.session_state['candidates'])}")
+
+    with st.expander("🧾 后台分析任务"):
+        status_label = {"queued": "⏳", "running": "🔄", "done": "✅", "cancelled": "⏹️", "failed": "❌"}
+        if not job_runner.ready(): st.caption("⚠️ 尚未配置 API Key，排队中的任务会在配置后开始")
+        for job in job_runner.list_jobs(limit=10):
+            j1, j2 = st.columns([3, 1])
+            j1.caption(f"{status_label[job['status']]} {time.strftime('%m-%d %H:%M', time.localtime(job['created']))} {job['label']} ({job['done']}/{job['total']})")
+            if j2.button("查看", key=f"job_{job['job_id']}"):
+                st.session_state["active_job"] = job["job_id"]
+                st.query_params["job"] = job["job_id"]
+                load_job_results(job["job_id"])
+                st.rerun()
+
+    with st.expander("🚦 LLM 调度"):
+        # 所有会话共用同一个调度器；有请求排队或后台任务运行时每 2 秒刷新
+        scheduler = get_scheduler()
+        jobs_busy = any(j["status"] in ("queued", "running") for j in job_runner.list_jobs(limit=10))
+
+        @st.fragment(run_every=2 if jobs_busy else None)
+        def scheduler_status():
+            sched = scheduler.stats()
+            lane_label = {"interactive": "交互 (草稿等)", "bulk": "批量分析"}
+            st.dataframe(
+                pd.DataFrame([
+                    {"通道": lane_label[lane], "排队": s["queued"], "已发出": s["requests"],
+                     "平均等待(s)": round(s["mean_wait"], 2), "最近等待(s)": round(s["recent_wait"], 2), "最长等待(s)": round(s["max_wait"], 2)}
+                    for lane, s in sched["lanes"].items()
+                ]),
+                hide_index=True, use_container_width=True,
+            )
+            st.caption(f"请求余量: {sched['requests_available']:.0f} / {sched['rpm']} RPM" if sched["rpm"] else "请求数: 不限")
+            st.caption(f"Token 余量: {sched['tokens_available']:.0f} / {sched['tpm']} TPM" if sched["tpm"] else "Token 数: 不限")
+        scheduler_status()
+
+    with st.expander("🗄️ 分析缓存"):
+        cache_stats = analysis_cache.stats()
+        st.caption(f"条目: {cache_stats['entries']} | 占用: {cache_stats['bytes'] / 1024:.0f} KB")
+        st.caption(f"命中: {cache_stats['hits']} | 未命中: {cache_stats['misses']} | 命中率: {cache_stats['hit_rate']:.0%}")
+        if st.button("清空缓存"):
+            analysis_cache.invalidate()
+            st.rerun()
+
+    if st.session_state["candidates"]:
+        with st.expander("📈 流水线指标"):
+            # 指标和导出文件由全部记录派生，按 store.version 缓存，普通重跑不再重新计算
+            metrics_store = st.session_state["candidates"]
+            wall_seconds = st.session_state.get("batch_wall_seconds")
+            summary = metrics_store.memo(("metrics", wall_seconds), lambda: summarize(metrics_store.records(), wall_seconds))
+            m1, m2 = st.columns(2)
+            m1.metric("吞吐 (人/分钟)", f"{summary['throughput_per_min']:.1f}" if summary["throughput_per_min"] else "N/A")
+            m2.metric("错误率", f"{summary['error_rate']:.0%}")
+            st.caption(f"最慢阶段: {summary['slowest_stage'] or 'N/A'}")
+            st.dataframe(
+                pd.DataFrame([
+                    {"阶段": name, "次数": s["count"], "平均(s)": round(s["mean"], 2), "P95(s)": round(s["p95"], 2),
+                     "重试": s["retries"], "失败": s["errors"], "缓存命中": s["cache_hits"],
+                     "JSON 修复": s["json_repairs"], "补请求字段": s["refetched_fields"], "仍无效字段": s["schema_errors"]}
+                    for name, s in summary["stages"].items()
+                ]),
+                hide_index=True, use_container_width=True,
+            )
+            for reason, n in summary["failure_reasons"].items():
+                st.caption(f"❌ {reason} × {n}")
+            st.download_button("导出 JSONL", metrics_store.memo("metrics_jsonl", lambda: to_jsonl(metrics_store.records())), file_name="pipeline_metrics.jsonl")
+            st.download_button("导出 Prometheus", metrics_store.memo(("metrics_prom", wall_seconds), lambda: to_prometheus(summary)), file_name="medrecruit.prom")
 
 # =========================================================
 # 视图 1: 评估仪表盘
@@ -97,124 +217,221 @@ if page == "📊 人才评估仪表盘":
 
         with c2:
             st.write("批量上传简历")
-            files = st.file_uploader("支持 PDF / Word", accept_multiple_files=True, label_visibility="collapsed")
+            files = st.file_uploader("支持 PDF / Word / ZIP 压缩包", accept_multiple_files=True, label_visibility="collapsed")
+            server_dir = st.text_input("或服务器目录 (递归读取其中的简历)", placeholder="/data/resumes/2024-spring")
+            concurrency = st.slider("并发分析数", 1, 16, DEFAULT_CONCURRENCY, help="同时分析的简历数量，遇到限流 (429) 时可调低")
+            pipeline_mode = st.radio("分析模式", list(PIPELINE_MODES), format_func=PIPELINE_MODES.get, horizontal=True,
+                                     index=list(PIPELINE_MODES).index(default_mode(st.session_state["role_type"])),
+                                     help="快速模式把风控与决策合并为一次调用，输出字段相同；各赛道默认值见 utils.DEFAULT_PIPELINE_MODE")
+            packed = st.checkbox("📦 短简历打包提取", help="把多份短简历合并为一次 Agent 1 请求 (适合 RA / 行政)，校验不通过的简历自动单独提取")
+            with st.expander("🧭 多岗位匹配 (一份简历对多个已保存模板打分)"):
+                multi_presets = st.multiselect("参与匹配的岗位模板", list(presets), help="留空则只按上方 JD 分析。Agent 1 每份简历只提取一次")
+            with st.expander("🔎 本地初筛 (不调用 AI，先剔除明显不匹配的简历)"):
+                prescreen_mode = st.radio("初筛策略", ["全部分析", "只分析前 K 名", "初筛分阈值"], horizontal=True)
+                prescreen_top_k = st.number_input("K", min_value=1, value=50, step=10, disabled=prescreen_mode != "只分析前 K 名")
+                prescreen_threshold = st.slider("初筛分阈值 (本批最高分 = 100)", 0, 100, 30, disabled=prescreen_mode != "初筛分阈值")
             if st.button("开始 AI 智能分析 🚀", use_container_width=True):
-                if api_key and files:
-                    st.session_state["batch_data"] = []
-                    bar = st.progress(0)
-                    for i, f in enumerate(files):
-                        with st.spinner(f"正在分析 {f.name}..."):
-                            # 注意：这里传入的是 st.session_state 里的值
-                            res = analyze_batch_candidate(extract_text_from_file(f), st.session_state["jd_text"], st.session_state["must_haves"], st.session_state["role_type"])
-                            res['file_name'] = f.name
-                            res['role_type'] = st.session_state["role_type"]
-                            st.session_state["batch_data"].append(res)
-                        bar.progress((i+1)/len(files))
+                sources = list(files or [])
+                if server_dir:
+                    if os.path.isdir(server_dir):
+                        sources.append(server_dir)
+                    else:
+                        st.error(f"目录不存在: {server_dir}")
+                if (api_key or USE_MOCK_LLM) and sources:
+                    st.session_state["candidates"] = CandidateStore()
+                    st.session_state["drafts"] = {}
+                    # 注意：这里传入的是 st.session_state 里的值 (工作线程中不能访问 session_state)
+                    jd_text, must_haves, role_type = st.session_state["jd_text"], st.session_state["must_haves"], st.session_state["role_type"]
+                    match_presets = {name: {k: presets[name][k] for k in ("jd", "must_haves", "role_type")} for name in multi_presets}
+                    if match_presets:
+                        # 多岗位模式下初筛按所有模板的 JD 合并打分
+                        jd_text = "\n".join(p["jd"] for p in match_presets.values())
+                        must_haves = ", ".join(p["must_haves"] for p in match_presets.values() if p["must_haves"])
+                        role_type = f"🧭 多岗位匹配 ({len(match_presets)} 个模板)"
+                    # 1) 逐个读取 (ZIP / 目录流式展开) -> 去重 -> 多进程解析；重复和解析失败的文件单独报告，不送入 LLM
+                    bar = st.progress(0, text="正在解析简历...")
+                    extracted, failed, duplicates = [], [], []
+                    for rec in ingest(sources):
+                        if rec["status"] == "ok":
+                            extracted.append({"file_name": rec["file_name"], "text": rec["text"], "seconds": rec["extraction"]["seconds"]})
+                        elif rec["status"] in ("duplicate", "near_duplicate"):
+                            duplicates.append({"文件": rec["file_name"], "类型": "完全相同" if rec["status"] == "duplicate" else "内容近似",
+                                               "重复于": rec["duplicate_of"], "相似度": rec["similarity"]})
+                        else:
+                            failed.append({"file_name": rec["file_name"], "error": rec["extraction"]["error"] if rec["extraction"] else "文件超过大小上限"})
+                        # 流式导入时总数未知，只更新文字
+                        bar.progress(0, text=f"已读取 {len(extracted) + len(failed) + len(duplicates)} 份 (重复 {len(duplicates)}): {rec['file_name']}")
+                    st.session_state["extract_errors"] = failed
+                    st.session_state["duplicates"] = duplicates
+
+                    # 2) BM25 本地初筛，未入选的简历不调用 LLM
+                    screen = prescreen(
+                        [r["text"] for r in extracted], jd_text, must_haves,
+                        top_k=int(prescreen_top_k) if prescreen_mode == "只分析前 K 名" else None,
+                        threshold=prescreen_threshold if prescreen_mode == "初筛分阈值" else None,
+                    )
+                    for r, sc in zip(extracted, screen):
+                        r["prescreen"] = sc
+                    st.session_state["prescreen_skipped"] = [
+                        {"文件": r["file_name"], "初筛分": r["prescreen"]["score"], "命中硬性要求": f"{len(r['prescreen']['must_have_hits'])}/{r['prescreen']['must_have_total']}"}
+                        for r in extracted if not r["prescreen"]["selected"]
+                    ]
+                    extracted = [r for r in extracted if r["prescreen"]["selected"]]
+
+                    # 3) 提交后台任务：分析在任务线程中进行，页面可以关闭或刷新
+                    job_id = job_runner.submit(
+                        [{"file_name": r["file_name"], "text": r["text"], "prescreen_score": r["prescreen"]["score"], "seconds": r["seconds"]} for r in extracted],
+                        jd_text, must_haves, role_type, concurrency=concurrency, packed=packed, presets=match_presets, mode=pipeline_mode,
+                    )
+                    st.session_state["active_job"] = job_id
+                    st.query_params["job"] = job_id
                     st.rerun()
 
-    if st.session_state["batch_data"]:
-        # --- 2. 候选人排行榜 ---
-        with st.container():
-            current_role = st.session_state["role_type"]
-            st.subheader(f"候选人排行榜: {current_role}")
-            
-            table_data = []
-            for c in st.session_state["batch_data"]:
-                row = {
-                    "姓名": c.get('name'),
-                    "AI 匹配度": c.get('fit_score'),
-                }
-                
-                # 根据角色显示不同列
-                if "PI" in current_role or "Postdoc" in current_role:
-                    bib = c.get('bibliometrics', {})
-                    row["H指数"] = bib.get('h_index', 'N/A')
-                    row["引用数"] = bib.get('total_citations', 'N/A')
-                    row["研究方向"] = c.get('research_focus_area', 'N/A')
-                    
-                elif "科研助理" in current_role: # RA
-                    row["实验室经验(年)"] = c.get('lab_experience_years', 'N/A')
-                    skills = c.get('technical_skills', [])
-                    row["核心技能"] = ", ".join(skills[:3]) if skills else "N/A"
-                    
-                else: # Admin
-                    row["工作年限"] = c.get('years_experience', 'N/A')
-                    row["核心能力"] = c.get('core_competencies', [""])[0]
-
-                table_data.append(row)
-            
-            df = pd.DataFrame(table_data).sort_values(by="AI 匹配度", ascending=False)
-            
-            st.dataframe(
-                df, 
-                use_container_width=True, 
-                hide_index=True, 
-                column_config={
-                    "AI 匹配度": st.column_config.ProgressColumn("匹配度", format="%d", min_value=0, max_value=100),
-                }
-            )
+            if st.session_state.get("active_job") and job_runner.get(st.session_state["active_job"]):
+                active = job_runner.get(st.session_state["active_job"])["status"] in ("queued", "running")
+
+                # 任务未结束时每 2 秒刷新进度
+                @st.fragment(run_every=2 if active else None)
+                def job_status():
+                    job_id = st.session_state["active_job"]
+                    job = job_runner.get(job_id)
+                    if job["status"] == "queued":
+                        st.info(f"⏳ 任务排队中，前面还有 {job_runner.queue_position(job_id)} 个任务")
+                    elif job["status"] == "running":
+                        st.progress(job["done"] / max(1, job["total"]), text=f"后台分析中 {job['done']}/{job['total']} (失败 {job['failed']})")
+                    else:
+                        status_label = {"done": "✅ 已完成", "cancelled": "⏹️ 已取消", "failed": "❌ 任务失败"}[job["status"]]
+                        st.caption(f"{status_label}: {job['done']}/{job['total']} (失败 {job['failed']}) {job['error'] or ''}")
+                    if job["status"] == "done" and st.session_state.get("loaded_job") != (job_id, job["done"]):
+                        load_job_results(job_id)
+                        st.rerun()
+                    b1, b2 = st.columns(2)
+                    if job["status"] in ("queued", "running"):
+                        if b1.button("载入已完成部分", disabled=not job["done"]):
+                            load_job_results(job_id)
+                            st.rerun()
+                        if b2.button("取消任务"):
+                            job_runner.cancel(job_id)
+                            st.rerun()
+                    elif job["failed"] or job["done"] < job["total"]:
+                        if b1.button(f"重试未完成的 {job['total'] - job['done'] + job['failed']} 份"):
+                            job_runner.retry_failed(job_id)
+                            st.rerun()
+                job_status()
+
+            if st.session_state.get("extract_errors"):
+                with st.expander(f"⚠️ {len(st.session_state['extract_errors'])} 份简历解析失败 (未参与分析)"):
+                    for r in st.session_state["extract_errors"]:
+                        st.caption(f"{r['file_name']}: {r['error']}")
+            if st.session_state.get("duplicates"):
+                with st.expander(f"♻️ {len(st.session_state['duplicates'])} 份重复简历 (未调用 AI)"):
+                    st.dataframe(pd.DataFrame(st.session_state["duplicates"]), hide_index=True, use_container_width=True)
+            if st.session_state.get("prescreen_skipped"):
+                with st.expander(f"🔎 {len(st.session_state['prescreen_skipped'])} 份简历未通过初筛 (未调用 AI)"):
+                    st.dataframe(pd.DataFrame(st.session_state["prescreen_skipped"]).sort_values(by="初筛分", ascending=False), hide_index=True, use_container_width=True)
+
+    store = st.session_state["candidates"]
+    if store:
+        # 排行榜和深度画像放在同一个 fragment：筛选、翻页、选人只重跑这一块，上传区和任务区不重跑
+        @st.fragment
+        def candidate_board():
+            store = st.session_state["candidates"]
+            # --- 2. 候选人排行榜 ---
+            with st.container():
+                current_role = st.session_state["role_type"]
+                st.subheader(f"候选人排行榜: {current_role}")
+
+                # 排行榜按 (store.version, 赛道) 缓存，只有过滤和分页在每次重跑时执行
+                f1, f2, f3 = st.columns([2, 2, 1])
+                with f1: name_filter = st.text_input("按姓名筛选", placeholder="输入姓名关键词")
+                with f2: min_score = st.slider("最低匹配度", 0, 100, 0)
+                page_size = 50
+                _, total_rows = store.leaderboard_page(current_role, name_filter, min_score, page=1, page_size=page_size)
+                with f3: page_no = st.number_input("页码", min_value=1, max_value=max(1, -(-total_rows // page_size)), value=1)
+                df, total_rows = store.leaderboard_page(current_role, name_filter, min_score, page=page_no, page_size=page_size)
+                st.caption(f"共 {total_rows} 人，每页 {page_size} 人")
+
+                st.dataframe(
+                    df, 
+                    use_container_width=True, 
+                    hide_index=True, 
+                    column_config={
+                        "ID": None,
+                        "AI 匹配度": st.column_config.ProgressColumn("匹配度", format="%d", min_value=0, max_value=100),
+                        "初筛分": st.column_config.NumberColumn("初筛分", format="%.1f", help="本地 BM25 初筛得分，本批最高分 = 100"),
+                    }
+                )
         
-        # --- 3. 深度画像卡片 ---
-        st.subheader("🔍 候选人深度画像")
-        sel = st.selectbox("选择候选人查看详情", df['姓名'].tolist())
-        cand = next(c for c in st.session_state["batch_data"] if c.get('name') == sel)
+            matrix = store.preset_matrix()
+            if not matrix.empty:
+                with st.expander(f"🧭 多岗位匹配矩阵 ({len(matrix.columns) - 4} 个岗位)", expanded=True):
+                    st.dataframe(matrix, hide_index=True, use_container_width=True, column_config={"ID": None})
+                    st.caption("单元格为该岗位的 AI 匹配度；深度画像展示的是最佳岗位的评估")
+
+            # --- 3. 深度画像卡片 ---
+            st.subheader("🔍 候选人深度画像")
+            # 按 ID 选择，重名候选人也能区分；详情查找是 O(1)
+            sel = st.selectbox("选择候选人查看详情", df["ID"].tolist() or store.ranked_ids(), format_func=store.label)
+            cand = store.get(sel)
         
-        # A. 头部信息
-        with st.container():
-            c1, c2 = st.columns([3, 1])
-            with c1:
-                lang_tag = "🇨🇳 中文" if cand.get('language_preference') == 'Chinese' else "🇬🇧 English"
-                st.markdown(f"## {cand.get('name')} <span style='font-size:0.5em; background:#eee; padding:5px; border-radius:5px'>{lang_tag}</span>", unsafe_allow_html=True)
-                st.caption(f"邮箱: {cand.get('email')} | 赛道: {current_role}")
-            with c2:
-                st.metric("最终匹配得分", cand.get('fit_score'))
-
-        # B. 角色专属指标
-        if "PI" in current_role or "Postdoc" in current_role:
+            # A. 头部信息
             with st.container():
-                st.markdown("#### 📚 学术指标 (Bibliometrics)")
-                bib = cand.get('bibliometrics', {})
-                m1, m2, m3, m4 = st.columns(4)
-                with m1: st.markdown(f"<div class='metric-card'><div class='metric-val'>{bib.get('h_index', 'N/A')}</div><div class='metric-lbl'>H-Index</div></div>", unsafe_allow_html=True)
-                with m2: st.markdown(f"<div class='metric-card'><div class='metric-val'>{bib.get('total_citations', 'N/A')}</div><div class='metric-lbl'>引用数</div></div>", unsafe_allow_html=True)
-                with m3: st.markdown(f"<div class='metric-card'><div class='metric-val'>{bib.get('total_paper_count', 'N/A')}</div><div class='metric-lbl'>论文总数</div></div>", unsafe_allow_html=True)
-                with m4: st.markdown(f"<div class='metric-card'><div class='metric-val'>{len(cand.get('grants_found', []))}</div><div class='metric-lbl'>基金项目</div></div>", unsafe_allow_html=True)
+                c1, c2 = st.columns([3, 1])
+                with c1:
+                    lang_tag = "🇨🇳 中文" if cand.get('language_preference') == 'Chinese' else "🇬🇧 English"
+                    st.markdown(f"## {cand.get('name')} <span style='font-size:0.5em; background:#eee; padding:5px; border-radius:5px'>{lang_tag}</span>", unsafe_allow_html=True)
+                    st.caption(f"邮箱: {cand.get('email')} | 赛道: {current_role}")
+                with c2:
+                    st.metric("最终匹配得分", cand.get('fit_score'))
+
+            # B. 角色专属指标
+            if "PI" in current_role or "Postdoc" in current_role:
+                with st.container():
+                    st.markdown("#### 📚 学术指标 (Bibliometrics)")
+                    bib = cand.get('bibliometrics', {})
+                    m1, m2, m3, m4 = st.columns(4)
+                    with m1: st.markdown(f"<div class='metric-card'><div class='metric-val'>{bib.get('h_index', 'N/A')}</div><div class='metric-lbl'>H-Index</div></div>", unsafe_allow_html=True)
+                    with m2: st.markdown(f"<div class='metric-card'><div class='metric-val'>{bib.get('total_citations', 'N/A')}</div><div class='metric-lbl'>引用数</div></div>", unsafe_allow_html=True)
+                    with m3: st.markdown(f"<div class='metric-card'><div class='metric-val'>{bib.get('total_paper_count', 'N/A')}</div><div class='metric-lbl'>论文总数</div></div>", unsafe_allow_html=True)
+                    with m4: st.markdown(f"<div class='metric-card'><div class='metric-val'>{len(cand.get('grants_found', []))}</div><div class='metric-lbl'>基金项目</div></div>", unsafe_allow_html=True)
                 
-                st.write("")
-                st.info(f"**研究方向:** {cand.get('research_focus_area', '未识别')}")
-                st.markdown("##### ⭐ 代表作")
-                for p in cand.get('representative_papers', []):
-                    st.markdown(f"- **{p.get('title')}** ({p.get('journal')}) - *{p.get('significance')}*")
-
-        elif "科研助理" in current_role:
-             with st.container():
-                st.markdown("#### 🧬 技术栈与经验")
-                m1, m2 = st.columns(2)
-                with m1: st.markdown(f"<div class='metric-card'><div class='metric-val'>{cand.get('lab_experience_years', 'N/A')}</div><div class='metric-lbl'>实验室经验 (年)</div></div>", unsafe_allow_html=True)
-                with m2: st.markdown(f"<div class='metric-card'><div class='metric-val'>{len(cand.get('project_participation', []))}</div><div class='metric-lbl'>参与项目数</div></div>", unsafe_allow_html=True)
+                    st.write("")
+                    st.info(f"**研究方向:** {cand.get('research_focus_area', '未识别')}")
+                    st.markdown("##### ⭐ 代表作")
+                    for p in cand.get('representative_papers', []):
+                        st.markdown(f"- **{p.get('title')}** ({p.get('journal')}) - *{p.get('significance')}*")
+
+            elif "科研助理" in current_role:
+                 with st.container():
+                    st.markdown("#### 🧬 技术栈与经验")
+                    m1, m2 = st.columns(2)
+                    with m1: st.markdown(f"<div class='metric-card'><div class='metric-val'>{cand.get('lab_experience_years', 'N/A')}</div><div class='metric-lbl'>实验室经验 (年)</div></div>", unsafe_allow_html=True)
+                    with m2: st.markdown(f"<div class='metric-card'><div class='metric-val'>{len(cand.get('project_participation', []))}</div><div class='metric-lbl'>参与项目数</div></div>", unsafe_allow_html=True)
                 
-                st.write("")
-                st.markdown("##### 🛠️ 技能标签")
-                skills_html = ""
-                for skill in cand.get('technical_skills', []):
-                    skills_html += f"<span class='skill-tag'>{skill}</span>"
-                st.markdown(skills_html, unsafe_allow_html=True)
-
-        # C. 总结与风控
-        with st.container():
-            c1, c2 = st.columns([2, 1])
-            with c1:
-                st.markdown("#### 📝 AI 综合评价")
-                st.write(cand.get('summary'))
-                st.markdown("**✅ 核心优势**")
-                for s in cand.get('strengths', []): st.info(s, icon="✅")
-            with c2:
-                st.markdown("#### ⚠️ 风险预警 (Agent 2)")
-                critique = cand.get('critique_notes', '无明显风险')
-                if "未发现" in critique or "No major" in critique:
-                    st.success("简历通过风控筛查")
-                else:
-                    st.error(critique)
+                    st.write("")
+                    st.markdown("##### 🛠️ 技能标签")
+                    skills_html = ""
+                    for skill in cand.get('technical_skills', []):
+                        skills_html += f"<span class='skill-tag'>{skill}</span>"
+                    st.markdown(skills_html, unsafe_allow_html=True)
+
+            # C. 总结与风控
+            with st.container():
+                c1, c2 = st.columns([2, 1])
+                with c1:
+                    st.markdown("#### 📝 AI 综合评价")
+                    st.write(cand.get('summary'))
+                    st.markdown("**✅ 核心优势**")
+                    for s in cand.get('strengths', []): st.info(s, icon="✅")
+                with c2:
+                    st.markdown("#### ⚠️ 风险预警 (Agent 2)")
+                    critique = str(cand.get('critique_notes') or '').strip()
+                    # 空值 (决策输出没有给出风险点) 也视为未发现风险
+                    if not critique or any(k in critique for k in ("无明显风险", "未发现", "No major")):
+                        st.success("简历通过风控筛查")
+                    else:
+                        st.error(critique)
+        candidate_board()
 
 # =========================================================
 # 视图 2: 智能邀约
@@ -232,33 +449,108 @@ elif page == "📧 智能邀约助手":
         with st.expander("🔐 邮箱 SMTP 设置 (发送真实邮件需配置)"):
             sender_email = st.text_input("邮箱地址")
             sender_password = st.text_input("应用专用密码 (App Password)", type="password")
+            s1, s2, s3 = st.columns([2, 1, 1])
+            with s1: smtp_host = st.text_input("SMTP 服务器", value=SMTP_HOST)
+            with s2: smtp_port = int(st.number_input("端口", min_value=1, max_value=65535, value=SMTP_PORT))
+            with s3: smtp_tls = st.checkbox("STARTTLS", value=True, help="本地测试服务器可关闭")
 
-    if st.session_state["batch_data"]:
-        with st.container():
-            st.subheader("✉️ 生成邮件草稿")
-            names = [c.get('name') for c in st.session_state["batch_data"]]
-            sel = st.selectbox("选择候选人", names)
-            cand = next(c for c in st.session_state["batch_data"] if c.get('name') == sel)
+    store = st.session_state["candidates"]
+    if store:
+        sender_info = {"name": sender_name, "title": sender_title, "org": sender_org}
+        draft_key = lambda cid: (cid, sender_name, sender_title, sender_org)
+
+        # 选人、生成和编辑单封草稿只重跑这一块 (发信人配置改变时整页重跑)
+        @st.fragment
+        def single_draft():
+            with st.container():
+                st.subheader("✉️ 生成邮件草稿")
+                sel = st.selectbox("选择候选人", store.ranked_ids(), format_func=store.label)
+                cand = store.get(sel)
             
-            # 显示检测到的语言
-            lang = cand.get('language_preference', 'English')
-            st.caption(f"检测到候选人语言偏好: {lang} -> 将生成对应语言邮件")
+                # 显示检测到的语言
+                lang = cand.get('language_preference', 'English')
+                st.caption(f"检测到候选人语言偏好: {lang} -> 将生成对应语言邮件")
             
-            if st.button("✨ 智能生成草稿"):
-                with st.spinner("AI 正在根据简历细节撰写邮件..."):
-                    sender_info = {"name": sender_name, "title": sender_title, "org": sender_org}
-                    st.session_state['draft'] = generate_recruitment_email(cand, sender_info, cand.get('role_type', 'Role'))
+                if st.button("✨ 智能生成草稿"):
+                    # 有人在等的单封草稿走 interactive 通道，排在后台批量分析之前
+                    with st.spinner("AI 正在根据简历细节撰写邮件..."), interactive():
+                        st.session_state["drafts"][draft_key(sel)] = generate_recruitment_email(cand, sender_info, cand.get('role_type', 'Role'), cache=analysis_cache)
             
-            if 'draft' in st.session_state:
-                subj = st.text_input("邮件主题", value=f"Job Opportunity at {sender_org}")
-                recip = st.text_input("收件人邮箱", value=cand.get('email', ''))
-                body = st.text_area("邮件正文", st.session_state['draft'], height=350)
+                if draft_key(sel) in st.session_state["drafts"]:
+                    subj = st.text_input("邮件主题", value=f"Job Opportunity at {sender_org}")
+                    recip = st.text_input("收件人邮箱", value=cand.get('email', ''))
+                    body = st.text_area("邮件正文", st.session_state["drafts"][draft_key(sel)], height=350)
                 
-                if st.button("发送邮件 🚀", type="primary"):
-                    if not sender_email or not sender_password:
-                        st.error("请先在上方配置 SMTP 邮箱密码")
-                    else:
-                        ok, msg = send_real_email(sender_email, sender_password, recip, subj, body)
-                        if ok: st.success(f"邮件已发送给 {cand.get('name')}!")
-                        else: st.error(msg)
+                    if st.button("发送邮件 🚀", type="primary"):
+                        if not sender_email or (smtp_tls and not sender_password):
+                            st.error("请先在上方配置 SMTP 邮箱密码")
+                        else:
+                            ok, msg = send_real_email(sender_email, sender_password, recip, subj, body, host=smtp_host, port=smtp_port, use_tls=smtp_tls)
+                            if ok: st.success(f"邮件已发送给 {cand.get('name')}!")
+                            else: st.error(msg)
+        single_draft()
+
+        # --- 批量发送：后台队列 + 单连接复用 + 限速 ---
+        with st.container():
+            st.subheader("📨 批量发送 (短名单)")
+            shortlist = st.multiselect(
+                "选择候选人 (仅显示有邮箱的候选人)",
+                [cid for cid in store.ranked_ids() if store.get(cid).get('email')],
+                format_func=lambda cid: f"{store.get(cid).get('name')} <{store.get(cid).get('email')}>",
+            )
+            bulk_subj = st.text_input("批量邮件主题", value=f"Job Opportunity at {sender_org}")
+            bulk_body = st.text_area("邮件模板 ({name} 会替换为候选人姓名)", height=200, value=(
+                f"Dear {{name}},\n\nWe were impressed by your background and would like to invite you to a 15-minute call next week.\n\n"
+                f"Best regards,\n{sender_name}\n{sender_title}, {sender_org}"))
+            rate = st.number_input("发送速率 (封/分钟)", min_value=1, max_value=600, value=DEFAULT_RATE_PER_MINUTE)
+
+            # 并发为短名单生成个性化草稿；已生成的草稿优先于上面的模板
+            missing = [cid for cid in shortlist if draft_key(cid) not in st.session_state["drafts"]]
+            st.caption(f"已有个性化草稿: {len(shortlist) - len(missing)} / {len(shortlist)}")
+            if st.button("✨ 批量生成个性化草稿", disabled=not missing):
+                bar = st.progress(0, text=f"正在并发生成 {len(missing)} 封草稿...")
+                # 用户在页面上等待结果，和单封草稿一样走 interactive 通道 (run_batch 的工作线程沿用该通道)
+                with interactive():
+                    drafts = draft_emails_batch(
+                        [store.get(cid) for cid in missing], sender_info, cache=analysis_cache,
+                        on_done=lambda i, res, done, total: bar.progress(done / total, text=f"已完成 {done}/{total}"),
+                    )
+                for cid, d in zip(missing, drafts):
+                    if d["draft"]: st.session_state["drafts"][draft_key(cid)] = d["draft"]
+                    else: st.warning(f"{store.get(cid).get('name')}: 草稿生成失败 ({d['error']})")
+                if all(d["draft"] for d in drafts): st.rerun()
+
+            resend = st.checkbox("重新发送给已发送过的候选人", value=False)
+            if st.button("加入发送队列 📨", disabled=not shortlist):
+                if not sender_email or (smtp_tls and not sender_password):
+                    st.error("请先在上方配置 SMTP 邮箱密码")
+                else:
+                    config = (sender_email, sender_password, smtp_host, smtp_port, smtp_tls, rate)
+                    if "bulk_mailer" not in st.session_state:
+                        st.session_state["bulk_mailer"] = BulkMailer(sender_email, sender_password, smtp_host, smtp_port, smtp_tls, rate_per_minute=rate)
+                    elif st.session_state.get("bulk_mailer_config") != config:
+                        # 原地更换配置：队列中和重试中的邮件不丢失，发送中的收件人也不会被重复加入
+                        st.session_state["bulk_mailer"].reconfigure(sender_email, sender_password, smtp_host, smtp_port, smtp_tls, rate_per_minute=rate)
+                    st.session_state["bulk_mailer_config"] = config
+                    skipped = 0
+                    for cid in shortlist:
+                        c = store.get(cid)
+                        body_text = st.session_state["drafts"].get(draft_key(cid)) or bulk_body.replace("{name}", str(c.get('name', '')))
+                        if not st.session_state["bulk_mailer"].enqueue(cid, c.get('email'), bulk_subj, body_text, resend=resend):
+                            skipped += 1
+                    if skipped:
+                        st.info(f"{skipped} 位候选人已在队列中或已发送，未重复加入")
+
+            if "bulk_mailer" in st.session_state:
+                # 队列未清空时每 2 秒自动刷新
+                @st.fragment(run_every=2 if st.session_state["bulk_mailer"].pending() else None)
+                def bulk_status():
+                    # 只刷新这一块，不重跑整页
+                    mailer = st.session_state["bulk_mailer"]
+                    status_label = {"queued": "⏳ 排队中", "sending": "📤 发送中", "retrying": "🔁 重试中", "sent": "✅ 已发送", "failed": "❌ 失败"}
+                    rows = [{"姓名": (store.get(s["key"]) or {}).get('name'), "邮箱": s["recipient"], "状态": status_label[s["status"]],
+                             "尝试次数": s["attempts"], "错误": s["error"] or ""} for s in mailer.snapshot()]
+                    st.caption(f"待发送: {mailer.pending()} / 共 {len(rows)}")
+                    st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+                bulk_status()
 
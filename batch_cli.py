@@ -0,0 +1,276 @@
+"""
+命令行批量筛选 (无需 Streamlit)，适合夜间定时任务：
+
+    python batch_cli.py /data/inbox --preset "肿瘤免疫博士后" -o results/postdoc.jsonl --workers 4
+    python batch_cli.py /data/inbox.zip --jd-file jd.txt --must-haves "海外博士" --role-type "🧬 科研助理 (RA)" -o ra.csv --mode fast
+
+目录 (或 ZIP) 中的简历逐个解析、去重，再分发到多个进程分析，每完成一份立即追加到输出文件
+(.jsonl / .csv / .parquet，按扩展名选择)；重复和无法解析的文件也各记一行 (status 列)。
+再次对同一目录运行时，输出文件中已有的文件 (按内容 sha256 判断) 会被跳过，只处理新文件；
+上次 AI 分析失败的文件会重新分析并追加新的一行。
+API Key 从环境变量 GOOGLE_API_KEY 读取；设置 MEDRECRUIT_MOCK_LLM=1 时使用离线模拟后端。
+请求限额 (MEDRECRUIT_LLM_RPM / MEDRECRUIT_LLM_TPM) 由各工作进程平分。
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from analysis_cache import CACHE_FILE, AnalysisCache
+from batch_engine import DEFAULT_CONCURRENCY
+from ingest import ingest
+from llm_backend import MockBackend, get_backend, set_backend
+from llm_scheduler import DEFAULT_RPM, DEFAULT_TPM, LLMScheduler, set_scheduler
+from pipeline_metrics import attach_span, summarize
+from preset_manager import load_presets
+from utils import configure_ai, analyze_batch_candidate, default_mode, PROMPT_VERSIONS, PIPELINE_MODES
+
+ROLE_TYPES = ["🧪 PI / 博士后 (Postdoc)", "🧬 科研助理 (RA)", "💼 行政管理 (Admin)"]
+# CSV / Parquet 的固定列，完整结果 (含赛道专属字段和 metrics) 序列化在 result_json 中。
+# status: analyzed / duplicate / near_duplicate / error / too_large，重复和解析失败的文件也写一行，下次运行不再处理
+# backend: 分析所用的模型 (模拟后端为 "mock")
+FLAT_FIELDS = ["file_name", "sha256", "status", "duplicate_of", "name", "email", "fit_score", "role_type", "summary", "critique_notes", "backend", "result_json"]
+
+_worker = {"cache": None}
+
+
+# --- 工作进程 ---
+def _init_worker(api_key, cache_path, mock, workers):
+    # 调度器是进程级的，各工作进程平分同一个 API Key 的限额
+    share = lambda limit: max(1, limit // workers) if limit else 0
+    set_scheduler(LLMScheduler(share(DEFAULT_RPM), share(DEFAULT_TPM)))
+    if mock:
+        set_backend(MockBackend())
+    configure_ai(api_key)
+    if cache_path:
+        _worker["cache"] = AnalysisCache(cache_path)
+
+
+def _analyze(text, jd, must_haves, role_type, mode):
+    try:
+        return analyze_batch_candidate(text, jd, must_haves, role_type, cache=_worker["cache"], mode=mode)
+    except Exception as e:
+        return {"name": "Error", "fit_score": 0, "summary": f"AI Error: {type(e).__name__}: {e}"}
+
+
+# --- 输出 ---
+def flat_row(record: dict) -> dict:
+    row = {k: record.get(k) for k in FLAT_FIELDS[:-1]}
+    row["result_json"] = json.dumps(record, ensure_ascii=False)
+    return row
+
+
+def _row_backend(row: dict):
+    if row.get("backend"):
+        return row["backend"]
+    try:  # 旧 CSV 没有 backend 列，从完整结果中取
+        return json.loads(row.get("result_json") or "{}").get("backend")
+    except ValueError:
+        return None
+
+
+def read_processed(path: str, mock: bool = False) -> set:
+    """
+    输出文件中已处理的 sha256 (AI 分析失败的记录不算，下次会重试)。
+    非模拟模式下模拟后端写出的记录也不算，避免演示数据挡住真实分析。
+    """
+    if not os.path.exists(path):
+        return set()
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".jsonl":
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    elif ext == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        import pyarrow.parquet as pq
+        columns = [c for c in ("sha256", "name", "backend", "result_json") if c in pq.read_schema(path).names]
+        rows = pq.read_table(path, columns=columns).to_pylist()
+    return {r["sha256"] for r in rows
+            if r.get("sha256") and r.get("name") != "Error" and (mock or _row_backend(r) != MockBackend.model_name)}
+
+
+class ResultWriter:
+    """按扩展名写 JSONL / CSV / Parquet，逐条追加并及时落盘"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.ext = os.path.splitext(path)[1].lower()
+        if self.ext not in (".jsonl", ".csv", ".parquet"):
+            raise ValueError(f"不支持的输出格式: {self.ext} (可用 .jsonl / .csv / .parquet)")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if self.ext == ".parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            # Parquet 不能原地追加：先把旧文件的行写进新文件，再逐批写入新结果
+            self._pa = pa
+            self._schema = pa.schema([(k, pa.float64() if k == "fit_score" else pa.string()) for k in FLAT_FIELDS])
+            existing = pq.read_table(path) if os.path.exists(path) else None
+            if existing is not None:  # 旧文件缺少的列补空值
+                for field in self._schema:
+                    if field.name not in existing.column_names:
+                        existing = existing.append_column(field.name, pa.nulls(existing.num_rows, field.type))
+                existing = existing.select(FLAT_FIELDS).cast(self._schema)
+            self._tmp = path + ".tmp"
+            self._writer = pq.ParquetWriter(self._tmp, self._schema)
+            if existing is not None:
+                self._writer.write_table(existing)
+            self._buffer = []
+        else:
+            new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+            fieldnames = FLAT_FIELDS
+            if self.ext == ".csv" and not new_file:  # 追加时沿用已有表头，旧文件缺少的列只保存在 result_json 中
+                with open(path, newline="", encoding="utf-8-sig") as f:
+                    fieldnames = next(csv.reader(f), None) or FLAT_FIELDS
+            self._file = open(path, "a", newline="", encoding="utf-8")
+            if self.ext == ".csv":
+                self._csv = csv.DictWriter(self._file, fieldnames=fieldnames, extrasaction="ignore")
+                if new_file:
+                    self._csv.writeheader()
+
+    def write(self, record: dict) -> None:
+        if self.ext == ".jsonl":
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+        elif self.ext == ".csv":
+            self._csv.writerow(flat_row(record))
+            self._file.flush()
+        else:
+            row = flat_row(record)
+            try:
+                row["fit_score"] = float(row["fit_score"])
+            except (TypeError, ValueError):
+                row["fit_score"] = None
+            self._buffer.append(row)
+            if len(self._buffer) >= 100:
+                self._flush_parquet()
+
+    def _flush_parquet(self):
+        if self._buffer:
+            self._writer.write_table(self._pa.Table.from_pylist(self._buffer, schema=self._schema))
+            self._buffer = []
+
+    def close(self) -> None:
+        if self.ext == ".parquet":
+            self._flush_parquet()
+            self._writer.close()
+            os.replace(self._tmp, self.path)
+        else:
+            self._file.close()
+
+
+# --- 主流程 ---
+def resolve_job(args) -> tuple:
+    """返回 (jd, must_haves, role_type)：保存的岗位模板优先，命令行参数可覆盖单项"""
+    jd, must_haves, role_type = "", "", ROLE_TYPES[0]
+    if args.preset:
+        presets = load_presets()
+        if args.preset not in presets:
+            raise SystemExit(f"找不到岗位模板: {args.preset} (可用: {', '.join(presets) or '无'})")
+        p = presets[args.preset]
+        jd, must_haves, role_type = p["jd"], p["must_haves"], p["role_type"]
+    if args.jd_file:
+        with open(args.jd_file, encoding="utf-8") as f:
+            jd = f.read()
+    jd = args.jd if args.jd is not None else jd
+    must_haves = args.must_haves if args.must_haves is not None else must_haves
+    role_type = args.role_type or role_type
+    if not jd.strip():
+        raise SystemExit("缺少 JD：请指定 --preset、--jd 或 --jd-file")
+    return jd, must_haves, role_type
+
+
+def run(args) -> dict:
+    jd, must_haves, role_type = resolve_job(args)
+    mode = args.mode or default_mode(role_type)
+    mock = os.environ.get("MEDRECRUIT_MOCK_LLM") == "1"
+    api_key = os.environ.get("GOOGLE_API_KEY", "")
+    if not (api_key or mock):
+        raise SystemExit("缺少 GOOGLE_API_KEY 环境变量 (或设置 MEDRECRUIT_MOCK_LLM=1 使用模拟后端)")
+    backend_name = MockBackend.model_name if mock else get_backend().model_name
+    processed = read_processed(args.output, mock=mock)
+    writer = ResultWriter(args.output)
+    if args.cache:
+        AnalysisCache(args.cache).purge_stale_versions(PROMPT_VERSIONS)
+
+    results, ingest_stats = [], {}
+    t0 = time.perf_counter()
+    # 每个进程同一时间只分析一份简历，进程数即 LLM 并发数
+    pool = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(api_key, args.cache, mock, args.workers))
+    pending = {}
+
+    def drain(block_until: int):
+        while len(pending) > block_until:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                rec = pending.pop(fut)
+                try:
+                    res = fut.result()
+                except Exception as e:  # 工作进程崩溃等
+                    res = {"name": "Error", "fit_score": 0, "summary": f"AI Error: {type(e).__name__}: {e}"}
+                res.update(file_name=rec["file_name"], sha256=rec["sha256"], status="analyzed")
+                res["role_type"] = role_type
+                res["backend"] = backend_name
+                attach_span(res, "parse", rec["extraction"]["seconds"])
+                writer.write(res)
+                results.append(res)
+                if not args.quiet:
+                    print(f"[{len(results)}] {rec['file_name']}: {res.get('name')} fit={res.get('fit_score')}", file=sys.stderr)
+
+    try:
+        for rec in ingest([args.source], max_workers=args.workers, on_progress=ingest_stats.update, known_hashes=processed):
+            if rec["status"] == "ok":
+                drain(2 * args.workers - 1)  # 最多 2 × workers 份在途，内存有上限
+                pending[pool.submit(_analyze, rec["text"], jd, must_haves, role_type, mode)] = rec
+            elif rec["status"] != "processed":
+                error = (rec["extraction"] or {}).get("error")
+                writer.write({"file_name": rec["file_name"], "sha256": rec["sha256"], "status": rec["status"],
+                              "duplicate_of": rec["duplicate_of"], "similarity": rec["similarity"], "error": error})
+                if not args.quiet:
+                    print(f"跳过 {rec['file_name']}: {rec['status']} {rec['duplicate_of'] or error or ''}", file=sys.stderr)
+        drain(0)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        writer.close()
+
+    summary = summarize(results, time.perf_counter() - t0)
+    summary["ingest"] = ingest_stats
+    return summary
+
+
+def print_summary(summary: dict) -> None:
+    ing = summary["ingest"]
+    print(f"文件: {ing.get('files', 0)}  新分析: {summary['candidates']}  已处理跳过: {ing.get('processed', 0)}  "
+          f"重复: {ing.get('duplicate', 0) + ing.get('near_duplicate', 0)}  解析失败: {ing.get('error', 0) + ing.get('too_large', 0)}")
+    throughput = f"{summary['throughput_per_min']:.1f}" if summary["throughput_per_min"] else "N/A"
+    print(f"耗时: {summary['wall_seconds']:.1f}s  吞吐: {throughput} candidates/min  失败: {summary['failed']} ({summary['error_rate']:.0%})")
+    print(f"{'stage':<10}{'count':>8}{'p50(s)':>10}{'p95(s)':>10}{'retries':>10}{'errors':>10}{'cached':>10}")
+    for stage, st in summary["stages"].items():
+        print(f"{stage:<10}{st['count']:>8}{st['p50']:>10.3f}{st['p95']:>10.3f}{st['retries']:>10}{st['errors']:>10}{st['cache_hits']:>10}")
+    for reason, n in summary["failure_reasons"].items():
+        print(f"失败原因: {reason} x{n}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="简历目录或 ZIP 文件")
+    parser.add_argument("-o", "--output", required=True, help="结果文件 (.jsonl / .csv / .parquet)")
+    parser.add_argument("--preset", help="已保存的岗位模板名称")
+    parser.add_argument("--jd", help="职位描述 (覆盖模板)")
+    parser.add_argument("--jd-file", help="从文件读取职位描述")
+    parser.add_argument("--must-haves", help="核心硬性要求 (覆盖模板)")
+    parser.add_argument("--role-type", choices=ROLE_TYPES, help="招聘赛道 (覆盖模板)")
+    parser.add_argument("--mode", choices=list(PIPELINE_MODES), help="分析模式：full (三 Agent) / fast (合并调用)，默认按赛道取 utils.DEFAULT_PIPELINE_MODE")
+    parser.add_argument("--workers", type=int, default=DEFAULT_CONCURRENCY, help="分析进程数 (同时也是解析进程数)")
+    parser.add_argument("--cache", default=CACHE_FILE, help="分析缓存数据库，传空字符串关闭缓存")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不逐条打印进度")
+    args = parser.parse_args(argv)
+    print_summary(run(args))
+
+
+if __name__ == "__main__":
+    main()
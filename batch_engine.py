@@ -0,0 +1,94 @@
+import contextvars
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# 可重试的 HTTP 状态码：限流 + 服务端错误
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 180  # 单个候选人的最长分析时间 (秒)
+RETRY_BASE_DELAY = 1.0  # 首次重试等待 (秒)，之后每次翻倍
+
+
+def is_retryable(exc: Exception) -> bool:
+    """判断异常是否值得重试 (429 / 5xx / 网络抖动)"""
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    code = getattr(exc, "code", None)
+    try:
+        return int(code) in RETRYABLE_STATUS
+    except (TypeError, ValueError):
+        return False
+
+
+def call_with_retry(fn, *args, max_retries: int = 4, base_delay: float = None, max_delay: float = 30.0, on_retry=None, **kwargs):
+    """调用 fn，遇到可重试错误时按指数退避 (带抖动) 重试，其他错误直接抛出。on_retry(attempt, exc) 在每次重试前回调"""
+    if base_delay is None:
+        base_delay = RETRY_BASE_DELAY
+    for attempt in range(max_retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            if on_retry:
+                on_retry(attempt, e)
+            delay = min(max_delay, base_delay * (2 ** attempt))
+            time.sleep(delay * (0.5 + random.random() / 2))
+
+
+def error_result(exc: Exception) -> dict:
+    """与 analyze_batch_candidate 失败时相同的结构，保证排行榜能正常渲染"""
+    return {"name": "Error", "fit_score": 0, "summary": f"AI Error: {str(exc)}"}
+
+
+def run_batch(items: list, worker, max_workers: int = DEFAULT_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT, on_done=None) -> list:
+    """
+    并发执行 worker(item)，返回与 items 顺序一致的结果列表。
+    - 单个任务异常或超时只影响自身，结果替换为 error_result
+    - on_done(index, result, done_count, total) 在主线程中按完成顺序回调，可直接更新 Streamlit 进度条
+    """
+    total = len(items)
+    results = [None] * total
+    if not total:
+        return results
+
+    started = {}
+
+    def _run(i, item):
+        started[i] = time.monotonic()
+        return worker(item)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    # 每个任务带上提交时的上下文副本 (例如 llm_scheduler 的优先级通道)
+    pending = {pool.submit(contextvars.copy_context().run, _run, i, item): i for i, item in enumerate(items)}
+    done_count = 0
+    try:
+        while pending:
+            done, _ = wait(pending, timeout=1.0 if timeout else None, return_when=FIRST_COMPLETED)
+            finished = []
+            for fut in done:
+                i = pending.pop(fut)
+                try:
+                    finished.append((i, fut.result()))
+                except Exception as e:
+                    finished.append((i, error_result(e)))
+
+            # 超时的任务无法强制中断线程，直接放弃其结果
+            if timeout:
+                now = time.monotonic()
+                for fut, i in list(pending.items()):
+                    t0 = started.get(i)
+                    if t0 is not None and now - t0 > timeout:
+                        del pending[fut]
+                        finished.append((i, error_result(TimeoutError(f"分析超时 (>{timeout}s)"))))
+
+            for i, res in finished:
+                results[i] = res
+                done_count += 1
+                if on_done:
+                    on_done(i, res, done_count, total)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
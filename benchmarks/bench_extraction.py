@@ -0,0 +1,76 @@
+"""
+简历解析基准：生成本地 PDF / DOCX 语料，对比单进程与进程池解析的吞吐和峰值内存。
+
+    python -m benchmarks.bench_extraction --files 200 --pages 4 --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import make_resume_text, make_pdf, make_docx
+from text_extraction import extract_bytes, iter_extract
+
+
+def build_corpus(directory: str, n_files: int, pages: int) -> list:
+    paths = []
+    for i in range(n_files):
+        page_lines = make_resume_text(i, pages=pages)
+        if i % 2 == 0:
+            path, data = os.path.join(directory, f"cv_{i:05d}.pdf"), make_pdf(page_lines)
+        else:
+            path, data = os.path.join(directory, f"cv_{i:05d}.docx"), make_docx(page_lines)
+        with open(path, "wb") as f:
+            f.write(data)
+        paths.append(path)
+    return paths
+
+
+def _read(paths):
+    for path in paths:
+        with open(path, "rb") as f:
+            yield os.path.basename(path), f.read()
+
+
+def _peak_rss_mb(who) -> float:
+    # Linux 下 ru_maxrss 单位是 KB
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--corpus", help="已有语料目录 (默认临时生成)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.corpus:
+            paths = sorted(os.path.join(args.corpus, n) for n in os.listdir(args.corpus))
+        else:
+            paths = build_corpus(tmp, args.files, args.pages)
+        print(f"语料: {len(paths)} 个文件")
+
+        t0 = time.perf_counter()
+        errors = sum(1 for name, data in _read(paths) if extract_bytes(name, data)["error"])
+        seq = time.perf_counter() - t0
+        print(f"[单进程]   {len(paths) / seq:8.1f} files/s  耗时 {seq:6.2f}s  错误 {errors}  峰值RSS(主进程) {_peak_rss_mb(resource.RUSAGE_SELF):.0f} MB")
+
+        t0 = time.perf_counter()
+        errors = sum(1 for _, res in iter_extract(_read(paths), max_workers=args.workers) if res["error"])
+        par = time.perf_counter() - t0
+        # 子进程退出并被回收后 RUSAGE_CHILDREN 才包含它们的峰值内存
+        for child in multiprocessing.active_children():
+            child.join(timeout=10)
+        print(f"[进程池x{args.workers}] {len(paths) / par:8.1f} files/s  耗时 {par:6.2f}s  错误 {errors}  峰值RSS(子进程) {_peak_rss_mb(resource.RUSAGE_CHILDREN):.0f} MB")
+        print(f"加速比: {seq / par:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+分析流水线吞吐基准：用 MockBackend 离线跑完整的三 Agent 流程。
+
+    python -m benchmarks.bench_pipeline -n 200 --concurrency 8 --latency 0.3 --rate-limit 0.05
+    python -m benchmarks.bench_pipeline -n 200 --role RA --pages 1 --pack   # Agent 1 打包提取
+    python -m benchmarks.bench_pipeline -n 100 --rpm 300 --interactive 5    # 限额下批量与交互请求并存
+
+输出 candidates/min、各阶段延迟 p50/p95/p99 (含重试和排队等待)、重试次数、失败数、LLM 请求数和各调度通道的等待时间。
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch_engine
+from batch_engine import run_batch
+from benchmarks.synthetic import make_resume_text
+from llm_backend import MockBackend
+from llm_scheduler import LLMScheduler, get_scheduler, interactive, set_scheduler
+from pipeline_metrics import summarize
+from utils import analyze_batch_candidate, generate_recruitment_email, prefetch_agent1_packed
+
+JD = "招聘博士后，研究方向为肿瘤免疫与单细胞测序，要求有高水平论文发表。"
+MUST_HAVES = "海外博士, Nature一作"
+ROLES = {"PI": "🧪 PI / 博士后 (Postdoc)", "RA": "🧬 科研助理 (RA)", "Admin": "💼 行政管理 (Admin)"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--candidates", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=batch_engine.DEFAULT_CONCURRENCY)
+    parser.add_argument("--latency", type=float, default=0.2, help="模拟单次调用延迟 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟 5xx 比例")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="模拟 429 比例")
+    parser.add_argument("--backoff", type=float, default=0.05, help="首次重试等待 (秒)，压测时调小")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--role", choices=list(ROLES), default="PI")
+    parser.add_argument("--pages", type=int, default=2, help="每份合成简历的页数")
+    parser.add_argument("--pack", action="store_true", help="Agent 1 打包提取多份短简历")
+    parser.add_argument("--rpm", type=int, default=0, help="调度器每分钟请求数上限 (0 = 不限)")
+    parser.add_argument("--tpm", type=int, default=0, help="调度器每分钟 token 上限 (0 = 不限)")
+    parser.add_argument("--interactive", type=int, default=0, help="批量运行期间每秒发出一封 interactive 通道的邮件草稿，共 N 封")
+    args = parser.parse_args()
+
+    batch_engine.RETRY_BASE_DELAY = args.backoff
+    set_scheduler(LLMScheduler(args.rpm, args.tpm))
+    backend = MockBackend(args.latency, args.jitter, args.error_rate, args.rate_limit, seed=args.seed)
+    role = ROLES[args.role]
+    texts = ["\n".join("\n".join(page) for page in make_resume_text(i, args.pages)) for i in range(args.candidates)]
+
+    draft_latencies = []
+
+    def drafts():
+        # 模拟其他招聘人员在批量任务进行中点击“智能生成草稿”
+        for i in range(args.interactive):
+            time.sleep(1.0)
+            t = time.perf_counter()
+            with interactive():
+                generate_recruitment_email({"name": f"Candidate {i}", "language_preference": "English"},
+                                           {"name": "HR", "title": "Recruiter", "org": "Bench"}, role, backend=backend)
+            draft_latencies.append(time.perf_counter() - t)
+
+    drafter = threading.Thread(target=drafts, daemon=True)
+    drafter.start()
+    t0 = time.perf_counter()
+    prefetched = prefetch_agent1_packed(texts, role, backend=backend, max_workers=args.concurrency) if args.pack else [None] * len(texts)
+    results = run_batch(list(zip(texts, prefetched)), lambda item: analyze_batch_candidate(item[0], JD, MUST_HAVES, role, backend=backend, prefetched=item[1]),
+                        max_workers=args.concurrency)
+    summary = summarize(results, time.perf_counter() - t0)
+    drafter.join()
+
+    print(f"候选人: {summary['candidates']}  并发: {args.concurrency}  耗时: {summary['wall_seconds']:.2f}s  "
+          f"吞吐: {summary['throughput_per_min']:.1f} candidates/min  失败: {summary['failed']}")
+    print(f"{'stage':<10}{'count':>8}{'p50(s)':>10}{'p95(s)':>10}{'p99(s)':>10}{'retries':>10}{'errors':>10}")
+    for stage, st in summary["stages"].items():
+        print(f"{stage:<10}{st['count']:>8}{st['p50']:>10.3f}{st['p95']:>10.3f}{st['p99']:>10.3f}{st['retries']:>10}{st['errors']:>10}")
+    print("LLM 请求数: " + "  ".join(f"{stage}={n}" for stage, n in backend.calls.items()) + f"  合计={sum(backend.calls.values())}")
+    for reason, n in summary["failure_reasons"].items():
+        print(f"失败原因: {reason} x{n}")
+    for lane, st in get_scheduler().stats()["lanes"].items():
+        print(f"调度通道 {lane:<12} 请求: {st['requests']:>5}  平均等待: {st['mean_wait']:.3f}s  最长等待: {st['max_wait']:.3f}s")
+    if draft_latencies:
+        print(f"交互草稿 {len(draft_latencies)} 封  平均耗时: {sum(draft_latencies) / len(draft_latencies):.3f}s  最长: {max(draft_latencies):.3f}s")
+
+if __name__ == "__main__":
+    main()
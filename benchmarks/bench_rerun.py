@@ -0,0 +1,106 @@
+"""
+仪表盘重跑延迟基准：用 Streamlit AppTest (无浏览器) + MockBackend 构造 1,000 名候选人的会话，
+测量常见交互触发的脚本执行时间。
+
+    python -m benchmarks.bench_rerun -n 1000 --repeat 5 --budget 300
+
+AppTest 每次交互都会执行整个脚本 (不区分 fragment)，因此这里测到的是整页重跑的耗时，
+是浏览器中 fragment 局部重跑耗时的上界。任一交互的中位数超过 --budget (毫秒) 时以状态码 1 退出。
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["MEDRECRUIT_MOCK_LLM"] = "1"
+
+from batch_engine import run_batch
+from benchmarks.synthetic import make_resume_text
+from candidate_store import CandidateStore
+from llm_backend import MockBackend
+from llm_scheduler import LLMScheduler, set_scheduler
+from utils import analyze_batch_candidate
+
+ROLE = "🧪 PI / 博士后 (Postdoc)"
+JD = "招聘博士后，研究方向为肿瘤免疫与单细胞测序。"
+
+
+def build_records(n: int) -> list:
+    backend = MockBackend(seed=0)
+    set_scheduler(LLMScheduler(rpm=0, tpm=0))  # 模拟后端不受 API 限额约束，构造数据时不排队
+    texts = ["\n".join("\n".join(page) for page in make_resume_text(i, pages=1)) for i in range(n)]
+    records = run_batch(texts, lambda text: analyze_batch_candidate(text, JD, "", ROLE, backend=backend), max_workers=8)
+    for i, r in enumerate(records):
+        r["file_name"] = f"cv_{i:05d}.pdf"
+        r["role_type"] = ROLE
+        r["prescreen_score"] = round(100 - i * 100 / n, 1)
+    return records
+
+
+def _widget(elements, label):
+    return next(w for w in elements if w.label == label)
+
+
+# 每个交互：(名称, 操作)。操作接收 AppTest 和轮次，返回 None，由调用方执行 at.run() 并计时
+INTERACTIONS = [
+    ("重跑 (无操作)", lambda at, k: None),
+    ("选择候选人详情", lambda at, k: _widget(at.selectbox, "选择候选人查看详情").select_index(k + 1)),
+    ("按姓名筛选", lambda at, k: _widget(at.text_input, "按姓名筛选").input(["Li", "Wang", "Chen", "Wu", "Zhang"][k % 5])),
+    ("排行榜翻页", lambda at, k: _widget(at.number_input, "页码").set_value(k % 3 + 2)),
+    ("切换到邮件页", lambda at, k: _widget(at.radio, "功能导航").set_value("📧 智能邀约助手")),
+    ("邮件页选择候选人", lambda at, k: _widget(at.selectbox, "选择候选人").select_index(k + 1)),
+    ("切回仪表盘", lambda at, k: _widget(at.radio, "功能导航").set_value("📊 人才评估仪表盘")),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--candidates", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=300.0, help="每个交互的中位数预算 (毫秒)")
+    args = parser.parse_args()
+
+    from streamlit.testing.v1 import AppTest
+
+    t0 = time.perf_counter()
+    records = build_records(args.candidates)
+    print(f"构造 {len(records)} 名候选人: {time.perf_counter() - t0:.1f}s")
+
+    # 应用的 SQLite 文件 (缓存 / 模板 / 任务) 都用相对路径，放到临时目录避免污染工作区
+    os.chdir(tempfile.mkdtemp(prefix="bench_rerun_"))
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    at.session_state["candidates"] = CandidateStore(records)
+    at.session_state["role_type"] = ROLE
+    t0 = time.perf_counter()
+    at.run()
+    print(f"首次加载: {(time.perf_counter() - t0) * 1000:.0f} ms")
+    if at.exception:
+        raise SystemExit(f"应用报错: {at.exception[0].value}")
+
+    timings = {name: [] for name, _ in INTERACTIONS}
+    for k in range(args.repeat):
+        for name, action in INTERACTIONS:
+            action(at, k)
+            t0 = time.perf_counter()
+            at.run()
+            timings[name].append((time.perf_counter() - t0) * 1000)
+            if at.exception:
+                raise SystemExit(f"{name}: 应用报错: {at.exception[0].value}")
+
+    over = []
+    print(f"{'interaction':<16}{'median(ms)':>12}{'max(ms)':>10}  budget {args.budget:.0f} ms")
+    for name, values in timings.items():
+        median = statistics.median(values)
+        flag = "" if median <= args.budget else "  ✗ 超出预算"
+        if flag:
+            over.append(name)
+        print(f"{name:<16}{median:>12.0f}{max(values):>10.0f}{flag}")
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+分析模式一致性报告：同一批简历分别用完整模式 (三 Agent) 和快速模式 (合并调用) 分析，
+按赛道比较 fit_score 的排序一致性和风险标记一致性，用于决定各赛道在生产中用哪种模式
+(结论写入 utils.DEFAULT_PIPELINE_MODE)。
+
+    MEDRECRUIT_MOCK_LLM=1 python -m benchmarks.mode_agreement -n 200                 # 离线冒烟 (合成简历 + 模拟后端)
+    GOOGLE_API_KEY=... python -m benchmarks.mode_agreement --source /data/sample --jd-file jd.txt --roles RA Admin --json report.json
+
+指标：
+- Spearman / Kendall：两种模式 fit_score 的秩相关
+- Top 20% 重合：两种模式各自前 20% 候选人的交集比例 (短名单是否一致)
+- 风险一致率：critique_notes 是否标出风险 (非"无明显风险") 的一致比例；漏报 = 完整模式有风险而快速模式没有
+- 耗时 / 调用数：每位候选人的串行 LLM 耗时和请求数 (不含缓存命中)
+两种模式任一失败的候选人不参与比较。默认不使用缓存，保证耗时可比。
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from analysis_cache import AnalysisCache
+from batch_engine import run_batch, DEFAULT_CONCURRENCY
+from benchmarks.synthetic import make_resume_text
+from ingest import ingest
+from llm_backend import MockBackend, set_backend
+from llm_scheduler import LLMScheduler, set_scheduler
+from utils import configure_ai, analyze_batch_candidate
+
+ROLES = {"PI": "🧪 PI / 博士后 (Postdoc)", "RA": "🧬 科研助理 (RA)", "Admin": "💼 行政管理 (Admin)"}
+SAMPLE_JDS = {
+    "PI": "招聘博士后，研究方向为肿瘤免疫与单细胞测序，要求有高水平论文发表。",
+    "RA": "招聘科研助理，负责细胞培养、qPCR 和动物实验，协助课题组日常实验管理。",
+    "Admin": "招聘科研行政秘书，负责经费报销、伦理审批材料和会议组织。",
+}
+NO_RISK_MARKERS = ("无明显风险", "未发现", "No major")
+# 建议使用快速模式的门槛
+MIN_SPEARMAN = 0.8
+MIN_TOP_OVERLAP = 0.8
+MIN_RISK_AGREEMENT = 0.9
+
+
+def has_risk(result: dict) -> bool:
+    notes = str(result.get("critique_notes") or "").strip()
+    return bool(notes) and not any(m in notes for m in NO_RISK_MARKERS)
+
+
+def llm_calls(result: dict) -> int:
+    """按 metrics 估算的请求数：未命中缓存的阶段 + 重试 + 补请求"""
+    spans = [s for s in result.get("metrics", {}).get("spans", []) if s["stage"] != "parse"]
+    return sum(1 + s["retries"] + (s.get("refetched_fields", 0) > 0) for s in spans if s["status"] != "cache_hit")
+
+
+def kendall_tau(x: list, y: list) -> float:
+    """Kendall tau-b (处理并列分数)，O(n²)，报告规模 (数百人) 足够"""
+    concordant = discordant = ties_x = ties_y = 0
+    for i in range(len(x)):
+        for j in range(i + 1, len(x)):
+            dx, dy = x[i] - x[j], y[i] - y[j]
+            if dx == 0 and dy == 0:
+                continue
+            if dx == 0:
+                ties_x += 1
+            elif dy == 0:
+                ties_y += 1
+            elif (dx > 0) == (dy > 0):
+                concordant += 1
+            else:
+                discordant += 1
+    denom = ((concordant + discordant + ties_x) * (concordant + discordant + ties_y)) ** 0.5
+    return (concordant - discordant) / denom if denom else 0.0
+
+
+def compare(full: list, fast: list) -> dict:
+    """比较同一批简历两种模式的结果 (按位置对应)"""
+    pairs = [(a, b) for a, b in zip(full, fast) if a.get("name") != "Error" and b.get("name") != "Error"]
+    out = {"candidates": len(full), "compared": len(pairs),
+           "failed_full": sum(r.get("name") == "Error" for r in full), "failed_fast": sum(r.get("name") == "Error" for r in fast)}
+    if len(pairs) < 2:
+        return out
+    df = pd.DataFrame({
+        "full": [pd.to_numeric(a.get("fit_score"), errors="coerce") for a, _ in pairs],
+        "fast": [pd.to_numeric(b.get("fit_score"), errors="coerce") for _, b in pairs],
+        "risk_full": [has_risk(a) for a, _ in pairs],
+        "risk_fast": [has_risk(b) for _, b in pairs],
+    }).fillna(0)
+    k = max(1, len(df) // 5)
+    top_full = set(df["full"].sort_values(ascending=False, kind="stable").index[:k])
+    top_fast = set(df["fast"].sort_values(ascending=False, kind="stable").index[:k])
+    out.update(
+        spearman=float(df["full"].rank().corr(df["fast"].rank())),  # 秩的 Pearson 相关 (不依赖 scipy)
+        kendall=kendall_tau(df["full"].tolist(), df["fast"].tolist()),
+        top_overlap=len(top_full & top_fast) / k,
+        mean_abs_diff=float((df["full"] - df["fast"]).abs().mean()),
+        risk_agreement=float((df["risk_full"] == df["risk_fast"]).mean()),
+        risk_missed=int((df["risk_full"] & ~df["risk_fast"]).sum()),
+        risk_extra=int((~df["risk_full"] & df["risk_fast"]).sum()),
+        seconds_full=sum(a["metrics"]["total_seconds"] for a, _ in pairs) / len(pairs),
+        seconds_fast=sum(b["metrics"]["total_seconds"] for _, b in pairs) / len(pairs),
+        calls_full=sum(llm_calls(a) for a, _ in pairs) / len(pairs),
+        calls_fast=sum(llm_calls(b) for _, b in pairs) / len(pairs),
+    )
+    out["recommend_fast"] = (out["spearman"] >= MIN_SPEARMAN and out["top_overlap"] >= MIN_TOP_OVERLAP
+                             and out["risk_agreement"] >= MIN_RISK_AGREEMENT)
+    return out
+
+
+def load_texts(args) -> list:
+    if not args.source:
+        return ["\n".join("\n".join(page) for page in make_resume_text(i, args.pages)) for i in range(args.candidates)]
+    texts = [rec["text"] for rec in ingest([args.source], max_workers=args.workers) if rec["status"] == "ok"]
+    return texts[:args.candidates] if args.candidates else texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", help="简历目录或 ZIP (缺省使用合成简历)")
+    parser.add_argument("-n", "--candidates", type=int, default=100, help="合成简历数量；指定 --source 时为最多读取的份数 (0 = 全部)")
+    parser.add_argument("--pages", type=int, default=1, help="每份合成简历的页数")
+    parser.add_argument("--roles", nargs="+", choices=list(ROLES), default=list(ROLES))
+    parser.add_argument("--jd", help="职位描述 (所有赛道共用，缺省使用各赛道的示例 JD)")
+    parser.add_argument("--jd-file", help="从文件读取职位描述")
+    parser.add_argument("--must-haves", default="", help="核心硬性要求")
+    parser.add_argument("--workers", type=int, default=DEFAULT_CONCURRENCY, help="并发分析数")
+    parser.add_argument("--cache", help="分析缓存数据库 (缺省不使用缓存，耗时可比)")
+    parser.add_argument("--json", help="把报告写入 JSON 文件")
+    args = parser.parse_args()
+
+    if os.environ.get("MEDRECRUIT_MOCK_LLM") == "1":
+        set_backend(MockBackend())
+        set_scheduler(LLMScheduler(rpm=0, tpm=0))  # 模拟后端没有 API 限额
+    elif os.environ.get("GOOGLE_API_KEY"):
+        configure_ai(os.environ["GOOGLE_API_KEY"])
+    else:
+        raise SystemExit("缺少 GOOGLE_API_KEY 环境变量 (或设置 MEDRECRUIT_MOCK_LLM=1 使用模拟后端)")
+    jd = open(args.jd_file, encoding="utf-8").read() if args.jd_file else args.jd
+    cache = AnalysisCache(args.cache) if args.cache else None
+    texts = load_texts(args)
+    print(f"简历: {len(texts)}  赛道: {', '.join(args.roles)}", file=sys.stderr)
+
+    report = {}
+    for key in args.roles:
+        role = ROLES[key]
+        role_jd = jd or SAMPLE_JDS[key]
+        results = {}
+        for mode in ("full", "fast"):
+            results[mode] = run_batch(texts, lambda text: analyze_batch_candidate(text, role_jd, args.must_haves, role, cache=cache, mode=mode),
+                                      max_workers=args.workers)
+        report[key] = compare(results["full"], results["fast"])
+
+    print(f"{'role':<7}{'n':>5}{'spearman':>10}{'kendall':>9}{'top20%':>8}{'|Δfit|':>8}{'risk=':>7}{'missed':>7}{'extra':>6}"
+          f"{'sec full/fast':>15}{'calls full/fast':>17}  建议")
+    for key, r in report.items():
+        if "spearman" not in r:
+            print(f"{key:<7}{r['compared']:>5}  可比较的候选人不足")
+            continue
+        print(f"{key:<7}{r['compared']:>5}{r['spearman']:>10.3f}{r['kendall']:>9.3f}{r['top_overlap']:>8.0%}{r['mean_abs_diff']:>8.1f}"
+              f"{r['risk_agreement']:>7.0%}{r['risk_missed']:>7}{r['risk_extra']:>6}"
+              f"{r['seconds_full']:>8.2f}/{r['seconds_fast']:<6.2f}{r['calls_full']:>10.2f}/{r['calls_fast']:<6.2f}  "
+              f"{'fast' if r['recommend_fast'] else 'full'}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""合成简历语料：用于离线基准测试，不依赖任何外部服务"""
+import io
+import random
+
+import docx
+
+FIRST_NAMES = ["Wei", "Jing", "Li", "Ming", "Xiao", "Anna", "David", "Maria", "Chen", "Yu"]
+LAST_NAMES = ["Zhang", "Wang", "Li", "Liu", "Chen", "Smith", "Garcia", "Huang", "Zhao", "Wu"]
+SKILLS = ["CRISPR", "Flow Cytometry", "Western Blot", "qPCR", "单细胞测序", "Python", "R", "动物实验",
+          "细胞培养", "Confocal Microscopy", "项目管理", "财务报销", "Office", "科研秘书", "伦理审批"]
+JOURNALS = ["Nature", "Cell", "Science", "Lancet", "NEJM", "Nature Medicine", "Cell Stem Cell", "Blood"]
+
+
+def make_resume_text(seed: int, pages: int = 2) -> list:
+    """生成一份合成简历，按页返回文本行列表"""
+    rng = random.Random(seed)
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    out = []
+    for p in range(pages):
+        lines = [f"{name} - Curriculum Vitae", ""]
+        if p == 0:
+            lines += [f"Email: {name.replace(' ', '.').lower()}{seed}@example.com", "",
+                      "EDUCATION", f"PhD, {rng.choice(['Harvard', 'Zhejiang University', 'Oxford', 'Peking University'])}, {rng.randint(2005, 2022)}", "",
+                      "EXPERIENCE", f"Postdoctoral Fellow, {rng.randint(1, 8)} years", "",
+                      "SKILLS", ", ".join(rng.sample(SKILLS, 5)), ""]
+        lines.append("PUBLICATIONS")
+        for k in range(12):
+            lines.append(f"{k + 1}. {rng.choice(LAST_NAMES)} et al. Study of pathway {rng.randint(1, 999)}. {rng.choice(JOURNALS)} {rng.randint(2010, 2025)}.")
+        lines += ["", f"Page {p + 1}"]
+        out.append(lines)
+    return out
+
+
+def _pdf_escape(s: str) -> str:
+    return s.encode("latin-1", "replace").decode("latin-1").replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: list) -> bytes:
+    """手写最小 PDF (Helvetica 文本)，每个元素是一页的文本行"""
+    objects = []
+    page_ids = []
+    n_pages = len(pages)
+    font_id = 3 + 2 * n_pages
+    for i, lines in enumerate(pages):
+        page_id, content_id = 3 + 2 * i, 4 + 2 * i
+        page_ids.append(page_id)
+        stream = "BT /F1 10 Tf 50 800 Td 12 TL\n" + "\n".join(f"({_pdf_escape(l)}) '" for l in lines) + "\nET"
+        objects.append((page_id, f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {content_id} 0 R /Resources << /Font << /F1 {font_id} 0 R >> >> >>"))
+        objects.append((content_id, f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream"))
+    objects.insert(0, (2, f"<< /Type /Pages /Kids [{' '.join(f'{p} 0 R' for p in page_ids)}] /Count {n_pages} >>"))
+    objects.insert(0, (1, "<< /Type /Catalog /Pages 2 0 R >>"))
+    objects.append((font_id, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"))
+
+    buf = io.BytesIO()
+    buf.write(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id, body in sorted(objects):
+        offsets[obj_id] = buf.tell()
+        buf.write(f"{obj_id} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = buf.tell()
+    size = font_id + 1
+    buf.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode())
+    for obj_id in range(1, size):
+        buf.write(f"{offsets[obj_id]:010d} 00000 n \n".encode())
+    buf.write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return buf.getvalue()
+
+
+def make_docx(pages: list) -> bytes:
+    doc = docx.Document()
+    for lines in pages:
+        for line in lines:
+            doc.add_paragraph(line)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
@@ -0,0 +1,173 @@
+import itertools
+from bisect import insort
+
+import pandas as pd
+
+
+def _score(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def leaderboard_row(c: dict, role_type: str) -> dict:
+    """排行榜的一行：通用列 + 按赛道显示的专属列"""
+    row = {
+        "ID": c["candidate_id"],
+        "姓名": c.get('name'),
+        "AI 匹配度": c.get('fit_score'),
+        "初筛分": c.get('prescreen_score'),
+    }
+
+    # 根据角色显示不同列
+    if "PI" in role_type or "Postdoc" in role_type:
+        bib = c.get('bibliometrics') or {}
+        row["H指数"] = bib.get('h_index', 'N/A')
+        row["引用数"] = bib.get('total_citations', 'N/A')
+        row["研究方向"] = c.get('research_focus_area', 'N/A')
+
+    elif "科研助理" in role_type: # RA
+        row["实验室经验(年)"] = c.get('lab_experience_years', 'N/A')
+        skills = c.get('technical_skills') or []
+        row["核心技能"] = ", ".join(skills[:3]) if skills else "N/A"
+
+    else: # Admin
+        row["工作年限"] = c.get('years_experience', 'N/A')
+        row["核心能力"] = (c.get('core_competencies') or [""])[0]
+    return row
+
+
+def preset_matrix(records: list) -> pd.DataFrame:
+    """多岗位匹配结果：候选人 × 岗位模板的匹配度矩阵，附最佳岗位 (按最佳匹配度降序)"""
+    rows = []
+    for c in records:
+        if not c.get("matches"):
+            continue
+        row = {"ID": c["candidate_id"], "姓名": c.get('name')}
+        for preset, res in c["matches"].items():
+            row[preset] = res.get('fit_score')
+        row["最佳岗位"] = c.get('best_preset')
+        row["最佳匹配度"] = c.get('fit_score')
+        rows.append(row)
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    return df.sort_values(by="最佳匹配度", key=lambda col: pd.to_numeric(col, errors="coerce").fillna(0), ascending=False)
+
+
+class CandidateStore:
+    """
+    会话内的候选人存储：按稳定 ID 保存记录，维护姓名 / 赛道 / 分数索引。
+    每次写入 version + 1，排行榜 DataFrame 按 (version, 赛道) 缓存，重跑时不再重建。
+    其它由全部记录派生的数据 (下拉框标签、流水线指标、导出文件) 用 memo() 按 version 缓存。
+    """
+
+    def __init__(self, records: list = None):
+        self._by_id = {}
+        self._by_name = {}
+        self._by_role = {}
+        self._by_score = []  # (-score, seq, id)，保持降序
+        self._seq = itertools.count()
+        self.version = 0
+        self._leaderboard_cache = {}
+        self._matrix_cache = None  # (version, DataFrame)
+        self._memo = {}
+        for r in records or []:
+            self.add(r)
+
+    def add(self, record: dict) -> str:
+        """加入一条记录并返回其 ID (记录中已有 candidate_id 时沿用)"""
+        seq = next(self._seq)
+        cid = record.get("candidate_id") or f"c{seq:06d}"
+        if cid in self._by_id:
+            self.remove(cid)
+        record["candidate_id"] = cid
+        self._by_id[cid] = record
+        self._by_name.setdefault(record.get("name"), []).append(cid)
+        self._by_role.setdefault(record.get("role_type"), []).append(cid)
+        insort(self._by_score, (-_score(record.get("fit_score")), seq, cid))
+        self._touch()
+        return cid
+
+    def extend(self, records: list) -> list:
+        return [self.add(r) for r in records]
+
+    def remove(self, cid: str) -> None:
+        record = self._by_id.pop(cid)
+        self._by_name[record.get("name")].remove(cid)
+        self._by_role[record.get("role_type")].remove(cid)
+        self._by_score = [e for e in self._by_score if e[2] != cid]
+        self._touch()
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def _touch(self):
+        self.version += 1
+        self._leaderboard_cache.clear()
+        self._memo.clear()
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __bool__(self):
+        return bool(self._by_id)
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+    def __contains__(self, cid):
+        return cid in self._by_id
+
+    def get(self, cid: str) -> dict:
+        return self._by_id.get(cid)
+
+    def find_by_name(self, name: str) -> list:
+        return [self._by_id[cid] for cid in self._by_name.get(name, [])]
+
+    def by_role(self, role_type: str) -> list:
+        return [self._by_id[cid] for cid in self._by_role.get(role_type, [])]
+
+    def ranked_ids(self) -> list:
+        """按 AI 匹配度降序的全部 ID"""
+        return [cid for _, _, cid in self._by_score]
+
+    def records(self) -> list:
+        return list(self._by_id.values())
+
+    def memo(self, key, build):
+        """按 key 缓存 build() 的结果，任何写入后失效"""
+        if key not in self._memo:
+            self._memo[key] = build()
+        return self._memo[key]
+
+    def label(self, cid: str) -> str:
+        """下拉框显示的标签：姓名 (文件名)"""
+        labels = self.memo("labels", lambda: {k: f"{c.get('name')} ({c.get('file_name', k)})" for k, c in self._by_id.items()})
+        return labels.get(cid, cid)
+
+    def leaderboard(self, role_type: str) -> pd.DataFrame:
+        """已按匹配度排好序的排行榜 (同一 version 内只构建一次)"""
+        key = (self.version, role_type)
+        df = self._leaderboard_cache.get(key)
+        if df is None:
+            df = pd.DataFrame([leaderboard_row(self._by_id[cid], role_type) for cid in self.ranked_ids()])
+            self._leaderboard_cache = {key: df}
+        return df
+
+    def preset_matrix(self) -> pd.DataFrame:
+        """多岗位匹配矩阵 (同一 version 内只构建一次)"""
+        if self._matrix_cache is None or self._matrix_cache[0] != self.version:
+            self._matrix_cache = (self.version, preset_matrix(self.records()))
+        return self._matrix_cache[1]
+
+    def leaderboard_page(self, role_type: str, name_filter: str = "", min_score: float = 0, page: int = 1, page_size: int = 50) -> tuple:
+        """过滤 + 分页，返回 (当前页 DataFrame, 过滤后总行数)"""
+        df = self.leaderboard(role_type)
+        if name_filter:
+            df = df[df["姓名"].astype(str).str.contains(name_filter, case=False, regex=False)]
+        if min_score:
+            df = df[pd.to_numeric(df["AI 匹配度"], errors="coerce").fillna(0) >= min_score]
+        start = (max(1, page) - 1) * page_size
+        return df.iloc[start:start + page_size], len(df)
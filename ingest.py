@@ -0,0 +1,217 @@
+import hashlib
+import itertools
+import os
+import random
+import re
+import zipfile
+
+from text_extraction import iter_extract, DEFAULT_WORKERS
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt")
+MAX_FILE_BYTES = 20 * 1024 * 1024  # 单个简历文件上限
+
+SHINGLE_SIZE = 4
+SIMHASH_BITS = 64
+NEAR_DUP_DISTANCE = 6  # SimHash 汉明距离不超过该值的作为候选
+NEAR_DUP_JACCARD = 0.8  # MinHash 估计相似度达到该值才判定为近似重复
+MINHASH_PERM = 64
+
+_WORD_RE = re.compile(r"[一-鿿]|[a-z0-9]+")
+
+
+# --- 文件来源：逐个产出 (name, bytes)，不一次性读入内存 ---
+def iter_zip(path_or_file):
+    """流式读取 ZIP 中的简历文件 (跳过目录、隐藏文件和 __MACOSX)"""
+    with zipfile.ZipFile(path_or_file) as zf:
+        for info in zf.infolist():
+            name = info.filename
+            base = os.path.basename(name)
+            if info.is_dir() or not base or base.startswith(".") or "__MACOSX" in name:
+                continue
+            if not base.lower().endswith(SUPPORTED_EXTENSIONS):
+                continue
+            if info.file_size > MAX_FILE_BYTES:
+                yield name, None
+                continue
+            with zf.open(info) as f:
+                yield name, f.read()
+
+
+def iter_directory(root: str):
+    """递归遍历服务器目录中的简历文件 (按路径排序，结果可复现)"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for base in sorted(filenames):
+            if base.startswith(".") or not base.lower().endswith(SUPPORTED_EXTENSIONS):
+                continue
+            path = os.path.join(dirpath, base)
+            if os.path.getsize(path) > MAX_FILE_BYTES:
+                yield os.path.relpath(path, root), None
+                continue
+            with open(path, "rb") as f:
+                yield os.path.relpath(path, root), f.read()
+
+
+def iter_sources(items):
+    """
+    展开混合来源：上传的文件对象 (.name / .getvalue())、ZIP 文件、目录路径。
+    产出 (name, bytes)；bytes 为 None 表示文件超过大小上限。
+    """
+    for item in items:
+        if isinstance(item, str) and os.path.isdir(item):
+            yield from iter_directory(item)
+        elif isinstance(item, str):
+            if item.lower().endswith(".zip"):
+                yield from iter_zip(item)
+            else:
+                with open(item, "rb") as f:
+                    yield os.path.basename(item), f.read()
+        elif item.name.lower().endswith(".zip"):
+            yield from ((f"{item.name}/{n}", data) for n, data in iter_zip(item))
+        else:
+            yield item.name, item.getvalue()
+
+
+# --- 指纹 ---
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(_WORD_RE.findall((text or "").lower()))
+
+
+def _shingle_hashes(text: str) -> list:
+    tokens = normalize_text(text).split()
+    shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(max(1, len(tokens) - SHINGLE_SIZE + 1))}
+    return [int.from_bytes(hashlib.blake2b(sh.encode("utf-8"), digest_size=8).digest(), "big") for sh in shingles]
+
+
+def simhash(shingle_hashes: list, bits: int = SIMHASH_BITS) -> int:
+    """SimHash：用于快速召回候选 (同一简历的 PDF / DOCX 版本提取文本略有差异，指纹仍然接近)"""
+    weights = [0] * bits
+    for h in shingle_hashes:
+        for b in range(bits):
+            weights[b] += 1 if h >> b & 1 else -1
+    return sum(1 << b for b in range(bits) if weights[b] > 0)
+
+
+_MERSENNE = (1 << 61) - 1
+_MINHASH_PARAMS = [(random.Random(i).randrange(1, _MERSENNE), random.Random(-i - 1).randrange(_MERSENNE)) for i in range(MINHASH_PERM)]
+
+
+def minhash(shingle_hashes: list) -> tuple:
+    """MinHash 签名：用于确认召回的候选 (估计 shingle 集合的 Jaccard 相似度)"""
+    if not shingle_hashes:
+        return tuple([0] * MINHASH_PERM)
+    return tuple(min((a * h + b) % _MERSENNE for h in shingle_hashes) for a, b in _MINHASH_PARAMS)
+
+
+def jaccard(sig_a: tuple, sig_b: tuple) -> float:
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class NearDuplicateIndex:
+    """
+    SimHash 召回 + MinHash 确认。64 位指纹切成 (distance + 1) 段分桶：
+    汉明距离 <= distance 的两个指纹至少有一段完全相同，只比较同桶的候选。
+    每份简历只保留指纹和签名 (约 0.5 KB)，不保留文本。
+    """
+
+    def __init__(self, bits: int = SIMHASH_BITS, distance: int = NEAR_DUP_DISTANCE, threshold: float = NEAR_DUP_JACCARD):
+        self.bits = bits
+        self.distance = distance
+        self.threshold = threshold
+        self.parts = distance + 1
+        self.width = bits // self.parts
+        self.buckets = {}
+
+    def _keys(self, fp: int):
+        mask = (1 << self.width) - 1
+        for p in range(self.parts):
+            yield p, fp >> (p * self.width) & mask
+
+    def query(self, fp: int, sig: tuple):
+        """返回第一个近似重复的 (key, 估计相似度)，没有则 None"""
+        seen = set()
+        for k in self._keys(fp):
+            for other_fp, other_sig, key in self.buckets.get(k, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                if bin(fp ^ other_fp).count("1") <= self.distance:
+                    sim = jaccard(sig, other_sig)
+                    if sim >= self.threshold:
+                        return key, round(sim, 3)
+        return None
+
+    def add(self, fp: int, sig: tuple, key) -> None:
+        for k in self._keys(fp):
+            self.buckets.setdefault(k, []).append((fp, sig, key))
+
+
+# --- 流水线 ---
+def ingest(items, max_workers: int = DEFAULT_WORKERS, on_progress=None, known_hashes=None, **limits):
+    """
+    流式导入：逐个读取文件 -> 精确去重 (内容 sha256) -> 进程池解析 -> 近似去重 (SimHash)。
+    按完成顺序 yield 记录，只在内存中保留指纹，不保留已处理文件的内容：
+      {"file_name", "status": "ok" | "duplicate" | "near_duplicate" | "processed" | "error" | "too_large",
+       "duplicate_of", "similarity", "text", "sha256", "simhash", "extraction"}
+    重复文件会作为 duplicate / near_duplicate 记录产出 (不会被静默丢弃)，text 为空，不应送入 LLM。
+    known_hashes: 之前已处理过的文件 sha256 集合 (例如命令行增量运行)，这些文件记为 processed，不再解析。
+    on_progress(stats) 在每条记录产出后回调。
+    """
+    seen_hashes = {}
+    near_index = NearDuplicateIndex()
+    stats = {"files": 0, "ok": 0, "duplicate": 0, "near_duplicate": 0, "processed": 0, "error": 0, "too_large": 0}
+    skipped = []  # 读取阶段就能判定的记录 (精确重复 / 过大)，在解析结果之间穿插产出
+    digests = {}  # 解析序号 -> sha256
+    seq = itertools.count()
+
+    def emit(record):
+        stats["files"] += 1
+        stats[record["status"]] += 1
+        if on_progress:
+            on_progress(dict(stats))
+        return record
+
+    def unique_sources():
+        for name, data in iter_sources(items):
+            if data is None:
+                skipped.append({"file_name": name, "status": "too_large", "duplicate_of": None, "similarity": None,
+                                "text": "", "sha256": None, "simhash": None, "extraction": None})
+                continue
+            digest = content_hash(data)
+            if digest in seen_hashes:
+                skipped.append({"file_name": name, "status": "duplicate", "duplicate_of": seen_hashes[digest], "similarity": 1.0,
+                                "text": "", "sha256": digest, "simhash": None, "extraction": None})
+                continue
+            if known_hashes and digest in known_hashes:
+                skipped.append({"file_name": name, "status": "processed", "duplicate_of": None, "similarity": None,
+                                "text": "", "sha256": digest, "simhash": None, "extraction": None})
+                continue
+            seen_hashes[digest] = name
+            digests[next(seq)] = digest
+            yield name, data
+
+    for i, res in iter_extract(unique_sources(), max_workers=max_workers, **limits):
+        while skipped:
+            yield emit(skipped.pop(0))
+        name = res["file_name"]
+        record = {"file_name": name, "status": "ok", "duplicate_of": None, "similarity": None, "text": res["text"],
+                  "sha256": digests.pop(i, None), "simhash": None, "extraction": {k: v for k, v in res.items() if k != "text"}}
+        if res["error"]:
+            record["status"] = "error"
+            yield emit(record)
+            continue
+        hashes = _shingle_hashes(res["text"])
+        fp, sig = simhash(hashes), minhash(hashes)
+        record["simhash"] = fp
+        match = near_index.query(fp, sig)
+        if match:
+            record.update(status="near_duplicate", duplicate_of=match[0], similarity=match[1], text="")
+        else:
+            near_index.add(fp, sig, name)
+        yield emit(record)
+    while skipped:
+        yield emit(skipped.pop(0))
@@ -0,0 +1,265 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from batch_engine import run_batch, DEFAULT_CONCURRENCY
+from llm_backend import get_backend
+from pipeline_metrics import attach_span
+from utils import analyze_batch_candidate, match_candidate_presets, prefetch_agent1_packed
+
+JOBS_FILE = "analysis_jobs.db"
+POLL_SECONDS = 1.0
+JOB_RETENTION_DAYS = 7  # 已结束的任务保留天数，之后连同简历原文一起删除
+
+
+class JobRunner:
+    """
+    后台分析任务：任务和每份简历的状态保存在 SQLite，单个常驻线程按提交顺序 (FIFO) 执行。
+    每完成一份简历立即写入结果 (检查点)。进程重启后，中断的任务重新排队，只分析尚未完成的简历。
+    已完成简历的原文在任务结束后清空 (只保留结果)，结束超过 JOB_RETENTION_DAYS 天的任务在启动时删除。
+    后端未就绪 (例如重启后还没有配置 API Key) 时任务保持排队，不会开始分析。
+    Streamlit 会话只负责提交任务和轮询进度，不占用脚本线程。
+    """
+
+    def __init__(self, path: str = JOBS_FILE, cache=None, backend=None):
+        self.path = path
+        self.cache = cache
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._cancelled = set()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    label TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    jd TEXT NOT NULL,
+                    must_haves TEXT NOT NULL,
+                    role_type TEXT NOT NULL,
+                    concurrency INTEGER NOT NULL,
+                    packed INTEGER NOT NULL DEFAULT 0,
+                    presets TEXT,
+                    mode TEXT NOT NULL DEFAULT 'full',
+                    total INTEGER NOT NULL,
+                    done INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0,
+                    created REAL NOT NULL,
+                    started REAL,
+                    finished REAL,
+                    busy_seconds REAL NOT NULL DEFAULT 0,
+                    error TEXT
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_items (
+                    job_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    file_name TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    prescreen_score REAL,
+                    parse_seconds REAL NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    PRIMARY KEY (job_id, idx)
+                )
+            """)
+            # 旧版数据库缺少的列
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "packed" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN packed INTEGER NOT NULL DEFAULT 0")
+            if "presets" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN presets TEXT")
+            if "mode" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN mode TEXT NOT NULL DEFAULT 'full'")
+            # 上次进程退出时仍在运行的任务：重新排队，已完成的简历保留
+            self._conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+        self.purge_finished()
+        self._thread = threading.Thread(target=self._run, name="analysis-jobs", daemon=True)
+        self._thread.start()
+
+    # --- 对外接口 ---
+    def submit(self, items: list, jd: str, must_haves: str, role_type: str,
+               concurrency: int = DEFAULT_CONCURRENCY, label: str = "", packed: bool = False, presets: dict = None, mode: str = "full") -> str:
+        """
+        提交任务，返回 job_id。items 为已解析 (并通过初筛) 的简历：
+        [{"file_name", "text", "prescreen_score", "seconds"}]
+        packed=True 时先把短简历打包做 Agent 1 提取，见 utils.prefetch_agent1_packed
+        presets ({名称: {"jd", "must_haves", "role_type"}}) 不为空时为多岗位匹配任务，jd 等参数只用于显示
+        mode 为分析模式 (utils.PIPELINE_MODES)
+        """
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, label, status, jd, must_haves, role_type, concurrency, packed, presets, mode, total, created) VALUES (?, ?, 'queued', ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, label or f"{role_type} · {len(items)} 份", jd, must_haves, role_type, concurrency, int(packed),
+                 json.dumps(presets, ensure_ascii=False) if presets else None, mode, len(items), now),
+            )
+            self._conn.executemany(
+                "INSERT INTO job_items (job_id, idx, file_name, text, prescreen_score, parse_seconds, status) VALUES (?, ?, ?, ?, ?, ?, 'pending')",
+                [(job_id, i, it["file_name"], it["text"], it.get("prescreen_score"), it.get("seconds", 0.0)) for i, it in enumerate(items)],
+            )
+        self._wake.set()
+        return job_id
+
+    def get(self, job_id: str) -> dict:
+        jobs = self._select("WHERE job_id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    def list_jobs(self, limit: int = 20) -> list:
+        """最近提交的任务 (新任务在前)"""
+        return self._select("ORDER BY created DESC LIMIT ?", (limit,))
+
+    def queue_position(self, job_id: str) -> int:
+        """排在该任务前面的待执行任务数"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running') AND created < (SELECT created FROM jobs WHERE job_id = ?)", (job_id,)
+            ).fetchone()
+        return row[0]
+
+    def results(self, job_id: str) -> list:
+        """已完成的结果 (按提交顺序)，任务未结束时也可读取部分结果"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT result FROM job_items WHERE job_id = ? AND result IS NOT NULL ORDER BY idx", (job_id,)
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def cancel(self, job_id: str) -> None:
+        """取消排队或运行中的任务 (正在分析的简历会跑完，但不再开始新的)"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE job_id = ? AND status IN ('queued', 'running')",
+                               (time.time(), job_id))
+            self._cancelled.add(job_id)
+
+    def retry_failed(self, job_id: str) -> int:
+        """把失败 (AI Error) 的简历和取消后未完成的简历重新排队，返回重新排队的数量"""
+        with self._lock, self._conn:
+            n = self._conn.execute(
+                "UPDATE job_items SET status = 'pending', result = NULL WHERE job_id = ? AND status != 'done'", (job_id,)
+            ).rowcount
+            if n:
+                self._conn.execute("UPDATE jobs SET status = 'queued', failed = 0, done = total - ?, finished = NULL, error = NULL WHERE job_id = ?",
+                                   (n, job_id))
+            self._cancelled.discard(job_id)
+        if n:
+            self._wake.set()
+        return n
+
+    def delete(self, job_id: str) -> None:
+        self.cancel(job_id)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM job_items WHERE job_id = ?", (job_id,))
+            self._conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def purge_finished(self, max_age_days: float = JOB_RETENTION_DAYS) -> int:
+        """删除结束超过 max_age_days 天的任务及其简历，返回删除的任务数"""
+        cutoff = time.time() - max_age_days * 86400
+        finished = "SELECT job_id FROM jobs WHERE status IN ('done', 'cancelled', 'failed') AND finished < ?"
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM job_items WHERE job_id IN ({finished})", (cutoff,))
+            return self._conn.execute(f"DELETE FROM jobs WHERE job_id IN ({finished})", (cutoff,)).rowcount
+
+    def ready(self) -> bool:
+        """后端是否已可调用；为 False 时排队的任务等待配置"""
+        return (self.backend or get_backend()).ready()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    # --- 后台线程 ---
+    def _select(self, clause: str, params: tuple) -> list:
+        with self._lock:
+            cur = self._conn.execute(f"SELECT * FROM jobs {clause}", params)
+            cols = [c[0] for c in cur.description]
+            rows = cur.fetchall()
+        return [dict(zip(cols, row)) for row in rows]
+
+    def _next_job(self):
+        jobs = self._select("WHERE status = 'queued' ORDER BY created LIMIT 1", ())
+        return jobs[0] if jobs else None
+
+    def _run(self):
+        while not self._stop.is_set():
+            job = self._next_job() if self.ready() else None
+            if job is None:
+                self._wake.wait(POLL_SECONDS)
+                self._wake.clear()
+                continue
+            try:
+                self._run_job(job)
+            except Exception as e:  # 任务级异常 (例如数据库错误) 不应拖垮后台线程
+                with self._lock, self._conn:
+                    self._conn.execute("UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE job_id = ?",
+                                       (time.time(), f"{type(e).__name__}: {e}", job["job_id"]))
+
+    def _run_job(self, job: dict):
+        job_id = job["job_id"]
+        t0 = time.time()
+        with self._lock, self._conn:
+            claimed = self._conn.execute("UPDATE jobs SET status = 'running', started = COALESCE(started, ?) WHERE job_id = ? AND status = 'queued'",
+                                         (t0, job_id)).rowcount
+            if not claimed:  # 选出后已被取消 (或已由其它线程领取)
+                return
+            items = self._conn.execute(
+                "SELECT idx, file_name, text, prescreen_score, parse_seconds FROM job_items WHERE job_id = ? AND status = 'pending' ORDER BY idx",
+                (job_id,),
+            ).fetchall()
+
+        presets = json.loads(job["presets"]) if job["presets"] else None
+        # 多岗位匹配：总并发 ≈ concurrency，在候选人之间和每人的岗位之间分配
+        inner = min(len(presets), job["concurrency"]) if presets else 1
+        outer = max(1, job["concurrency"] // inner)
+
+        # 打包预取只针对本次仍待分析的简历 (恢复的任务不会重复提取已完成的)。
+        # fast 模式一次调用即可从简历得到结果，打包预取反而多一次往返，不使用
+        if job["packed"] and items and not presets and job["mode"] != "fast":
+            prefetched = prefetch_agent1_packed([it[2] for it in items], job["role_type"], cache=self.cache, backend=self.backend,
+                                                max_workers=job["concurrency"])
+        else:
+            prefetched = [None] * len(items)
+        items = [it + (pre,) for it, pre in zip(items, prefetched)]
+
+        def worker(item):
+            if job_id in self._cancelled:
+                return None
+            idx, file_name, text, prescreen_score, parse_seconds, pre = item
+            if presets:
+                res = match_candidate_presets(text, presets, cache=self.cache, backend=self.backend, max_workers=inner, mode=job["mode"])
+            else:
+                res = analyze_batch_candidate(text, job["jd"], job["must_haves"], job["role_type"], cache=self.cache, backend=self.backend,
+                                              prefetched=pre, mode=job["mode"])
+                res['role_type'] = job["role_type"]
+            res['file_name'] = file_name
+            res['prescreen_score'] = prescreen_score
+            attach_span(res, "parse", parse_seconds)
+            return res
+
+        def on_done(i, res, done, total):
+            # 检查点：每份简历完成后立即落库
+            if res is None:
+                return
+            # run_batch 自己生成的超时 / 异常结果 (error_result) 没有经过 worker，补上文件信息
+            res.setdefault('file_name', items[i][1])
+            res.setdefault('prescreen_score', items[i][3])
+            status = "error" if res.get("name") == "Error" else "done"
+            with self._lock, self._conn:
+                self._conn.execute("UPDATE job_items SET status = ?, result = ? WHERE job_id = ? AND idx = ?",
+                                   (status, json.dumps(res, ensure_ascii=False), job_id, items[i][0]))
+                self._conn.execute("UPDATE jobs SET done = done + 1, failed = failed + ? WHERE job_id = ?", (int(status == "error"), job_id))
+
+        run_batch(items, worker, max_workers=outer, on_done=on_done)
+
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET busy_seconds = busy_seconds + ? WHERE job_id = ?", (time.time() - t0, job_id))
+            self._conn.execute("UPDATE jobs SET status = 'done', finished = ? WHERE job_id = ? AND status = 'running'", (time.time(), job_id))
+            # 已完成的简历不会再分析 (retry_failed 只重排未完成的)，原文不再保留
+            self._conn.execute("UPDATE job_items SET text = '' WHERE job_id = ? AND status = 'done'", (job_id,))
+            self._cancelled.discard(job_id)
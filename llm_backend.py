@@ -0,0 +1,187 @@
+import abc
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+MODEL_NAME = 'gemini-2.0-flash'
+REQUEST_TIMEOUT = 60  # 单次请求超时 (秒)
+
+
+class LLMError(Exception):
+    """后端调用失败。code 为 HTTP 状态码 (429 / 5xx 会被 batch_engine 视为可重试)"""
+
+    def __init__(self, message: str, code: int = None):
+        super().__init__(message)
+        self.code = code
+
+
+class LLMBackend(abc.ABC):
+    """分析流水线调用大模型的统一接口。stage 标识调用方 (agent1 / agent1_packed / agent2 / agent3 / email / email_fix)"""
+
+    model_name = ""
+
+    @abc.abstractmethod
+    def generate(self, prompt: str, json_mode: bool = False, stage: str = "") -> str:
+        """返回模型输出的文本；json_mode=True 时要求输出 JSON"""
+
+    def ready(self) -> bool:
+        """是否已具备调用条件 (例如已配置 API Key)。未就绪时后台任务保持排队，不会把简历记为失败"""
+        return True
+
+
+class GeminiBackend(LLMBackend):
+    def __init__(self, model_name: str = MODEL_NAME, request_timeout: float = REQUEST_TIMEOUT):
+        self.model_name = model_name
+        self.request_timeout = request_timeout
+
+    def generate(self, prompt: str, json_mode: bool = False, stage: str = "") -> str:
+        import google.generativeai as genai
+
+        model = genai.GenerativeModel(self.model_name)
+        kwargs = {"request_options": {"timeout": self.request_timeout}}
+        if json_mode:
+            kwargs["generation_config"] = {"response_mime_type": "application/json"}
+        return model.generate_content(prompt, **kwargs).text
+
+    def ready(self) -> bool:
+        return bool(_api_key or os.environ.get("GOOGLE_API_KEY"))
+
+
+class MockBackend(LLMBackend):
+    """
+    离线替身：不联网，按 prompt 内容确定性地返回符合各阶段 schema 的输出。
+    匹配度和是否有风险以候选人姓名为基准再加少量随机扰动，完整 / 快速两种模式的结果大体一致但不完全相同。
+    可模拟延迟 (latency ± jitter 秒)、5xx 错误率和 429 限流率，用于压测和并发调优。
+    """
+
+    model_name = "mock"
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, rate_limit_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {}  # stage -> 请求次数 (含失败)，用于压测统计
+
+    def generate(self, prompt: str, json_mode: bool = False, stage: str = "") -> str:
+        with self._lock:
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+            roll = self._rng.random()
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+        time.sleep(delay)
+        if roll < self.rate_limit_rate:
+            raise LLMError("429 Resource has been exhausted (mock)", code=429)
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise LLMError("503 Service unavailable (mock)", code=503)
+
+        seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12], 16)
+        rng = random.Random(seed)
+        if stage == "agent1":
+            return json.dumps(self._facts(prompt, rng), ensure_ascii=False)
+        if stage == "agent1_packed":
+            cvs = re.findall(r'<CV id="([^"]+)">(.*?)</CV>', prompt, re.S)
+            return json.dumps([{"cv_id": cv_id, **self._facts("CV TEXT:" + cv, rng)} for cv_id, cv in cvs], ensure_ascii=False)
+        if stage == "agent2":
+            return self._critique(self._facts_name(prompt), rng)
+        if stage == "agent3":
+            return json.dumps(self._decision(prompt, rng, self._facts_name(prompt)), ensure_ascii=False)
+        if stage == "fused":
+            if "CV TEXT:" in prompt:  # 直接读简历：身份字段也从简历提取
+                facts = self._facts(prompt, rng)
+                data = self._decision(prompt, rng, facts["name"])
+                data.update({k: facts[k] for k in ("email", "language_preference")})
+            else:
+                data = self._decision(prompt, rng, self._facts_name(prompt))
+            name = data["name"]
+            data["critique_notes"] = self._critique(name, rng).replace("\n", " ")
+            return json.dumps(data, ensure_ascii=False)
+        if stage in ("email", "email_fix"):
+            return "您好，\n\n我们对您的背景非常感兴趣，希望下周能与您进行 15 分钟的电话沟通。\n\n此致\n敬礼"
+        return json.dumps({"text": "mock"}) if json_mode else "mock"
+
+    @staticmethod
+    def _facts(prompt: str, rng: random.Random) -> dict:
+        cv = prompt.split("CV TEXT:", 1)[-1]
+        first_line = next((l.strip() for l in cv.splitlines() if l.strip()), "Candidate")
+        email = re.search(r"[\w.+-]+@[\w-]+\.[\w.]+", cv)
+        return {
+            "name": first_line.split(" - ")[0][:40],
+            "email": email.group(0) if email else "",
+            "language_preference": "Chinese" if re.search(r"[一-鿿]", cv) else "English",
+            "education": "PhD",
+            "total_years_of_experience": rng.randint(1, 15),
+            "hard_skills": rng.sample(["CRISPR", "qPCR", "Python", "单细胞测序", "项目管理", "Office"], 3),
+            "top_papers": [{"title": f"Mock study {rng.randint(1, 999)}", "journal": rng.choice(["Nature", "Cell", "Blood"])}],
+        }
+
+    @staticmethod
+    def _profile(name: str) -> tuple:
+        """候选人的基准 (匹配度, 是否有风险)，只取决于姓名"""
+        base = random.Random(hashlib.sha256(str(name).encode("utf-8")).hexdigest())
+        return base.randint(20, 95), base.random() < 0.7
+
+    @staticmethod
+    def _facts_name(prompt: str) -> str:
+        """从 prompt 中的 Agent 1 事实 JSON (json.dumps 默认转义非 ASCII) 取姓名"""
+        m = re.search(r'"name":\s*"((?:[^"\\]|\\.)*)"', prompt)
+        return json.loads(f'"{m.group(1)}"') if m else "Candidate"
+
+    def _critique(self, name: str, rng: random.Random) -> str:
+        risky = self._profile(name)[1] != (rng.random() < 0.1)  # 10% 的情况与基准相反
+        return "\n".join(f"- 风险{i + 1}: 模拟风险点 {rng.randint(1, 99)}" for i in range(3)) if risky else "无明显风险"
+
+    def _decision(self, prompt: str, rng: random.Random, name: str = None) -> dict:
+        def field(key, default=""):
+            m = re.search(rf'"{key}":\s*"([^"]*)"', prompt)
+            return m.group(1) if m else default
+
+        name = name or field("name", "Candidate")
+        data = {
+            "name": name,
+            "email": field("email"),
+            "language_preference": field("language_preference", "English"),
+            "fit_score": max(0, min(100, self._profile(name)[0] + rng.randint(-8, 8))),
+            "summary": "模拟画像总结",
+            "critique_notes": field("critique_notes", "无明显风险"),
+            "strengths": ["模拟优势"],
+            "gaps": ["模拟劣势"],
+        }
+        if '"bibliometrics"' in prompt:
+            data["bibliometrics"] = {"h_index": rng.randint(3, 60), "total_citations": rng.randint(50, 20000), "total_paper_count": rng.randint(5, 200)}
+            data["representative_papers"] = [{"title": f"Mock paper {rng.randint(1, 999)}", "journal": "Nature", "significance": "模拟"}]
+        elif '"technical_skills"' in prompt:
+            data["technical_skills"] = ["qPCR", "细胞培养"]
+            data["lab_experience_years"] = rng.randint(0, 10)
+            data["project_participation"] = ["模拟项目"]
+        else:
+            data["core_competencies"] = ["项目管理"]
+            data["software_tools"] = ["Office"]
+        return data
+
+
+_api_key = ""  # configure_api_key() 设置的 Key (google.generativeai 的配置是进程级的)
+_default_backend = GeminiBackend()
+
+
+def configure_api_key(api_key: str) -> None:
+    global _api_key
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    _api_key = api_key
+
+
+def get_backend() -> LLMBackend:
+    return _default_backend
+
+
+def set_backend(backend: LLMBackend) -> None:
+    """替换进程默认后端 (例如压测时换成 MockBackend)"""
+    global _default_backend
+    _default_backend = backend
@@ -0,0 +1,161 @@
+import contextvars
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# 所有会话共用一个 API Key，限额按进程统一控制；可用环境变量覆盖，0 表示不限
+DEFAULT_RPM = int(os.environ.get("MEDRECRUIT_LLM_RPM", 1000))
+DEFAULT_TPM = int(os.environ.get("MEDRECRUIT_LLM_TPM", 1_000_000))
+RESPONSE_TOKEN_RESERVE = 800  # 发出请求前为回复预留的 token，返回后按实际用量多退少补
+
+# 优先级从高到低：interactive (邮件草稿、单人重新分析等有人在等的请求) 总是先于 bulk (批量分析任务)
+LANES = ("interactive", "bulk")
+RECENT_WAITS = 50  # 每个通道保留最近多少次的排队时间
+
+_lane = contextvars.ContextVar("llm_lane", default="bulk")
+
+
+class TokenBucket:
+    """令牌桶：每分钟补充 per_minute，容量为一分钟的量。余额可以为负 (实际用量超出预估时记为欠账)"""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self._rate = per_minute / 60.0
+        self._t = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._t) * self._rate)
+        self._t = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """还需等待多少秒才能取出 amount (超过容量的请求等到桶满即可)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self._rate
+
+    def take(self, amount: float):
+        self.level -= amount
+
+
+class LLMScheduler:
+    """
+    进程级 LLM 调度器：所有大模型请求发出前都在这里排队，按请求数 / token 数两个令牌桶限速。
+    每个通道内先到先得；只要高优先级通道还有请求在排队，低优先级通道就不放行。
+    线程安全，Streamlit 的所有会话和后台任务线程共用同一个实例 (见 get_scheduler)。
+    """
+
+    def __init__(self, rpm: int = DEFAULT_RPM, tpm: int = DEFAULT_TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = TokenBucket(rpm) if rpm else None
+        self._tokens = TokenBucket(tpm) if tpm else None
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._queues = {lane: deque() for lane in LANES}
+        self._stats = {lane: {"requests": 0, "wait_seconds": 0.0, "max_wait": 0.0, "recent": deque(maxlen=RECENT_WAITS)} for lane in LANES}
+
+    def acquire(self, tokens: int, lane: str = None) -> float:
+        """阻塞直到轮到本请求且两个桶都有余量，扣减后返回排队秒数。lane 缺省取当前上下文的通道 (见 priority)"""
+        lane = lane or _lane.get()
+        ticket = next(self._seq)
+        t0 = time.monotonic()
+        with self._cond:
+            queue = self._queues[lane]
+            queue.append(ticket)
+            try:
+                while True:
+                    if not self._is_next(lane, ticket):
+                        self._cond.wait()
+                        continue
+                    now = time.monotonic()
+                    delay = max(self._requests.wait_time(1, now) if self._requests else 0.0,
+                                self._tokens.wait_time(tokens, now) if self._tokens else 0.0)
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                if self._requests:
+                    self._requests.take(1)
+                if self._tokens:
+                    self._tokens.take(tokens)
+            finally:
+                queue.remove(ticket)
+                self._cond.notify_all()
+            waited = time.monotonic() - t0
+            stats = self._stats[lane]
+            stats["requests"] += 1
+            stats["wait_seconds"] += waited
+            stats["max_wait"] = max(stats["max_wait"], waited)
+            stats["recent"].append(waited)
+        return waited
+
+    def settle(self, extra_tokens: int) -> None:
+        """请求完成后按实际 token 用量修正 (extra_tokens = 实际 - 预扣，可为负)"""
+        if self._tokens and extra_tokens:
+            with self._cond:
+                self._tokens.take(extra_tokens)
+
+    def stats(self) -> dict:
+        """各通道的排队深度和等待时间，以及两个桶的当前余量"""
+        with self._cond:
+            now = time.monotonic()
+            lanes = {}
+            for lane in LANES:
+                s = self._stats[lane]
+                recent = list(s["recent"])
+                lanes[lane] = {
+                    "queued": len(self._queues[lane]),
+                    "requests": s["requests"],
+                    "mean_wait": s["wait_seconds"] / s["requests"] if s["requests"] else 0.0,
+                    "recent_wait": sum(recent) / len(recent) if recent else 0.0,
+                    "max_wait": s["max_wait"],
+                }
+            for bucket in (self._requests, self._tokens):
+                if bucket:
+                    bucket.wait_time(0, now)  # 只为刷新余量
+            return {
+                "lanes": lanes,
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "requests_available": self._requests.level if self._requests else None,
+                "tokens_available": self._tokens.level if self._tokens else None,
+            }
+
+    def _is_next(self, lane: str, ticket: int) -> bool:
+        for name in LANES:
+            if self._queues[name]:
+                return name == lane and self._queues[name][0] == ticket
+        return False
+
+
+@contextmanager
+def priority(lane: str):
+    """在此上下文中 (包括其中 batch_engine.run_batch 启动的工作线程) 发出的请求使用 lane 通道"""
+    if lane not in LANES:
+        raise ValueError(f"未知通道: {lane}")
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def interactive():
+    return priority("interactive")
+
+
+_default_scheduler = LLMScheduler()
+
+
+def get_scheduler() -> LLMScheduler:
+    return _default_scheduler
+
+
+def set_scheduler(scheduler: LLMScheduler) -> None:
+    """替换进程默认调度器 (例如多进程时按进程数拆分限额)"""
+    global _default_scheduler
+    _default_scheduler = scheduler
@@ -0,0 +1,192 @@
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+# 默认 Gmail，可通过环境变量或参数指向其他服务器 (例如本地调试用的 SMTP 替身)
+SMTP_HOST = os.environ.get("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "587"))
+SMTP_TIMEOUT = 30
+
+DEFAULT_RATE_PER_MINUTE = 20
+DEFAULT_MAX_RETRIES = 3
+IDLE_CLOSE = 60  # 空闲多久关闭连接 (秒)
+
+
+def build_message(sender_email, recipient_email, subject, body) -> MIMEMultipart:
+    message = MIMEMultipart()
+    message['From'] = sender_email
+    message['To'] = recipient_email
+    message['Subject'] = subject
+    message.attach(MIMEText(body, 'plain'))
+    return message
+
+
+def open_session(sender_email, sender_password, host=SMTP_HOST, port=SMTP_PORT, use_tls=True) -> smtplib.SMTP:
+    """建立已认证的 SMTP 连接。use_tls=False / 无密码时跳过 STARTTLS / 登录 (本地测试服务器)"""
+    session = smtplib.SMTP(host, port, timeout=SMTP_TIMEOUT)
+    if use_tls:
+        session.starttls()
+    if sender_password:
+        session.login(sender_email, sender_password)
+    return session
+
+
+def is_transient(exc: Exception) -> bool:
+    """连接断开、网络错误和 4xx 临时错误值得重试；认证失败和 5xx 永久错误不重试"""
+    # 注意 SMTPException 本身是 OSError 的子类，需先判断具体类型
+    if isinstance(exc, smtplib.SMTPAuthenticationError):
+        return False
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in exc.recipients.values())
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+def _connection_lost(exc: Exception) -> bool:
+    return isinstance(exc, smtplib.SMTPServerDisconnected) or (isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException))
+
+
+class BulkMailer:
+    """
+    批量发信：后台线程从队列取邮件，复用同一个已认证的 SMTP 连接 (断开时自动重连)，
+    按 rate_per_minute 限速，临时错误指数退避重试。每个收件人的状态可随时通过 snapshot() 读取。
+    """
+
+    def __init__(self, sender_email, sender_password, host=SMTP_HOST, port=SMTP_PORT, use_tls=True,
+                 rate_per_minute=DEFAULT_RATE_PER_MINUTE, max_retries=DEFAULT_MAX_RETRIES):
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.interval = 60.0 / rate_per_minute if rate_per_minute else 0.0
+        self.max_retries = max_retries
+        self._queue = queue.Queue()
+        self._status = {}
+        self._lock = threading.Lock()
+        self._session = None
+        self._reconnect = False
+        self._last_send = 0.0
+        self._thread = None
+        self._stop = threading.Event()
+
+    # --- 对外接口 ---
+    def enqueue(self, key, recipient_email, subject, body, resend: bool = False) -> bool:
+        """
+        加入发送队列；key 用于在 UI 中对应候选人 (例如 candidate_id)。
+        同一 key 已在队列中 / 发送中 / 已发送时跳过并返回 False (重复点击不会重复发信)；
+        resend=True 时允许再次发送已发送的 key，仍在队列中的不会重复加入。失败的 key 总是可以重新加入。
+        """
+        with self._lock:
+            current = self._status.get(key, {}).get("status")
+            if current in ("queued", "sending", "retrying") or (current == "sent" and not resend):
+                return False
+            self._status[key] = {"key": key, "recipient": recipient_email, "status": "queued", "attempts": 0, "error": None, "sent_at": None}
+        self._queue.put((key, recipient_email, subject, body))
+        self.start()
+        return True
+
+    def reconfigure(self, sender_email, sender_password, host=SMTP_HOST, port=SMTP_PORT, use_tls=True,
+                    rate_per_minute=DEFAULT_RATE_PER_MINUTE) -> None:
+        """
+        更换发信账号 / 服务器 / 速率，队列中和重试中的邮件以及各收件人状态原样保留。
+        正在发送的那一封不受影响；连接参数变化时从下一次尝试起换用新连接。
+        """
+        server = (sender_email, sender_password, host, port, use_tls)
+        with self._lock:
+            if server != (self.sender_email, self.sender_password, self.host, self.port, self.use_tls):
+                self._reconnect = True
+            self.sender_email, self.sender_password, self.host, self.port, self.use_tls = server
+            self.interval = 60.0 / rate_per_minute if rate_per_minute else 0.0
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="bulk-mailer", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """等待队列发完，返回是否已全部处理"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(1 for s in self._status.values() if s["status"] in ("queued", "sending", "retrying"))
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [dict(s) for s in self._status.values()]
+
+    # --- 后台线程 ---
+    def _update(self, key, **fields):
+        with self._lock:
+            self._status[key].update(fields)
+
+    def _run(self):
+        # 线程常驻直到 stop()，空闲超过 IDLE_CLOSE 秒时先关闭连接，下次发送再重连
+        try:
+            while not self._stop.is_set():
+                try:
+                    item = self._queue.get(timeout=1.0)
+                except queue.Empty:
+                    if self._session is not None and time.monotonic() - self._last_send > IDLE_CLOSE:
+                        self._close()
+                    continue
+                self._send_with_retry(*item)
+        finally:
+            self._close()
+
+    def _throttle(self):
+        wait = self._last_send + self.interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_send = time.monotonic()
+
+    def _send_with_retry(self, key, recipient_email, subject, body):
+        for attempt in range(self.max_retries + 1):
+            self._update(key, status="sending", attempts=attempt + 1)
+            self._throttle()
+            # 每次尝试都读取当前配置，reconfigure() 之后的邮件用新账号发送
+            with self._lock:
+                sender_email, sender_password, host, port, use_tls = self.sender_email, self.sender_password, self.host, self.port, self.use_tls
+                reconnect, self._reconnect = self._reconnect, False
+            if reconnect:
+                self._close()
+            try:
+                if self._session is None:
+                    self._session = open_session(sender_email, sender_password, host, port, use_tls)
+                message = build_message(sender_email, recipient_email, subject, body).as_string()
+                self._session.sendmail(sender_email, recipient_email, message)
+                self._update(key, status="sent", error=None, sent_at=time.time())
+                return
+            except Exception as e:
+                if _connection_lost(e):
+                    self._close()
+                if attempt >= self.max_retries or not is_transient(e):
+                    self._update(key, status="failed", error=f"{type(e).__name__}: {e}")
+                    return
+                self._update(key, status="retrying", error=f"{type(e).__name__}: {e}")
+                time.sleep(min(30.0, 2 ** attempt))
+
+    def _close(self):
+        if self._session is not None:
+            try:
+                self._session.quit()
+            except Exception:
+                pass
+            self._session = None
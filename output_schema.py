@@ -0,0 +1,243 @@
+import json
+import re
+
+from resume_compress import role_key
+
+# --- 各阶段输出 schema：字段 -> (类型, 缺失时的默认值, 是否值得补请求) ---
+# 类型: "str" / "name" / "email" / "language" / "int_score" / "list" / "dict" / "any"。
+# name / email 用于直接从简历提取的场景：空值、默认值和 prompt 中的说明文字都视为无效
+# 默认值为 None 的字段必须有效，补请求后仍无效则该阶段失败；不值得补请求的字段 (如邮箱，简历里可能本来就没有) 直接填默认值
+AGENT1_SCHEMA = {
+    "name": ("str", "", True),
+    "email": ("str", "", False),
+    "language_preference": ("language", "English", False),
+}
+
+_AGENT3_COMMON = {
+    "name": ("str", "Candidate", False),
+    "email": ("str", "", False),
+    "language_preference": ("language", "English", False),
+    "fit_score": ("int_score", None, True),
+    "summary": ("str", "", True),
+    "critique_notes": ("str", "", False),
+    "strengths": ("list", [], False),
+    "gaps": ("list", [], False),
+}
+
+AGENT3_SCHEMAS = {
+    "PI": {**_AGENT3_COMMON,
+           "bibliometrics": ("dict", {"h_index": "N/A", "total_citations": "N/A", "total_paper_count": "N/A"}, True),
+           "representative_papers": ("list", [], True)},
+    "RA": {**_AGENT3_COMMON,
+           "technical_skills": ("list", [], True),
+           "lab_experience_years": ("any", "N/A", True),
+           "project_participation": ("list", [], False)},
+    "Admin": {**_AGENT3_COMMON,
+              "core_competencies": ("list", [], True),
+              "software_tools": ("list", [], False)},
+}
+
+# 给 LLM 看的字段说明 (补请求时只列出无效字段)
+FIELD_HINTS = {
+    "str": "string",
+    "name": "candidate's real name from the CV",
+    "email": "candidate's email address from the CV, empty string if none",
+    "language": '"Chinese" or "English"',
+    "int_score": "integer 0-100",
+    "list": "JSON array",
+    "dict": "JSON object",
+    "any": "string or number",
+}
+
+_FENCE_RE = re.compile(r"^\s*```[a-zA-Z]*\s*|\s*```\s*$")
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_SCORE_RE = re.compile(r"-?\d+(?:\.\d+)?")
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PLACEHOLDER_NAMES = {"", "candidate", "name", "n/a", "unknown", "姓名", "候选人"}
+
+
+def agent3_schema(role_type: str) -> dict:
+    return AGENT3_SCHEMAS[role_key(role_type)]
+
+
+def fused_schema(role_type: str, from_resume: bool = False) -> dict:
+    """
+    快速模式 (风控 + 决策合并为一次调用) 的输出与 Agent 3 相同；风险点由同一次调用给出，缺失时补请求。
+    from_resume=True (没有 Agent 1 结果，直接读简历) 时姓名和邮箱也由这次调用提取，缺失时同样补请求
+    """
+    schema = {**agent3_schema(role_type), "critique_notes": ("str", "", True)}
+    if from_resume:
+        schema["name"] = ("name", "Candidate", True)
+        schema["email"] = ("email", "", True)
+    return schema
+
+
+# --- 本地 JSON 修复 ---
+def _scan(text: str) -> tuple:
+    """返回 (未闭合的括号栈, 是否停在字符串内部)"""
+    stack, in_string, escape = [], False, False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+        elif ch in "}]" and stack:
+            stack.pop()
+    return stack, in_string
+
+
+def _close_truncated(text: str) -> str:
+    """补全被截断的 JSON：闭合字符串，处理悬空的键 / 逗号 / 半个字面量，再按栈补上 ] 和 }"""
+    stack, in_string = _scan(text)
+    if not stack:
+        return text
+    body = text + '"' if in_string else text.rstrip()
+    body = re.sub(r"([:\[,]\s*)(?:t|tr|tru|f|fa|fal|fals|n|nu|nul)$", r"\1null", body)
+    body = re.sub(r"[,\s]+$", "", body)
+    if body.endswith(":"):
+        body += " null"
+    elif stack[-1] == "{" and re.search(r'[{,]\s*"(?:[^"\\]|\\.)*"$', body):
+        body += ": null"  # 截在键名之后
+    stack, _ = _scan(body)
+    return body + "".join("}" if c == "{" else "]" for c in reversed(stack))
+
+
+def parse_json_lenient(text: str) -> tuple:
+    """
+    解析 LLM 返回的 JSON，失败时本地修复：去代码块标记、截掉前后说明文字、删除多余逗号、补全截断的结构。
+    返回 (数据, 是否经过修复)；无法修复时抛 ValueError。
+    """
+    try:
+        return json.loads(text), False
+    except (TypeError, ValueError):
+        pass
+    s = _FENCE_RE.sub("", (text or "").strip())
+    starts = [i for i in (s.find("{"), s.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError("响应中没有 JSON")
+    s = s[min(starts):]
+    candidates = [s]
+    end = max(s.rfind("}"), s.rfind("]"))
+    if end >= 0:
+        candidates.insert(0, s[:end + 1])  # 去掉结尾的说明文字
+    for c in candidates:
+        for attempt in (c, _TRAILING_COMMA_RE.sub(r"\1", c), _TRAILING_COMMA_RE.sub(r"\1", _close_truncated(c))):
+            try:
+                return json.loads(attempt), True
+            except ValueError:
+                continue
+    raise ValueError("JSON 无法修复")
+
+
+# --- 校验与类型转换 ---
+def coerce_score(value):
+    """把 "85"、"85/100"、"85%"、85.6 等转成 0-100 的整数，无法识别返回 None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        m = _SCORE_RE.search(str(value or ""))
+        if not m:
+            return None
+        number = float(m.group(0))
+        if re.search(r"/\s*10\b", str(value)) and not re.search(r"/\s*100", str(value)):
+            number *= 10  # "8.5/10"
+    return max(0, min(100, int(round(number))))
+
+
+def _coerce(kind: str, value):
+    """返回 (转换后的值, 是否有效)"""
+    if value is None:
+        return None, False
+    if kind == "int_score":
+        score = coerce_score(value)
+        return score, score is not None
+    if kind == "language":
+        v = str(value).strip().lower()
+        if v.startswith(("chinese", "zh", "中文", "汉语")):
+            return "Chinese", True
+        if v.startswith(("english", "en", "英文", "英语")):
+            return "English", True
+        return None, False
+    if kind == "list":
+        if isinstance(value, list):
+            return value, True
+        if isinstance(value, str) and value.strip():
+            return [v.strip() for v in re.split(r"[,，;；\n]", value) if v.strip()], True
+        return None, False
+    if kind == "dict":
+        return (value, True) if isinstance(value, dict) else (None, False)
+    if kind == "name":
+        v = str(value).strip() if not isinstance(value, (dict, list)) else ""
+        return (v, True) if v.lower() not in _PLACEHOLDER_NAMES and "从简历" not in v else (None, False)
+    if kind == "email":
+        m = _EMAIL_RE.search(str(value))
+        return (m.group(0), True) if m else (None, False)
+    if kind == "str":
+        if isinstance(value, (dict, list)):
+            return None, False
+        return str(value), True
+    return value, True
+
+
+def validate(data, schema: dict) -> tuple:
+    """
+    按 schema 校验并转换类型。data 为列表时取第一个对象 (常见的 list-vs-dict 问题)。
+    键名大小写 / 空格不敏感 ("Fit Score" -> fit_score)。返回 (数据, 仍无效的字段列表)，无效字段保留原值。
+    """
+    if isinstance(data, list):
+        data = next((d for d in data if isinstance(d, dict)), {})
+    if not isinstance(data, dict):
+        data = {}
+    normalized = {str(k).strip().lower().replace(" ", "_"): k for k in data}
+    out = dict(data)
+    invalid = []
+    for field, (kind, _, _) in schema.items():
+        key = field if field in data else normalized.get(field)
+        value, ok = _coerce(kind, data.get(key) if key is not None else None)
+        if key is not None and key != field:
+            out.pop(key, None)
+        if ok:
+            out[field] = value
+        else:
+            invalid.append(field)
+    return out, invalid
+
+
+def refetch_fields(schema: dict, invalid: list) -> list:
+    """值得针对性补请求的无效字段"""
+    return [f for f in invalid if schema[f][2]]
+
+
+def fill_defaults(data: dict, schema: dict, fields: list) -> list:
+    """给仍无效的字段填默认值，返回没有默认值 (必须有效) 的字段"""
+    missing = []
+    for field in fields:
+        default = schema[field][1]
+        if default is None:
+            missing.append(field)
+        else:
+            data[field] = json.loads(json.dumps(default))
+    return missing
+
+
+def field_fix_prompt(original_prompt: str, partial: dict, fields: list, schema: dict) -> str:
+    """只针对无效字段的补请求"""
+    spec = ", ".join(f'"{f}": {FIELD_HINTS[schema[f][0]]}' for f in fields)
+    return f"""
+    The previous answer to the task below was missing or had invalid values for these fields: {', '.join(fields)}.
+    Return ONLY a JSON object with exactly these fields: {{{spec}}}
+
+    PREVIOUS PARTIAL ANSWER: {json.dumps(partial, ensure_ascii=False)[:4000]}
+
+    ORIGINAL TASK:
+    {original_prompt}
+    """
@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+STAGES = ["parse", "agent1", "agent2", "agent3", "fused"]
+# 结构化输出的计数：本地修复成功的 JSON、补请求的字段数、补请求后仍无效 (已填默认值或导致失败) 的字段数
+OUTPUT_COUNTERS = ["json_repairs", "refetched_fields", "schema_errors"]
+
+
+class PipelineTrace:
+    """单个候选人的分阶段耗时、token、重试与失败原因，最终以 dict 形式挂到候选人记录的 metrics 字段上"""
+
+    def __init__(self):
+        self.spans = []
+        self.meta = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage: str):
+        rec = {"stage": stage, "seconds": 0.0, "prompt_tokens": 0, "response_tokens": 0, "retries": 0, "status": "ok", "error": None}
+        rec.update(dict.fromkeys(OUTPUT_COUNTERS, 0))
+        t0 = time.perf_counter()
+        try:
+            yield rec
+        except Exception as e:
+            rec["status"] = "error"
+            rec["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            rec["seconds"] = time.perf_counter() - t0
+            with self._lock:
+                self.spans.append(rec)
+
+    def to_dict(self) -> dict:
+        return {
+            "spans": list(self.spans),
+            "total_seconds": sum(s["seconds"] for s in self.spans),
+            "retries": sum(s["retries"] for s in self.spans),
+            "prompt_tokens": sum(s["prompt_tokens"] for s in self.spans),
+            "response_tokens": sum(s["response_tokens"] for s in self.spans),
+            **{k: sum(s.get(k, 0) for s in self.spans) for k in OUTPUT_COUNTERS},
+            "failures": [f"{s['stage']}: {s['error']}" for s in self.spans if s["status"] == "error"],
+            **self.meta,
+        }
+
+
+def attach_span(record: dict, stage: str, seconds: float, error: str = None) -> None:
+    """把流水线外测得的阶段 (例如简历解析) 补记到候选人记录上"""
+    metrics = record.setdefault("metrics", {"spans": [], "total_seconds": 0.0, "retries": 0, "prompt_tokens": 0, "response_tokens": 0, "failures": []})
+    metrics["spans"].insert(0, {"stage": stage, "seconds": seconds, "prompt_tokens": 0, "response_tokens": 0, "retries": 0,
+                                "status": "error" if error else "ok", "error": error, **dict.fromkeys(OUTPUT_COUNTERS, 0)})
+    metrics["total_seconds"] += seconds
+    if error:
+        metrics["failures"].append(f"{stage}: {error}")
+
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def summarize(records: list, wall_seconds: float = None) -> dict:
+    """汇总一批候选人的指标：吞吐、各阶段耗时分布、最慢阶段、错误率与失败原因"""
+    stages = {}
+    failed = 0
+    reasons = {}
+    for r in records:
+        metrics = r.get("metrics") or {}
+        failures = metrics.get("failures", [])
+        if r.get("name") == "Error" and not failures:
+            failures = [str(r.get("summary", "unknown"))]
+        if failures:
+            failed += 1
+        for f in failures:
+            reason = ": ".join(f.split(": ")[:2])  # "阶段: 异常类型"
+            reasons[reason] = reasons.get(reason, 0) + 1
+        for s in metrics.get("spans", []):
+            st = stages.setdefault(s["stage"], {"seconds": [], "retries": 0, "errors": 0, "prompt_tokens": 0, "response_tokens": 0, "cache_hits": 0,
+                                                **dict.fromkeys(OUTPUT_COUNTERS, 0)})
+            st["seconds"].append(s["seconds"])
+            st["retries"] += s["retries"]
+            st["errors"] += s["status"] == "error"
+            st["cache_hits"] += s["status"] == "cache_hit"
+            st["prompt_tokens"] += s["prompt_tokens"]
+            st["response_tokens"] += s["response_tokens"]
+            for k in OUTPUT_COUNTERS:
+                st[k] += s.get(k, 0)  # 旧记录没有这些字段
+
+    stage_stats = {}
+    for name in sorted(stages, key=lambda n: STAGES.index(n) if n in STAGES else len(STAGES)):
+        st = stages[name]
+        secs = st.pop("seconds")
+        stage_stats[name] = {"count": len(secs), "mean": sum(secs) / len(secs), "p50": _percentile(secs, 50),
+                             "p95": _percentile(secs, 95), "p99": _percentile(secs, 99), "sum": sum(secs), **st}
+
+    total = len(records)
+    return {
+        "candidates": total,
+        "failed": failed,
+        "error_rate": failed / total if total else 0.0,
+        "wall_seconds": wall_seconds,
+        "throughput_per_min": total / wall_seconds * 60 if wall_seconds else None,
+        "slowest_stage": max(stage_stats, key=lambda n: stage_stats[n]["mean"]) if stage_stats else None,
+        "stages": stage_stats,
+        "failure_reasons": reasons,
+    }
+
+
+def to_jsonl(records: list) -> str:
+    """每个候选人一行：文件名、姓名、得分与完整 metrics"""
+    lines = []
+    for r in records:
+        lines.append(json.dumps({"file_name": r.get("file_name"), "name": r.get("name"), "fit_score": r.get("fit_score"),
+                                 "metrics": r.get("metrics")}, ensure_ascii=False))
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def to_prometheus(summary: dict, prefix: str = "medrecruit") -> str:
+    """Prometheus textfile collector 格式 (node_exporter --collector.textfile)"""
+    out = []
+
+    def metric(name, kind, help_text, samples):
+        out.append(f"# HELP {prefix}_{name} {help_text}")
+        out.append(f"# TYPE {prefix}_{name} {kind}")
+        for labels, value in samples:
+            label_str = "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels.items()) + "}" if labels else ""
+            out.append(f"{prefix}_{name}{label_str} {value}")
+
+    stages = summary["stages"]
+    metric("candidates_total", "counter", "Candidates processed", [({}, summary["candidates"])])
+    metric("candidate_failures_total", "counter", "Candidates with at least one failed stage", [({}, summary["failed"])])
+    if summary.get("throughput_per_min") is not None:
+        metric("throughput_candidates_per_minute", "gauge", "Batch throughput", [({}, round(summary["throughput_per_min"], 3))])
+    metric("stage_seconds_sum", "counter", "Total time spent per stage", [({"stage": n}, round(s["sum"], 6)) for n, s in stages.items()])
+    metric("stage_seconds_count", "counter", "Number of stage executions", [({"stage": n}, s["count"]) for n, s in stages.items()])
+    metric("stage_seconds_p95", "gauge", "95th percentile stage latency", [({"stage": n}, round(s["p95"], 6)) for n, s in stages.items()])
+    metric("stage_retries_total", "counter", "LLM retries per stage", [({"stage": n}, s["retries"]) for n, s in stages.items()])
+    metric("stage_errors_total", "counter", "Failed stage executions", [({"stage": n}, s["errors"]) for n, s in stages.items()])
+    metric("stage_tokens_total", "counter", "Estimated tokens per stage",
+           [({"stage": n, "direction": d}, s[f"{d}_tokens"]) for n, s in stages.items() for d in ("prompt", "response")])
+    metric("stage_json_repairs_total", "counter", "LLM responses fixed by local JSON repair", [({"stage": n}, s["json_repairs"]) for n, s in stages.items()])
+    metric("stage_refetched_fields_total", "counter", "Fields re-requested after schema validation", [({"stage": n}, s["refetched_fields"]) for n, s in stages.items()])
+    metric("stage_schema_errors_total", "counter", "Fields still invalid after repair and re-request", [({"stage": n}, s["schema_errors"]) for n, s in stages.items()])
+    metric("failure_reasons_total", "counter", "Failures by reason", [({"reason": r}, n) for r, n in summary["failure_reasons"].items()])
+    return "\n".join(out) + "\n"
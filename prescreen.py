@@ -0,0 +1,116 @@
+import math
+import re
+from collections import Counter
+
+# 中文按字符 bigram 切分，英文/数字按单词切分
+_TOKEN_RE = re.compile(r"[一-鿿]+|[a-z0-9][a-z0-9+#.\-]*[a-z0-9+#]|[a-z0-9]")
+_MUST_HAVE_SPLIT = re.compile(r"[,，;；、/\n]+")
+
+MUST_HAVE_BOOST = 3.0  # 硬性要求中的词权重高于 JD 正文
+
+
+def tokenize(text: str) -> list:
+    tokens = []
+    for run in _TOKEN_RE.findall((text or "").lower()):
+        if "一" <= run[0] <= "鿿":
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def split_must_haves(must_haves: str) -> list:
+    return [m.strip() for m in _MUST_HAVE_SPLIT.split(must_haves or "") if m.strip()]
+
+
+class PrescreenIndex:
+    """简历文本的内存倒排索引，使用 BM25 打分"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # term -> {doc_id: tf}
+        self.doc_len = {}
+        self._total_len = 0
+
+    def add(self, doc_id, text: str) -> None:
+        counts = Counter(tokenize(text))
+        length = sum(counts.values())
+        self.doc_len[doc_id] = length
+        self._total_len += length
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self) - df + 0.5) / (df + 0.5))
+
+    def score(self, weighted_terms: dict) -> dict:
+        """weighted_terms: term -> 查询权重。只遍历命中词的倒排表，返回 doc_id -> BM25 分数"""
+        scores = {doc_id: 0.0 for doc_id in self.doc_len}
+        if not self.doc_len:
+            return scores
+        avg_len = self._total_len / len(self) or 1
+        for term, weight in weighted_terms.items():
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf(term)
+            for doc_id, tf in posting.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avg_len)
+                scores[doc_id] += weight * idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def contains_all(self, doc_id, terms: list) -> bool:
+        return all(doc_id in self.postings.get(t, ()) for t in terms)
+
+
+def build_query(jd_text: str, must_haves: str) -> dict:
+    weights = {}
+    for term in tokenize(jd_text):
+        weights[term] = weights.get(term, 0.0) + 1.0
+    for term in tokenize(must_haves):
+        weights[term] = weights.get(term, 0.0) + MUST_HAVE_BOOST
+    return weights
+
+
+def prescreen(texts: list, jd_text: str, must_haves: str, top_k: int = None, threshold: float = None) -> list:
+    """
+    对一批简历做本地初筛，不调用任何 LLM。返回与 texts 顺序一致的列表：
+    {"score": 0-100 (相对本批最高分), "bm25": 原始分, "must_have_hits": [...], "must_have_total": n, "selected": bool}
+    top_k / threshold 同时给出时取交集；都不给则全部 selected。
+    """
+    index = PrescreenIndex()
+    for i, text in enumerate(texts):
+        index.add(i, text)
+    raw = index.score(build_query(jd_text, must_haves))
+    best = max(raw.values(), default=0.0) or 1.0
+
+    items = split_must_haves(must_haves)
+    item_terms = [(item, tokenize(item)) for item in items]
+    results = []
+    for i in range(len(texts)):
+        hits = [item for item, terms in item_terms if terms and index.contains_all(i, terms)]
+        results.append({
+            "score": round(raw[i] / best * 100, 1),
+            "bm25": raw[i],
+            "must_have_hits": hits,
+            "must_have_total": len(items),
+            "selected": True,
+        })
+
+    if threshold is not None:
+        for r in results:
+            r["selected"] = r["score"] >= threshold
+    if top_k is not None:
+        ranked = sorted(range(len(results)), key=lambda i: results[i]["bm25"], reverse=True)
+        keep = set(ranked[:top_k])
+        for i, r in enumerate(results):
+            r["selected"] = r["selected"] and i in keep
+    return results
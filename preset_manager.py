@@ -1,33 +1,148 @@
 import json
 import os
+import sqlite3
+import threading
+import time
+
+DB_FILE = "job_presets.db"
+LEGACY_JSON_FILE = "job_presets.json"  # 旧版存储，首次启动时自动导入
+
+# 进程内缓存：以数据库文件的 (mtime_ns, size) 作为版本戳，未变化时 Streamlit 重跑不读库
+_cache = {"stamp": None, "presets": {}}
+_lock = threading.Lock()
+
+
+def _connect():
+    conn = sqlite3.connect(DB_FILE, timeout=10)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS presets (
+            name TEXT PRIMARY KEY,
+            jd TEXT NOT NULL,
+            must_haves TEXT NOT NULL,
+            role_type TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            updated REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS preset_versions (
+            name TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            jd TEXT NOT NULL,
+            must_haves TEXT NOT NULL,
+            role_type TEXT NOT NULL,
+            created REAL NOT NULL,
+            PRIMARY KEY (name, version)
+        )
+    """)
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    return conn
+
+
+def _stamp():
+    try:
+        st = os.stat(DB_FILE)
+        return (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+
+def _migrate_legacy_json(conn):
+    """把旧的 job_presets.json 导入数据库 (只执行一次)"""
+    imported = "SELECT 1 FROM meta WHERE key = 'legacy_json_imported'"
+    if not os.path.exists(LEGACY_JSON_FILE) or conn.execute(imported).fetchone():
+        return
+    try:
+        with open(LEGACY_JSON_FILE, "r", encoding="utf-8") as f:
+            legacy = json.load(f)
+    except (OSError, ValueError):
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    # 拿到写锁后再确认一次，防止多个进程重复导入
+    if not conn.execute(imported).fetchone():
+        for name, data in legacy.items():
+            _write(conn, name, data.get("jd", ""), data.get("must_haves", ""), data.get("role_type", ""))
+        conn.execute("INSERT INTO meta VALUES ('legacy_json_imported', ?)", (str(time.time()),))
+    conn.commit()
+
+
+def _write(conn, name, jd, must_haves, role_type):
+    row = conn.execute("SELECT MAX(version) FROM preset_versions WHERE name = ?", (name,)).fetchone()
+    version = (row[0] or 0) + 1
+    now = time.time()
+    conn.execute("INSERT INTO preset_versions VALUES (?, ?, ?, ?, ?, ?)", (name, version, jd, must_haves, role_type, now))
+    conn.execute("INSERT OR REPLACE INTO presets VALUES (?, ?, ?, ?, ?, ?)", (name, jd, must_haves, role_type, version, now))
+    return version
+
+
+def _invalidate():
+    with _lock:
+        _cache["stamp"] = None
 
-DB_FILE = "job_presets.json"
 
 def load_presets():
-    """加载所有保存的岗位配置"""
-    if not os.path.exists(DB_FILE):
-        return {}
+    """加载所有保存的岗位配置 (数据库未变化时直接返回内存缓存)"""
+    stamp = _stamp()
+    with _lock:
+        if stamp is not None and stamp == _cache["stamp"]:
+            return dict(_cache["presets"])
+
+    conn = _connect()
     try:
-        with open(DB_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except:
-        return {}
+        _migrate_legacy_json(conn)
+        rows = conn.execute("SELECT name, jd, must_haves, role_type, version FROM presets ORDER BY name").fetchall()
+    finally:
+        conn.close()
+
+    presets = {name: {"jd": jd, "must_haves": must_haves, "role_type": role_type, "version": version}
+               for name, jd, must_haves, role_type, version in rows}
+    with _lock:
+        # 用读库前的版本戳：读的过程中若有其他进程写入，下次调用会重新加载
+        _cache["stamp"] = stamp
+        _cache["presets"] = presets
+    return dict(presets)
+
 
 def save_preset(name, jd, must_haves, role_type):
-    """保存当前配置到文件"""
-    presets = load_presets()
-    presets[name] = {
-        "jd": jd,
-        "must_haves": must_haves,
-        "role_type": role_type
-    }
-    with open(DB_FILE, "w", encoding="utf-8") as f:
-        json.dump(presets, f, ensure_ascii=False, indent=4)
+    """保存当前配置 (同名模板生成新版本，旧版本保留在历史中)，返回版本号"""
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")  # 写锁，避免两个招聘官同时保存时互相覆盖
+        version = _write(conn, name, jd, must_haves, role_type)
+        conn.commit()
+    finally:
+        conn.close()
+    _invalidate()
+    return version
+
 
 def delete_preset(name):
-    """删除某个配置"""
-    presets = load_presets()
-    if name in presets:
-        del presets[name]
-        with open(DB_FILE, "w", encoding="utf-8") as f:
-            json.dump(presets, f, ensure_ascii=False, indent=4)
+    """删除某个配置 (连同历史版本)"""
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute("DELETE FROM presets WHERE name = ?", (name,))
+            conn.execute("DELETE FROM preset_versions WHERE name = ?", (name,))
+    finally:
+        conn.close()
+    _invalidate()
+
+
+def list_preset_versions(name):
+    """列出某个配置的全部历史版本 (新版本在前)"""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT version, jd, must_haves, role_type, created FROM preset_versions WHERE name = ? ORDER BY version DESC", (name,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [{"version": v, "jd": jd, "must_haves": mh, "role_type": rt, "created": created} for v, jd, mh, rt, created in rows]
+
+
+def restore_preset_version(name, version):
+    """把某个历史版本恢复为当前配置 (作为新版本保存)，返回新版本号"""
+    for v in list_preset_versions(name):
+        if v["version"] == version:
+            return save_preset(name, v["jd"], v["must_haves"], v["role_type"])
+    raise KeyError(f"{name} 不存在版本 {version}")
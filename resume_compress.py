@@ -0,0 +1,170 @@
+import logging
+import re
+from collections import Counter
+
+from text_extraction import PAGE_BREAK
+
+logger = logging.getLogger(__name__)
+
+# 各赛道送入 Agent 1 的简历 token 预算
+TOKEN_BUDGETS = {"PI": 8000, "RA": 4000, "Admin": 3000}
+
+# 章节识别关键词 (标题行需较短，且以完整的关键词开头：其后只能是行尾、空白、标点或 "与 / 及 / 和")
+SECTION_KEYWORDS = {
+    "education": ["education", "academic background", "教育", "教育背景", "教育经历", "学历", "学习经历"],
+    "experience": ["experience", "employment", "work history", "professional", "positions", "工作经历", "工作经验", "实习经历",
+                   "科研经历", "研究经历", "项目经历", "任职", "任职经历"],
+    "publications": ["publications", "selected publications", "papers", "论文", "论文发表", "发表论文", "学术论文", "代表性论文",
+                     "发表", "学术成果", "代表作"],
+    "grants": ["grants", "funding", "research support", "基金", "基金项目", "科研项目", "主持项目", "承担项目"],
+    "skills": ["skills", "technical skills", "techniques", "competencies", "技能", "专业技能", "实验技能", "技能特长", "技术", "技术能力"],
+    "awards": ["awards", "honors", "honours", "获奖", "获奖情况", "获奖经历", "荣誉", "荣誉称号", "荣誉奖项"],
+    "references": ["references", "referees", "bibliography", "参考文献", "推荐人"],
+}
+
+# 各赛道的章节优先级，越靠前越先装入预算；header 为首个标题前的联系方式等内容
+SECTION_PRIORITY = {
+    "PI": ["header", "education", "publications", "grants", "experience", "awards", "skills", "other", "references"],
+    "RA": ["header", "skills", "experience", "education", "publications", "awards", "other", "grants", "references"],
+    "Admin": ["header", "experience", "skills", "education", "awards", "other", "publications", "grants", "references"],
+}
+
+_CJK_RE = re.compile(r"[一-鿿]")
+_HEADING_PREFIX = re.compile(r"^[\s\d.、()（）一二三四五六七八九十#*•\-]*")
+_DIGITS = re.compile(r"\d+")
+# 关键词后不能紧跟字母、数字、汉字或连字符 ("Experienced in"、"Education-related"、"技术员" 都不是标题)
+_SECTION_RES = {
+    section: re.compile(r"(?:%s)(?:(?![\w'’-])|(?=[与及和]))" % "|".join(map(re.escape, sorted(keywords, key=len, reverse=True))))
+    for section, keywords in SECTION_KEYWORDS.items()
+}
+
+
+def role_key(role_type: str) -> str:
+    if "PI" in role_type or "Postdoc" in role_type:
+        return "PI"
+    if "Research Assistant" in role_type or "科研助理" in role_type or "RA" in role_type:
+        return "RA"
+    return "Admin"
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算：中文约 1 字 1 token，其余约 4 字符 1 token"""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk) // 4
+
+
+def collapse_whitespace(text: str) -> str:
+    text = re.sub(r"[ \t　\xa0]+", " ", text or "")
+    text = re.sub(r" *\n *", "\n", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def strip_repeated_headers(text: str, edge_lines: int = 3) -> str:
+    """去除多页 PDF 中重复出现的页眉页脚 (忽略页码数字后，在过半页面的首尾几行出现)。首页保留，以免丢掉姓名"""
+    pages = text.split(PAGE_BREAK)
+    if len(pages) < 3:
+        return "\n".join(pages)
+    page_lines = [[l for l in p.splitlines() if l.strip()] for p in pages]
+    counts = Counter()
+    for lines in page_lines:
+        edges = {_DIGITS.sub("#", l.strip()) for l in lines[:edge_lines] + lines[-edge_lines:]}
+        counts.update(edges)
+    repeated = {l for l, n in counts.items() if n >= len(pages) / 2}
+    out = list(page_lines[0])
+    for lines in page_lines[1:]:
+        n = len(lines)
+        out.extend(l for i, l in enumerate(lines)
+                   if not ((i < edge_lines or i >= n - edge_lines) and _DIGITS.sub("#", l.strip()) in repeated))
+    return "\n".join(out)
+
+
+def _section_of(line: str):
+    stripped = _HEADING_PREFIX.sub("", line).strip().rstrip(":：").lower()
+    if not stripped or len(stripped) > 40:
+        return None
+    for section, pattern in _SECTION_RES.items():
+        if pattern.match(stripped):
+            return section
+    return None
+
+
+def split_sections(text: str) -> list:
+    """按标题行切分，返回 [(section, text), ...]，保持原文顺序"""
+    sections = []
+    current, buf = "header", []
+    for line in text.splitlines():
+        found = _section_of(line)
+        if found:
+            if buf:
+                sections.append((current, "\n".join(buf)))
+            current, buf = found, [line]
+        else:
+            buf.append(line)
+    if buf:
+        sections.append((current, "\n".join(buf)))
+    return sections
+
+
+def _cut_line(line: str, budget: int) -> str:
+    """按字符截断单行，使其估算 token 数不超过 budget (中文 1 字 1 token，其余 4 字符 1 token)"""
+    used = 0.0
+    for i, ch in enumerate(line):
+        used += 1 if _CJK_RE.match(ch) else 0.25
+        if used > budget:
+            return line[:i]
+    return line
+
+
+def _truncate_to_tokens(text: str, budget: int) -> str:
+    """按行装入预算；装不下的那一行按字符截断填满剩余预算 (PDF 提取的长行、整段中文不会被整行丢掉)"""
+    out, used = [], 0
+    for line in text.splitlines():
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            part = _cut_line(line, budget - used - 1)
+            if part:
+                out.append(part)
+            break
+        out.append(line)
+        used += cost
+    return "\n".join(out)
+
+
+def compress_resume(resume_text: str, role_type: str, budget: int = None) -> tuple:
+    """
+    清洗并压缩简历：合并空白、去页眉页脚，按赛道优先级把章节装入 token 预算。
+    返回 (压缩后文本, {"tokens_before", "tokens_after", "dropped_sections"})，装入的章节保持原文顺序；
+    被截断的章节在 dropped_sections 中记为 "章节 (截断)"。
+    """
+    key = role_key(role_type)
+    budget = budget or TOKEN_BUDGETS[key]
+    tokens_before = estimate_tokens(resume_text or "")
+
+    cleaned = collapse_whitespace(strip_repeated_headers(resume_text or ""))
+    sections = split_sections(cleaned)
+    # 未识别的标题归入 other
+    sections = [(s if s in SECTION_PRIORITY[key] else "other", t) for s, t in sections]
+    priority = {s: i for i, s in enumerate(SECTION_PRIORITY[key])}
+    order = sorted(range(len(sections)), key=lambda i: (priority.get(sections[i][0], len(priority)), i))
+
+    kept, remaining, dropped = {}, budget, []
+    for i in order:
+        section, text = sections[i]
+        cost = estimate_tokens(text)
+        if cost <= remaining:
+            kept[i] = text
+            remaining -= cost
+        elif remaining > 50:
+            kept[i] = _truncate_to_tokens(text, remaining)
+            remaining = 0
+            dropped.append(f"{section} (截断)")
+        else:
+            dropped.append(section)
+
+    compressed = "\n".join(kept[i] for i in sorted(kept) if kept[i])
+    if cleaned and not compressed:
+        # 兜底：至少保留按字符截断的原文开头，不把空简历交给 Agent 1
+        compressed = _truncate_to_tokens(cleaned, budget)
+    stats = {"tokens_before": tokens_before, "tokens_after": estimate_tokens(compressed), "dropped_sections": dropped}
+    logger.info("简历压缩 [%s] tokens %d -> %d，舍弃章节: %s", key, stats["tokens_before"], stats["tokens_after"], dropped or "无")
+    return compressed, stats
@@ -0,0 +1,55 @@
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_backend import LLMBackend, MockBackend  # noqa: E402
+
+RA = "🧬 科研助理 (RA)"
+CV = "王小明\nwang.xm@example.com\n技能\n细胞培养, qPCR\n工作经历\n科研助理 3 年"
+
+
+class RecordingBackend(LLMBackend):
+    """
+    测试用模型：outputs 中有的阶段返回预设输出 (非字符串序列化为 JSON)，其余阶段交给 MockBackend。
+    记录每个阶段的请求次数 (calls)、prompt (prompts) 和调用顺序 (stages)。
+    """
+    model_name = "recording"
+
+    def __init__(self, outputs: dict = None):
+        self.outputs = outputs or {}
+        self.mock = MockBackend()
+        self.calls = {}
+        self.prompts = {}
+        self.stages = []
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, json_mode=False, stage=""):
+        with self._lock:
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+            self.prompts.setdefault(stage, []).append(prompt)
+            self.stages.append(stage)
+        if stage not in self.outputs:
+            return self.mock.generate(prompt, json_mode=json_mode, stage=stage)
+        out = self.outputs[stage]
+        return out if isinstance(out, str) else json.dumps(out, ensure_ascii=False)
+
+
+@pytest.fixture
+def ra():
+    return RA
+
+
+@pytest.fixture
+def cv():
+    return CV
+
+
+@pytest.fixture
+def recording_backend():
+    """RecordingBackend 的工厂：recording_backend({"agent1": {...}})"""
+    return RecordingBackend
@@ -0,0 +1,61 @@
+import sqlite3
+
+import utils
+from analysis_cache import AnalysisCache
+from llm_backend import MockBackend
+from utils import analyze_batch_candidate
+
+
+def test_write_failure_still_returns_computed_value(tmp_path, monkeypatch, caplog):
+    cache = AnalysisCache(str(tmp_path / "cache.db"))
+
+    def locked(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(cache, "set", locked)
+    value = cache.get_or_compute("agent1", "v1", "model", ["resume"], lambda: {"name": "张三"})
+    assert value == {"name": "张三"}
+    assert "database is locked" in caplog.text
+
+
+def test_jd_change_reuses_agent1(tmp_path, ra, cv):
+    cache = AnalysisCache(str(tmp_path / "cache.db"))
+    backend = MockBackend()
+    first = analyze_batch_candidate(cv, "招聘科研助理", "", ra, cache=cache, backend=backend, mode="full")
+    second = analyze_batch_candidate(cv, "招聘科研助理，单细胞测序", "", ra, cache=cache, backend=backend, mode="full")
+    assert backend.calls == {"agent1": 1, "agent2": 2, "agent3": 2}
+    assert second["name"] == first["name"]
+    by_stage = cache.stats()["by_stage"]
+    assert by_stage["agent1"] == {"hits": 1, "misses": 1}
+    assert by_stage["agent2"] == {"hits": 0, "misses": 2}
+    # JD 不变时三个阶段全部命中
+    analyze_batch_candidate(cv, "招聘科研助理", "", ra, cache=cache, backend=backend, mode="full")
+    assert backend.calls == {"agent1": 1, "agent2": 2, "agent3": 2}
+
+
+def test_prompt_version_bump_misses_and_purges(tmp_path, monkeypatch, ra, cv):
+    cache = AnalysisCache(str(tmp_path / "cache.db"))
+    backend = MockBackend()
+    analyze_batch_candidate(cv, "招聘科研助理", "", ra, cache=cache, backend=backend, mode="full")
+    monkeypatch.setitem(utils.PROMPT_VERSIONS, "agent1", "v-next")
+    analyze_batch_candidate(cv, "招聘科研助理", "", ra, cache=cache, backend=backend, mode="full")
+    assert backend.calls["agent1"] == 2
+    assert cache.stats()["entries"] == 4  # 新旧两个版本的 agent1 + agent2 + agent3
+    assert cache.purge_stale_versions(utils.PROMPT_VERSIONS) == 1
+    assert cache.stats()["entries"] == 3
+
+
+def test_evict_and_invalidate(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache.db"), max_entries=3)
+    for i in range(5):
+        key = cache.make_key("agent1", "v1", "model", [f"resume {i}"])
+        cache.set(key, "agent1", "v1", {"i": i})
+    cache.get(cache.make_key("agent1", "v1", "model", ["resume 0"]), "agent1")  # 最近访问过，保留
+    cache.set(cache.make_key("agent2", "v1", "model", ["x"]), "agent2", "v1", "风险")
+    assert cache.evict() == 3
+    assert cache.stats()["entries"] == 3
+    assert cache.contains(cache.make_key("agent1", "v1", "model", ["resume 0"]))
+    assert cache.invalidate("agent1") == 2
+    assert cache.contains(cache.make_key("agent2", "v1", "model", ["x"]))
+    assert cache.invalidate() == 1
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,48 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import batch_cli
+from batch_cli import ResultWriter, read_processed
+
+def write_rows(path, rows):
+    writer = ResultWriter(str(path))
+    for row in rows:
+        writer.write(row)
+    writer.close()
+
+
+def test_mock_rows_are_not_processed_for_real_runs(tmp_path):
+    for name in ("out.jsonl", "out.csv"):
+        path = tmp_path / name
+        write_rows(path, [{"sha256": "a", "name": "张三", "backend": "mock"},
+                          {"sha256": "b", "name": "李四", "backend": "gemini-2.0-flash"},
+                          {"sha256": "c", "name": "Error", "backend": "gemini-2.0-flash"}])
+        assert read_processed(str(path)) == {"b"}
+        assert read_processed(str(path), mock=True) == {"a", "b"}
+
+
+def test_old_csv_header_keeps_backend_in_result_json(tmp_path):
+    path = tmp_path / "old.csv"
+    old_fields = [f for f in batch_cli.FLAT_FIELDS if f != "backend"]
+    path.write_text(",".join(old_fields) + "\n", encoding="utf-8")
+    write_rows(path, [{"sha256": "a", "name": "张三", "backend": "mock"}])
+    assert path.read_text(encoding="utf-8").splitlines()[0] == ",".join(old_fields)
+    assert read_processed(str(path)) == set()
+
+
+def test_mock_flag_requires_exactly_one(tmp_path, monkeypatch, ra):
+    (tmp_path / "inbox").mkdir()
+    (tmp_path / "inbox" / "cv.txt").write_text("王小明\nwang.xm@example.com\n技能\nqPCR", encoding="utf-8")
+    out = tmp_path / "out.jsonl"
+    args = SimpleNamespace(source=str(tmp_path / "inbox"), output=str(out), preset=None, jd="招聘科研助理", jd_file=None,
+                           must_haves="", role_type=ra, mode="fast", workers=1, cache="", quiet=True)
+    monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+    monkeypatch.setenv("MEDRECRUIT_MOCK_LLM", "0")
+    with pytest.raises(SystemExit):  # 没有 API Key，"0" 不能当作模拟模式
+        batch_cli.run(args)
+    monkeypatch.setenv("MEDRECRUIT_MOCK_LLM", "1")
+    batch_cli.run(args)
+    rows = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert [r["backend"] for r in rows] == ["mock"]
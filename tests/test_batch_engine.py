@@ -0,0 +1,84 @@
+import time
+import types
+
+import pytest
+
+import batch_engine
+from batch_engine import call_with_retry, run_batch
+
+
+class APIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """记录退避等待，不真正 sleep"""
+    delays = []
+    monkeypatch.setattr(batch_engine, "time", types.SimpleNamespace(sleep=delays.append, monotonic=time.monotonic))
+    return delays
+
+
+def test_results_keep_input_order():
+    done = []
+    results = run_batch([0.2, 0.0, 0.1], lambda d: time.sleep(d) or d, max_workers=3,
+                        on_done=lambda i, res, n, total: done.append(i))
+    assert results == [0.2, 0.0, 0.1]
+    assert done == [1, 2, 0]  # 回调按完成顺序
+
+
+def test_one_failure_does_not_affect_others():
+    def worker(x):
+        if x == 1:
+            raise ValueError("解析失败")
+        return x * 10
+
+    results = run_batch([0, 1, 2], worker)
+    assert results[0] == 0 and results[2] == 20
+    assert results[1] == {"name": "Error", "fit_score": 0, "summary": "AI Error: 解析失败"}
+
+
+def test_timeout_becomes_error_row():
+    results = run_batch([0.0, 3.0], lambda d: time.sleep(d) or "ok", timeout=0.3)
+    assert results[0] == "ok"
+    assert results[1]["name"] == "Error" and "分析超时" in results[1]["summary"]
+
+
+@pytest.mark.parametrize("code", [429, 500, 503])
+def test_retries_rate_limits_and_server_errors(sleeps, code):
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise APIError(code)
+        return "ok"
+
+    retried = []
+    assert call_with_retry(flaky, base_delay=1.0, on_retry=lambda a, e: retried.append(a)) == "ok"
+    assert len(attempts) == 3 and retried == [0, 1]
+    assert len(sleeps) == 2
+    assert 0.5 <= sleeps[0] <= 1.0 and 1.0 <= sleeps[1] <= 2.0  # 指数退避 + 抖动
+
+
+def test_client_errors_are_not_retried(sleeps):
+    attempts = []
+
+    def bad_request():
+        attempts.append(1)
+        raise APIError(400)
+
+    with pytest.raises(APIError):
+        call_with_retry(bad_request)
+    assert len(attempts) == 1 and sleeps == []
+
+
+def test_gives_up_after_max_retries(sleeps):
+    def overloaded():
+        raise APIError(503)
+
+    with pytest.raises(APIError):
+        call_with_retry(overloaded, max_retries=2, base_delay=1.0)
+    assert len(sleeps) == 2
@@ -0,0 +1,71 @@
+from candidate_store import CandidateStore
+
+RA = "🧬 科研助理 (RA)"
+ADMIN = "💼 行政管理 (Admin)"
+
+
+def make_store():
+    return CandidateStore([
+        {"name": "张三", "fit_score": 60, "role_type": RA, "file_name": "a.pdf"},
+        {"name": "李四", "fit_score": 90, "role_type": RA, "file_name": "b.pdf"},
+        {"name": "王五", "fit_score": "N/A", "role_type": ADMIN, "file_name": "c.pdf"},
+        {"name": "张三", "fit_score": 75, "role_type": RA, "file_name": "d.pdf"},
+    ])
+
+
+def test_ids_and_indexes():
+    store = make_store()
+    ids = [c["candidate_id"] for c in store]
+    assert len(set(ids)) == 4
+    assert store.get(ids[1])["name"] == "李四"
+    assert [c["file_name"] for c in store.find_by_name("张三")] == ["a.pdf", "d.pdf"]
+    assert [c["name"] for c in store.by_role(ADMIN)] == ["王五"]
+    # 无法解析的分数按 0 排在最后
+    assert [store.get(cid)["file_name"] for cid in store.ranked_ids()] == ["b.pdf", "d.pdf", "a.pdf", "c.pdf"]
+
+
+def test_upsert_keeps_id_and_reindexes():
+    store = make_store()
+    cid = store.ranked_ids()[-1]
+    version = store.version
+    assert store.add({"candidate_id": cid, "name": "王五", "fit_score": 99, "role_type": RA}) == cid
+    assert len(store) == 4
+    assert store.ranked_ids()[0] == cid
+    assert store.by_role(ADMIN) == []
+    assert [c["candidate_id"] for c in store.find_by_name("王五")] == [cid]
+    assert store.version > version
+
+
+def test_leaderboard_is_cached_until_write():
+    store = make_store()
+    df = store.leaderboard(RA)
+    assert store.leaderboard(RA) is df
+    assert list(df["姓名"]) == ["李四", "张三", "张三", "王五"]
+    assert store.label(store.ranked_ids()[0]) == "李四 (b.pdf)"
+    store.add({"name": "赵六", "fit_score": 95, "role_type": RA, "file_name": "e.pdf"})
+    df2 = store.leaderboard(RA)
+    assert df2 is not df
+    assert list(df2["姓名"])[0] == "赵六"
+    assert store.label(store.ranked_ids()[0]) == "赵六 (e.pdf)"
+
+
+def test_leaderboard_page_filters_and_pages():
+    store = make_store()
+    page, total = store.leaderboard_page(RA, page=1, page_size=3)
+    assert total == 4 and list(page["姓名"]) == ["李四", "张三", "张三"]
+    page, total = store.leaderboard_page(RA, page=2, page_size=3)
+    assert total == 4 and list(page["姓名"]) == ["王五"]
+    page, total = store.leaderboard_page(RA, name_filter="张", min_score=70)
+    assert total == 1 and list(page["AI 匹配度"]) == [75]
+    page, total = store.leaderboard_page(RA, page=5, page_size=3)
+    assert total == 4 and page.empty
+
+
+def test_remove_and_clear():
+    store = make_store()
+    cid = store.ranked_ids()[0]
+    store.remove(cid)
+    assert cid not in store and len(store) == 3
+    assert store.find_by_name("李四") == []
+    store.clear()
+    assert not store and store.ranked_ids() == []
@@ -0,0 +1,35 @@
+from llm_backend import MockBackend
+from utils import analyze_batch_candidate
+
+# 照抄 schema 中身份字段的模型：第一次返回说明文字，补请求时才给出真实值
+COPYING = {
+    "fused": {"name": "从简历提取的姓名", "email": "", "language_preference": "Chinese", "fit_score": 70, "summary": "总结",
+              "critique_notes": "无明显风险", "technical_skills": ["qPCR"], "lab_experience_years": 3, "project_participation": [],
+              "strengths": [], "gaps": []},
+    "fused_fix": {"name": "王小明", "email": "wang.xm@example.com"},
+}
+
+
+def test_fused_prompt_without_facts_has_no_literal_identity_defaults(recording_backend, ra, cv):
+    backend = recording_backend(COPYING)
+    analyze_batch_candidate(cv, "招聘科研助理", "", ra, backend=backend, mode="fast")
+    prompt = backend.prompts["fused"][0]
+    assert '"name": "Candidate"' not in prompt
+    assert '"email": ""' not in prompt
+    assert "从简历提取的姓名" in prompt
+
+
+def test_copied_identity_fields_are_refetched(recording_backend, ra, cv):
+    backend = recording_backend(COPYING)
+    result = analyze_batch_candidate(cv, "招聘科研助理", "", ra, backend=backend, mode="fast")
+    assert len(backend.prompts["fused_fix"]) == 1
+    assert result["name"] == "王小明"
+    assert result["email"] == "wang.xm@example.com"
+    assert result["metrics"]["spans"][0]["refetched_fields"] == 2
+
+
+def test_mock_fast_mode_matches_full_schema(ra, cv):
+    full = analyze_batch_candidate(cv, "招聘科研助理", "", ra, backend=MockBackend(), mode="full")
+    fast = analyze_batch_candidate(cv, "招聘科研助理", "", ra, backend=MockBackend(), mode="fast")
+    assert set(full) == set(fast)
+    assert (fast["name"], fast["email"], fast["language_preference"]) == ("王小明", "wang.xm@example.com", "Chinese")
@@ -0,0 +1,80 @@
+import hashlib
+import io
+import zipfile
+
+from ingest import NearDuplicateIndex, _shingle_hashes, ingest, jaccard, minhash, simhash
+
+CV = " ".join(f"word{i}" for i in range(200))
+CV_EDITED = CV.replace("word100", "changed100")
+OTHER = " ".join(f"term{i}" for i in range(200))
+
+
+def fingerprint(text):
+    hashes = _shingle_hashes(text)
+    return simhash(hashes), minhash(hashes)
+
+
+def by_name(records):
+    return {r["file_name"]: r for r in records}
+
+
+def test_near_duplicate_pair_is_detected_and_unrelated_text_is_not():
+    fp_a, sig_a = fingerprint(CV)
+    fp_b, sig_b = fingerprint(CV_EDITED)
+    fp_c, sig_c = fingerprint(OTHER)
+    assert bin(fp_a ^ fp_b).count("1") <= 6
+    assert jaccard(sig_a, sig_b) >= 0.8
+    assert jaccard(sig_a, sig_c) < 0.2
+    index = NearDuplicateIndex()
+    index.add(fp_a, sig_a, "a.txt")
+    key, sim = index.query(fp_b, sig_b)
+    assert key == "a.txt" and sim >= 0.8
+    assert index.query(fp_c, sig_c) is None
+
+
+def test_exact_and_near_duplicates_in_a_folder(tmp_path):
+    (tmp_path / "a.txt").write_text(CV)
+    (tmp_path / "b.txt").write_text(CV)  # 字节完全相同
+    (tmp_path / "c.txt").write_text(CV_EDITED)
+    (tmp_path / "d.txt").write_text(OTHER)
+    stats = {}
+    records = by_name(ingest([str(tmp_path)], max_workers=1, on_progress=stats.update))
+    assert records["a.txt"]["sha256"] == hashlib.sha256(CV.encode()).hexdigest()
+    assert records["b.txt"]["status"] == "duplicate" and records["b.txt"]["duplicate_of"] == "a.txt"
+    # 解析结果按完成顺序产出，近似重复的一对中先完成的那份保留
+    near = [r for r in records.values() if r["status"] == "near_duplicate"]
+    assert len(near) == 1 and {near[0]["file_name"], near[0]["duplicate_of"]} == {"a.txt", "c.txt"}
+    assert near[0]["text"] == ""
+    assert records["d.txt"]["status"] == "ok"
+    assert stats["files"] == 4 and stats["duplicate"] == 1 and stats["near_duplicate"] == 1 and stats["ok"] == 2
+
+
+def test_zip_entries_and_known_hashes(tmp_path):
+    path = tmp_path / "inbox.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("cvs/a.txt", CV)
+        zf.writestr("cvs/d.txt", OTHER)
+        zf.writestr("__MACOSX/cvs/._a.txt", "junk")
+        zf.writestr("cvs/notes.md", "ignored")
+    known = {hashlib.sha256(CV.encode()).hexdigest()}
+    records = by_name(ingest([str(path)], max_workers=1, known_hashes=known))
+    assert set(records) == {"cvs/a.txt", "cvs/d.txt"}
+    assert records["cvs/a.txt"]["status"] == "processed"
+    assert records["cvs/d.txt"]["status"] == "ok" and "term0" in records["cvs/d.txt"]["text"]
+
+
+class Upload(io.BytesIO):
+    """Streamlit UploadedFile 的替身 (同样是带 name 的 BytesIO)"""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+
+
+def test_uploaded_zip_and_file_are_deduplicated_across_sources():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("a.txt", CV)
+    records = list(ingest([Upload("a.txt", CV.encode()), Upload("batch.zip", buf.getvalue())], max_workers=1))
+    assert [r["status"] for r in records].count("duplicate") == 1
+    assert next(r for r in records if r["status"] == "duplicate")["file_name"] == "batch.zip/a.txt"
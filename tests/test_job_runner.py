@@ -0,0 +1,78 @@
+import time
+
+import job_runner
+import llm_backend
+from job_runner import JobRunner
+from llm_backend import MockBackend
+
+
+def test_cancelled_job_is_not_restarted(tmp_path):
+    runner = JobRunner(str(tmp_path / "jobs.db"), backend=MockBackend())
+    runner.stop()
+    runner._thread.join(5)
+    job_id = runner.submit([{"file_name": "a.txt", "text": "张三 简历"}], "JD", "", "🧬 科研助理 (RA)")
+    job = runner.get(job_id)  # 后台线程选出任务后、开始运行前被取消
+    runner.cancel(job_id)
+    runner._run_job(job)
+    assert runner.get(job_id)["status"] == "cancelled"
+    assert runner.results(job_id) == []
+
+
+def test_error_results_keep_file_info(tmp_path, monkeypatch):
+    def crash(*args, **kwargs):
+        raise RuntimeError("worker crashed")
+
+    monkeypatch.setattr(job_runner, "analyze_batch_candidate", crash)
+    runner = JobRunner(str(tmp_path / "jobs.db"), backend=MockBackend())
+    runner.stop()
+    runner._thread.join(5)
+    job_id = runner.submit([{"file_name": "a.txt", "text": "张三 简历", "prescreen_score": 42.0}], "JD", "", "🧬 科研助理 (RA)")
+    runner._run_job(runner.get(job_id))
+    [res] = runner.results(job_id)
+    assert res["name"] == "Error" and "worker crashed" in res["summary"]
+    assert res["file_name"] == "a.txt" and res["prescreen_score"] == 42.0
+    assert runner.get(job_id)["failed"] == 1
+
+
+def test_restart_without_backend_keeps_jobs_queued(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_backend, "_api_key", "")
+    monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+    path = str(tmp_path / "jobs.db")
+    first = JobRunner(path, backend=MockBackend())
+    first.stop()
+    first._thread.join(5)
+    job_id = first.submit([{"file_name": "a.txt", "text": "张三 简历"}], "JD", "", "🧬 科研助理 (RA)")
+    first._conn.execute("UPDATE jobs SET status = 'running' WHERE job_id = ?", (job_id,))  # 进程在任务运行中退出
+    first._conn.commit()
+
+    runner = JobRunner(path, backend=llm_backend.GeminiBackend())  # 重启后还没有配置 API Key
+    assert not runner.ready()
+    time.sleep(2.5 * job_runner.POLL_SECONDS)
+    assert runner.get(job_id)["status"] == "queued"
+    assert runner.results(job_id) == []
+
+    runner.backend = MockBackend()  # 配置后自动开始
+    deadline = time.monotonic() + 10
+    while runner.get(job_id)["status"] != "done" and time.monotonic() < deadline:
+        time.sleep(0.1)
+    runner.stop()
+    assert runner.get(job_id)["status"] == "done"
+    assert [r["file_name"] for r in runner.results(job_id)] == ["a.txt"]
+
+
+def test_finished_jobs_drop_resume_text_and_expire(tmp_path):
+    runner = JobRunner(str(tmp_path / "jobs.db"), backend=MockBackend())
+    runner.stop()
+    runner._thread.join(5)
+    job_id = runner.submit([{"file_name": "a.txt", "text": "张三 简历"}], "JD", "", "🧬 科研助理 (RA)")
+    runner._run_job(runner.get(job_id))
+    assert runner.get(job_id)["status"] == "done"
+    assert runner._conn.execute("SELECT text FROM job_items WHERE job_id = ?", (job_id,)).fetchone() == ("",)
+    assert len(runner.results(job_id)) == 1  # 结果保留
+
+    queued = runner.submit([{"file_name": "b.txt", "text": "李四 简历"}], "JD", "", "🧬 科研助理 (RA)")
+    assert runner.purge_finished(max_age_days=1) == 0
+    runner._conn.execute("UPDATE jobs SET finished = finished - 2 * 86400 WHERE job_id = ?", (job_id,))
+    assert runner.purge_finished(max_age_days=1) == 1
+    assert runner.get(job_id) is None and runner.get(queued) is not None
+    assert runner._conn.execute("SELECT COUNT(*) FROM job_items").fetchone() == (1,)
@@ -0,0 +1,25 @@
+import pytest
+
+from llm_backend import LLMBackend, MockBackend
+from utils import analyze_batch_candidate
+
+def test_mock_full_mode_keeps_chinese_name(ra, cv):
+    result = analyze_batch_candidate(cv, "招聘科研助理", "", ra, backend=MockBackend(), mode="full")
+    assert result["name"] == "王小明"
+    assert result["email"] == "wang.xm@example.com"
+
+
+def test_mock_modes_share_the_name_baseline(ra, cv):
+    # 两种模式以同一个姓名为基准打分，差异只来自 ±8 的扰动
+    full = analyze_batch_candidate(cv, "招聘科研助理", "", ra, backend=MockBackend(), mode="full")
+    fast = analyze_batch_candidate(cv, "招聘科研助理", "", ra, backend=MockBackend(), mode="fast")
+    assert full["name"] == fast["name"] == "王小明"
+    assert abs(full["fit_score"] - fast["fit_score"]) <= 16
+
+
+def test_backend_without_generate_cannot_be_created():
+    class Incomplete(LLMBackend):
+        model_name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
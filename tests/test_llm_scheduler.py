@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+import llm_scheduler
+from llm_scheduler import LLMScheduler, interactive, priority
+from utils import draft_emails_batch
+
+
+def test_interactive_lane_is_served_before_bulk():
+    s = LLMScheduler(rpm=0, tpm=6000)  # 100 token/s
+    s.acquire(6000, lane="bulk")  # 清空令牌桶
+    order = []
+
+    def request(lane):
+        s.acquire(50, lane=lane)
+        order.append(lane)
+
+    bulk = threading.Thread(target=request, args=("bulk",))
+    bulk.start()
+    time.sleep(0.05)  # bulk 已在排队，之后到达的 interactive 仍先放行
+    fast = threading.Thread(target=request, args=("interactive",))
+    fast.start()
+    bulk.join(5)
+    fast.join(5)
+    assert order == ["interactive", "bulk"]
+    lanes = s.stats()["lanes"]
+    assert lanes["interactive"]["requests"] == 1 and lanes["bulk"]["requests"] == 2
+    assert lanes["bulk"]["max_wait"] > lanes["interactive"]["max_wait"] > 0
+    assert lanes["bulk"]["queued"] == lanes["interactive"]["queued"] == 0
+
+
+def test_priority_context_selects_lane():
+    s = LLMScheduler(rpm=0, tpm=0)
+    with interactive():
+        s.acquire(10)
+    s.acquire(10)
+    lanes = s.stats()["lanes"]
+    assert lanes["interactive"]["requests"] == 1 and lanes["bulk"]["requests"] == 1
+    with pytest.raises(ValueError):
+        with priority("urgent"):
+            pass
+
+
+def test_rpm_and_tpm_accounting():
+    s = LLMScheduler(rpm=10, tpm=1000)
+    s.acquire(100)
+    st = s.stats()
+    assert st["requests_available"] == pytest.approx(9, abs=0.1)
+    assert st["tokens_available"] == pytest.approx(900, abs=1)
+    s.settle(50)  # 实际用量比预扣多 50
+    assert s.stats()["tokens_available"] == pytest.approx(850, abs=1)
+    s.settle(-100)  # 多退
+    assert s.stats()["tokens_available"] == pytest.approx(950, abs=1)
+    s.settle(-1000)  # 余量不超过一分钟的容量
+    assert s.stats()["tokens_available"] == pytest.approx(1000, abs=0.01)
+
+
+def test_token_debt_blocks_until_refilled():
+    s = LLMScheduler(rpm=0, tpm=6000)  # 100 token/s
+    s.acquire(6000)
+    s.settle(20)  # 欠账 20 token
+    waited = s.acquire(30)
+    assert waited == pytest.approx(0.5, abs=0.2)
+
+
+def test_zero_limits_do_not_block():
+    s = LLMScheduler(rpm=0, tpm=0)
+    for _ in range(100):
+        assert s.acquire(10**6) < 0.1
+    st = s.stats()
+    assert st["requests_available"] is None and st["tokens_available"] is None
+
+
+def test_batch_drafts_go_ahead_of_queued_bulk_calls(monkeypatch, recording_backend, ra):
+    s = LLMScheduler(rpm=60, tpm=0)  # 每秒 1 个请求
+    for _ in range(60):
+        s.acquire(1, lane="bulk")  # 清空请求桶
+    monkeypatch.setattr(llm_scheduler, "_default_scheduler", s)
+    backend = recording_backend()
+    order = backend.stages  # 与草稿请求记在同一个列表中
+
+    def bulk_call():
+        s.acquire(1, lane="bulk")
+        order.append("bulk")
+
+    bulk = threading.Thread(target=bulk_call)
+    bulk.start()
+    time.sleep(0.05)  # 批量分析的请求已在排队
+    cand = {"name": "王小明", "language_preference": "Chinese", "role_type": ra}
+    with interactive():
+        drafts = draft_emails_batch([cand], {"name": "李老师", "title": "PI", "org": "浙大"}, backend=backend)
+    bulk.join(5)
+    assert drafts[0]["draft"]
+    assert order == ["email", "bulk"]
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import mailer
+from mailer import BulkMailer
+
+
+class FakeSMTP:
+    def __init__(self):
+        self.sent = []
+
+    def sendmail(self, sender, recipient, message):
+        self.sent.append(recipient)
+
+    def quit(self):
+        pass
+
+
+def make_mailer(monkeypatch, **kwargs):
+    smtp = FakeSMTP()
+    monkeypatch.setattr(mailer, "open_session", lambda *a, **k: smtp)
+    return BulkMailer("hr@example.com", "pw", rate_per_minute=0, **kwargs), smtp
+
+
+def test_duplicate_key_is_not_sent_twice(monkeypatch):
+    m, smtp = make_mailer(monkeypatch)
+    assert m.enqueue("c1", "a@example.com", "s", "b")
+    assert not m.enqueue("c1", "a@example.com", "s", "b")  # 仍在队列中
+    assert m.wait(5)
+    assert not m.enqueue("c1", "a@example.com", "s", "b")  # 已发送
+    assert m.wait(5)
+    m.stop()
+    assert smtp.sent == ["a@example.com"]
+
+
+def test_resend_is_explicit(monkeypatch):
+    m, smtp = make_mailer(monkeypatch)
+    m.enqueue("c1", "a@example.com", "s", "b")
+    assert m.wait(5)
+    assert m.enqueue("c1", "a@example.com", "s", "b", resend=True)
+    assert m.wait(5)
+    m.stop()
+    assert smtp.sent == ["a@example.com", "a@example.com"]
+
+
+def test_reconfigure_keeps_queue_and_switches_account(monkeypatch):
+    release = threading.Event()
+    sessions = []
+
+    class BlockingSMTP(FakeSMTP):
+        def sendmail(self, sender, recipient, message):
+            release.wait(5)
+            self.sent.append((sender, recipient))
+
+    def open_fake(sender_email, *args, **kwargs):
+        sessions.append(sender_email)
+        return smtp
+
+    smtp = BlockingSMTP()
+    monkeypatch.setattr(mailer, "open_session", open_fake)
+    m = BulkMailer("old@example.com", "pw", rate_per_minute=0)
+    m.enqueue("c1", "a@example.com", "s", "b")
+    m.enqueue("c2", "b@example.com", "s", "b")
+    deadline = time.monotonic() + 5
+    while {s["key"]: s["status"] for s in m.snapshot()}["c1"] != "sending" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    m.reconfigure("new@example.com", "pw2", rate_per_minute=600)
+    assert not m.enqueue("c1", "a@example.com", "s", "b")  # 发送中
+    assert not m.enqueue("c2", "b@example.com", "s", "b")  # 仍在队列中
+    release.set()
+    assert m.wait(5)
+    m.stop()
+    assert smtp.sent == [("old@example.com", "a@example.com"), ("new@example.com", "b@example.com")]
+    assert sessions == ["old@example.com", "new@example.com"]
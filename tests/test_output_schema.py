@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from output_schema import coerce_score, parse_json_lenient, validate
+from utils import analyze_batch_candidate
+
+FACTS = {"name": "王小明", "email": "wang.xm@example.com", "language_preference": "Chinese"}
+DECISION = {"name": "王小明", "email": "wang.xm@example.com", "language_preference": "Chinese", "fit_score": 80,
+            "summary": "总结", "technical_skills": ["qPCR"], "lab_experience_years": 3, "project_participation": [],
+            "strengths": [], "gaps": []}
+
+
+def test_missing_critique_notes_fall_back_to_agent2(recording_backend, ra, cv):
+    backend = recording_backend({"agent1": FACTS, "agent2": "- 风险1: 缺少独立课题经验", "agent3": DECISION})
+    result = analyze_batch_candidate(cv, "招聘科研助理", "", ra, backend=backend, mode="full")
+    assert result["critique_notes"] == "- 风险1: 缺少独立课题经验"
+    assert "agent3_fix" not in backend.calls
+
+
+def test_parse_json_lenient_repairs_common_damage():
+    assert parse_json_lenient('{"a": 1}') == ({"a": 1}, False)
+    assert parse_json_lenient('```json\n{"a": 1}\n```') == ({"a": 1}, True)
+    assert parse_json_lenient('Here is the result:\n{"a": [1, 2,],}\nHope this helps.') == ({"a": [1, 2]}, True)
+    assert parse_json_lenient('{"name": "张三", "skills": ["qPCR", "细胞') == ({"name": "张三", "skills": ["qPCR", "细胞"]}, True)
+    assert parse_json_lenient('{"name": "张三", "fit_score": 8') == ({"name": "张三", "fit_score": 8}, True)
+    assert parse_json_lenient('{"name": "张三", "ok": tr') == ({"name": "张三", "ok": None}, True)
+    assert parse_json_lenient('{"name": "张三", "email"') == ({"name": "张三", "email": None}, True)
+    with pytest.raises(ValueError):
+        parse_json_lenient("抱歉，我无法完成")
+
+
+def test_coerce_score_formats():
+    assert coerce_score("8.5/10") == 85
+    assert coerce_score("85%") == 85
+    assert coerce_score("85/100") == 85
+    assert coerce_score(85.6) == 86
+    assert coerce_score("120") == 100
+    assert coerce_score("高") is None
+    assert coerce_score(True) is None
+
+
+def test_validate_normalizes_keys_and_lists():
+    data, invalid = validate([{"Fit Score": "90分", "summary": "总结", "strengths": "a, b"}], {
+        "fit_score": ("int_score", None, True), "summary": ("str", "", True),
+        "strengths": ("list", [], False), "gaps": ("list", [], False)})
+    assert data == {"fit_score": 90, "summary": "总结", "strengths": ["a", "b"]}
+    assert invalid == ["gaps"]
+
+
+def test_invalid_key_fields_are_refetched_once(recording_backend, ra, cv):
+    broken = '```json\n' + json.dumps({**DECISION, "fit_score": "很高", "summary": None}, ensure_ascii=False)[:-1] + ',\n```'
+    backend = recording_backend({"agent1": FACTS, "agent2": "无明显风险", "agent3": broken, "agent3_fix": {"fit_score": "7/10"}})
+    result = analyze_batch_candidate(cv, "招聘科研助理", "", ra, backend=backend, mode="full")
+    assert backend.calls["agent3"] == 1 and backend.calls["agent3_fix"] == 1
+    assert result["fit_score"] == 70
+    assert result["summary"] == ""  # 补请求没有给出的字段填默认值
+    spans = {s["stage"]: s for s in result["metrics"]["spans"]}
+    assert spans["agent3"]["json_repairs"] == 1 and spans["agent3"]["refetched_fields"] == 2
+    assert spans["agent3"]["schema_errors"] == 2  # summary 和缺失的 critique_notes
+
+
+def test_required_field_still_invalid_fails_the_stage(recording_backend, ra, cv):
+    backend = recording_backend({"agent1": FACTS, "agent2": "无明显风险", "agent3": {**DECISION, "fit_score": None},
+                               "agent3_fix": "不知道"})
+    result = analyze_batch_candidate(cv, "招聘科研助理", "", ra, backend=backend, mode="full")
+    assert result["name"] == "Error" and "fit_score" in result["summary"]
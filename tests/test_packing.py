@@ -0,0 +1,53 @@
+from utils import PACK_MAX_RESUME_TOKENS, analyze_batch_candidate, extract_facts_packed, pack_resumes, prefetch_agent1_packed
+
+CVS = [
+    "Alice Zhang\nalice@example.com\nSkills: qPCR, cell culture",
+    "Bob Li\nbob@example.com\nSkills: Python, flow cytometry",
+    "Carol Wu\ncarol@example.com\nSkills: CRISPR",
+]
+
+
+def tokens(n):
+    return "x" * (4 * n)  # estimate_tokens: 非中文约 4 字符 1 token
+
+
+def test_pack_resumes_splits_by_budget_and_count():
+    packs, singles = pack_resumes([tokens(100)] * 5, budget=250)
+    assert packs == [[0, 1], [2, 3]] and singles == [4]
+    packs, singles = pack_resumes([tokens(10)] * 5, max_per_pack=3)
+    assert packs == [[0, 1, 2], [3, 4]] and singles == []
+
+
+def test_long_resumes_are_never_packed():
+    texts = [tokens(100), tokens(PACK_MAX_RESUME_TOKENS + 1), tokens(100), tokens(100)]
+    packs, singles = pack_resumes(texts)
+    assert packs == [[0, 2, 3]] and singles == [1]
+
+
+def test_mismatched_records_fall_back_to_single_extraction(recording_backend, ra):
+    backend = recording_backend({"agent1_packed": [
+        {"cv_id": "r0", "name": "Alice Zhang", "email": "alice@example.com", "language_preference": "English"},
+        {"cv_id": "r1", "name": "Carol Wu", "email": "carol@example.com", "language_preference": "English"},  # 串到了别的简历
+        {"cv_id": "r9", "name": "Carol Wu", "email": "carol@example.com", "language_preference": "English"},  # 未知 id
+    ]})
+    facts, _ = extract_facts_packed(CVS, backend)
+    assert facts[0]["name"] == "Alice Zhang" and "cv_id" not in facts[0]
+    assert facts[1] is None and facts[2] is None
+
+    prefetched = prefetch_agent1_packed(CVS, ra, backend=backend)
+    assert prefetched[0]["pack_size"] == 3
+    assert prefetched[1] is None and prefetched[2] is None
+    for text, pre in zip(CVS, prefetched):
+        analyze_batch_candidate(text, "招聘科研助理", "", ra, backend=backend, prefetched=pre, mode="full")
+    assert backend.calls["agent1"] == 2  # 只有校验失败的两份单独提取
+
+
+def test_duplicate_ids_are_not_trusted(recording_backend):
+    backend = recording_backend({"agent1_packed": [
+        {"cv_id": "r0", "name": "Alice Zhang", "email": "alice@example.com"},
+        {"cv_id": "r0", "name": "Alice Zhang", "email": "alice@example.com"},
+        {"cv_id": "r1", "name": "Bob Li", "email": "bob@example.com"},
+    ]})
+    facts, _ = extract_facts_packed(CVS[:2], backend)
+    assert facts[0] is None
+    assert facts[1]["email"] == "bob@example.com" and facts[1]["language_preference"] == "English"
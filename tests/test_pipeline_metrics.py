@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from pipeline_metrics import OUTPUT_COUNTERS, PipelineTrace, attach_span, summarize, to_jsonl, to_prometheus
+
+
+def span(stage, seconds, status="ok", **counts):
+    return {"stage": stage, "seconds": seconds, "prompt_tokens": 0, "response_tokens": 0, "retries": 0, "status": status,
+            "error": None, **dict.fromkeys(OUTPUT_COUNTERS, 0), **counts}
+
+
+def record(name, *spans):
+    return {"name": name, "fit_score": 80, "metrics": {"spans": list(spans), "failures": []}}
+
+
+def test_trace_records_spans_and_failures():
+    trace = PipelineTrace()
+    with trace.span("agent1") as rec:
+        rec["prompt_tokens"] = 100
+        rec["retries"] = 1
+    with pytest.raises(ValueError):
+        with trace.span("agent3"):
+            raise ValueError("bad json")
+    trace.meta["mode"] = "full"
+    d = trace.to_dict()
+    assert [s["stage"] for s in d["spans"]] == ["agent1", "agent3"]
+    assert d["prompt_tokens"] == 100 and d["retries"] == 1 and d["mode"] == "full"
+    assert d["failures"] == ["agent3: ValueError: bad json"]
+    result = {"name": "王小明", "metrics": d}
+    attach_span(result, "parse", 0.5)
+    assert result["metrics"]["spans"][0]["stage"] == "parse"
+
+
+def test_summarize_percentiles_and_cache_hits():
+    records = [record(f"c{i}", span("agent1", i / 10), span("agent3", 1.0, status="cache_hit" if i < 3 else "ok"))
+               for i in range(1, 11)]
+    records.append({"name": "Error", "fit_score": 0, "summary": "AI Error: TimeoutError: 分析超时"})
+    s = summarize(records, wall_seconds=30)
+    assert list(s["stages"]) == ["agent1", "agent3"]
+    agent1 = s["stages"]["agent1"]
+    assert agent1["count"] == 10
+    assert agent1["p50"] == pytest.approx(0.5) and agent1["p95"] == pytest.approx(1.0)
+    assert agent1["mean"] == pytest.approx(0.55) and agent1["cache_hits"] == 0
+    assert s["stages"]["agent3"]["cache_hits"] == 2
+    assert s["slowest_stage"] == "agent3"
+    assert s["candidates"] == 11 and s["failed"] == 1
+    assert s["throughput_per_min"] == pytest.approx(22)
+    assert s["failure_reasons"] == {"AI Error: TimeoutError": 1}
+
+
+def test_to_jsonl_one_line_per_candidate():
+    records = [{**record("王小明", span("agent1", 1.0)), "file_name": "a.pdf"}, record("Bob")]
+    lines = to_jsonl(records).splitlines()
+    assert len(lines) == 2
+    first = json.loads(lines[0])
+    assert first["file_name"] == "a.pdf" and first["name"] == "王小明"
+    assert first["metrics"]["spans"][0]["stage"] == "agent1"
+    assert "王小明" in lines[0]  # 不转义中文
+    assert to_jsonl([]) == ""
+
+
+def test_prometheus_textfile_lines():
+    records = [record("a", span("agent1", 1.5, prompt_tokens=100, response_tokens=20, retries=1)),
+               {"name": "Error", "fit_score": 0, "metrics": {"spans": [span("agent1", 0.5, status="error", json_repairs=1)],
+                                                              "failures": ["agent1: ValueError: bad json"]}}]
+    text = to_prometheus(summarize(records, wall_seconds=60), prefix="t")
+    assert text == "\n".join([
+        "# HELP t_candidates_total Candidates processed",
+        "# TYPE t_candidates_total counter",
+        "t_candidates_total 2",
+        "# HELP t_candidate_failures_total Candidates with at least one failed stage",
+        "# TYPE t_candidate_failures_total counter",
+        "t_candidate_failures_total 1",
+        "# HELP t_throughput_candidates_per_minute Batch throughput",
+        "# TYPE t_throughput_candidates_per_minute gauge",
+        "t_throughput_candidates_per_minute 2.0",
+        "# HELP t_stage_seconds_sum Total time spent per stage",
+        "# TYPE t_stage_seconds_sum counter",
+        't_stage_seconds_sum{stage="agent1"} 2.0',
+        "# HELP t_stage_seconds_count Number of stage executions",
+        "# TYPE t_stage_seconds_count counter",
+        't_stage_seconds_count{stage="agent1"} 2',
+        "# HELP t_stage_seconds_p95 95th percentile stage latency",
+        "# TYPE t_stage_seconds_p95 gauge",
+        't_stage_seconds_p95{stage="agent1"} 1.5',
+        "# HELP t_stage_retries_total LLM retries per stage",
+        "# TYPE t_stage_retries_total counter",
+        't_stage_retries_total{stage="agent1"} 1',
+        "# HELP t_stage_errors_total Failed stage executions",
+        "# TYPE t_stage_errors_total counter",
+        't_stage_errors_total{stage="agent1"} 1',
+        "# HELP t_stage_tokens_total Estimated tokens per stage",
+        "# TYPE t_stage_tokens_total counter",
+        't_stage_tokens_total{stage="agent1",direction="prompt"} 100',
+        't_stage_tokens_total{stage="agent1",direction="response"} 20',
+        "# HELP t_stage_json_repairs_total LLM responses fixed by local JSON repair",
+        "# TYPE t_stage_json_repairs_total counter",
+        't_stage_json_repairs_total{stage="agent1"} 1',
+        "# HELP t_stage_refetched_fields_total Fields re-requested after schema validation",
+        "# TYPE t_stage_refetched_fields_total counter",
+        't_stage_refetched_fields_total{stage="agent1"} 0',
+        "# HELP t_stage_schema_errors_total Fields still invalid after repair and re-request",
+        "# TYPE t_stage_schema_errors_total counter",
+        't_stage_schema_errors_total{stage="agent1"} 0',
+        "# HELP t_failure_reasons_total Failures by reason",
+        "# TYPE t_failure_reasons_total counter",
+        't_failure_reasons_total{reason="agent1: ValueError"} 1',
+    ]) + "\n"
@@ -0,0 +1,51 @@
+from prescreen import prescreen, tokenize
+
+JD = "招聘科研助理，熟悉单细胞测序和 CRISPR 基因编辑"
+CVS = [
+    "张三 科研助理 单细胞测序 CRISPR 基因编辑 qPCR",
+    "李四 单细胞测序 细胞培养",
+    "王五 行政管理 Office 报销",
+]
+
+
+def test_cjk_text_is_split_into_bigrams():
+    assert tokenize("单细胞测序 CRISPR") == ["单细", "细胞", "胞测", "测序", "crispr"]
+    assert tokenize("血") == ["血"]
+
+
+def test_scores_are_relative_to_batch_maximum():
+    results = prescreen(CVS, JD, "单细胞测序")
+    assert results[0]["score"] == 100.0
+    assert 0 < results[1]["score"] < 100
+    assert results[2]["score"] == 0.0
+    assert all(r["selected"] for r in results)
+    assert results[1]["must_have_hits"] == ["单细胞测序"]
+    assert results[2]["must_have_hits"] == []
+
+
+def test_bigram_match_needs_the_whole_phrase():
+    # "测序" 和 "单细胞" 分开出现时，"单细胞测序" 中的 "胞测" 不命中
+    results = prescreen(["单细胞 RNA 测序", "单细胞测序"], JD, "单细胞测序")
+    assert results[0]["must_have_hits"] == []
+    assert results[1]["must_have_hits"] == ["单细胞测序"]
+
+
+def test_threshold_and_top_k_intersect():
+    assert [r["selected"] for r in prescreen(CVS, JD, "", threshold=50)] == [True, False, False]
+    assert [r["selected"] for r in prescreen(CVS, JD, "", top_k=2)] == [True, True, False]
+    assert [r["selected"] for r in prescreen(CVS, JD, "", top_k=2, threshold=50)] == [True, False, False]
+    assert [r["selected"] for r in prescreen(CVS, JD, "", top_k=2, threshold=0)] == [True, True, False]
+
+
+def test_threshold_uses_batch_maximum_not_absolute_bm25():
+    # 整批都很弱时，最高者仍为 100 分
+    weak = ["王五 CRISPR", "赵六 Office"]
+    results = prescreen(weak, JD, "")
+    assert results[0]["score"] == 100.0
+    assert [r["selected"] for r in prescreen(weak, JD, "", threshold=90)] == [True, False]
+
+
+def test_empty_batch_and_no_matches():
+    assert prescreen([], JD, "") == []
+    results = prescreen(["Office 报销"], "CRISPR", "")
+    assert results[0]["score"] == 0.0
@@ -0,0 +1,70 @@
+import json
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import preset_manager
+from preset_manager import list_preset_versions, load_presets, restore_preset_version, save_preset
+
+
+@pytest.fixture(autouse=True)
+def presets_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(preset_manager, "DB_FILE", str(tmp_path / "job_presets.db"))
+    monkeypatch.setattr(preset_manager, "LEGACY_JSON_FILE", str(tmp_path / "job_presets.json"))
+    monkeypatch.setattr(preset_manager, "_cache", {"stamp": None, "presets": {}})
+    return tmp_path
+
+
+def test_legacy_json_is_imported_once(presets_db, ra):
+    legacy = {"单细胞科研助理": {"jd": "招聘科研助理", "must_haves": "硕士", "role_type": ra}}
+    (presets_db / "job_presets.json").write_text(json.dumps(legacy, ensure_ascii=False), encoding="utf-8")
+    presets = load_presets()
+    assert presets == {"单细胞科研助理": {"jd": "招聘科研助理", "must_haves": "硕士", "role_type": ra, "version": 1}}
+    # 导入标记已写入：旧文件改动不会再次导入
+    (presets_db / "job_presets.json").write_text(json.dumps({"行政": {"jd": "x"}}), encoding="utf-8")
+    preset_manager._invalidate()
+    assert list(load_presets()) == ["单细胞科研助理"]
+    assert len(list_preset_versions("单细胞科研助理")) == 1
+
+
+def test_cache_reloads_after_another_connection_writes(ra):
+    save_preset("A", "jd a", "", ra)
+    assert list(load_presets()) == ["A"]
+    time.sleep(0.01)  # 保证文件修改时间变化
+    conn = sqlite3.connect(preset_manager.DB_FILE)  # 模拟另一个进程写入
+    with conn:
+        conn.execute("INSERT INTO presets VALUES ('B', 'jd b', '', ?, 1, ?)", (ra, time.time()))
+    conn.close()
+    assert list(load_presets()) == ["A", "B"]
+
+
+def test_save_list_and_restore_versions(ra):
+    assert save_preset("A", "v1", "博士", ra) == 1
+    assert save_preset("A", "v2", "", ra) == 2
+    assert [v["version"] for v in list_preset_versions("A")] == [2, 1]
+    assert load_presets()["A"]["jd"] == "v2"
+    assert restore_preset_version("A", 1) == 3
+    current = load_presets()["A"]
+    assert current["jd"] == "v1" and current["must_haves"] == "博士" and current["version"] == 3
+    assert [v["jd"] for v in list_preset_versions("A")] == ["v1", "v2", "v1"]
+    with pytest.raises(KeyError):
+        restore_preset_version("A", 9)
+
+
+def test_parallel_saves_lose_nothing(ra):
+    def save(i):
+        save_preset("A", f"jd {i}", "", ra)
+        save_preset(f"P{i}", "jd", "", ra)
+
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    versions = list_preset_versions("A")
+    assert sorted(v["version"] for v in versions) == list(range(1, 9))
+    assert sorted(v["jd"] for v in versions) == sorted(f"jd {i}" for i in range(8))
+    presets = load_presets()
+    assert len(presets) == 9 and presets["A"]["version"] == 8
@@ -0,0 +1,37 @@
+from candidate_store import CandidateStore
+from llm_backend import MockBackend
+from utils import match_candidate_presets
+
+PRESETS = {
+    "肿瘤免疫博士后": {"jd": "招聘博士后，肿瘤免疫方向", "must_haves": "博士", "role_type": "🧪 PI / 博士后 (Postdoc)"},
+    "单细胞科研助理": {"jd": "招聘科研助理，单细胞测序", "must_haves": "", "role_type": "🧬 科研助理 (RA)"},
+    "科室行政": {"jd": "招聘科室行政", "must_haves": "", "role_type": "💼 行政管理 (Admin)"},
+}
+CVS = ["王小明\nwang.xm@example.com\n技能\n细胞培养, qPCR", "Alice Zhang\nalice@example.com\nSkills: CRISPR"]
+
+
+def test_matrix_has_one_column_per_preset():
+    backend = MockBackend()
+    store = CandidateStore()
+    for cv in CVS:
+        store.add(match_candidate_presets(cv, PRESETS, backend=backend))
+    assert backend.calls["agent1"] == len(CVS)  # 每份简历只提取一次
+    assert backend.calls["agent3"] == len(CVS) * len(PRESETS)
+    for c in store:
+        assert set(c["matches"]) == set(PRESETS)
+        assert c["fit_score"] == max(m["fit_score"] for m in c["matches"].values())
+        assert c["matches"][c["best_preset"]]["fit_score"] == c["fit_score"]
+        assert c["matches"]["科室行政"]["role_type"] == PRESETS["科室行政"]["role_type"]
+    df = store.preset_matrix()
+    assert df.shape == (len(CVS), 2 + len(PRESETS) + 2)
+    assert list(df.columns) == ["ID", "姓名", *PRESETS, "最佳岗位", "最佳匹配度"]
+    assert list(df["最佳匹配度"]) == sorted(df["最佳匹配度"], reverse=True)
+
+
+def test_empty_presets_make_no_llm_calls():
+    backend = MockBackend()
+    result = match_candidate_presets(CVS[0], {}, backend=backend)
+    assert result["matches"] == {} and result["best_preset"] is None
+    assert backend.calls == {}
+    store = CandidateStore([result])
+    assert store.preset_matrix().empty
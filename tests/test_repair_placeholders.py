@@ -0,0 +1,62 @@
+from analysis_cache import AnalysisCache
+from llm_backend import MockBackend
+from utils import generate_recruitment_email, repair_placeholders
+
+SENDER = {"name": "Hongli Ding", "title": "Talent Acquisition Specialist", "org": "Zhejiang University Medical Center"}
+ROLE = "🧬 科研助理 (RA)"
+
+
+def repair(draft):
+    return repair_placeholders(draft, SENDER, "Li Wei", ROLE)
+
+
+def test_org_placeholders_use_org_not_sender_name():
+    text, ok = repair("Join us at [Company Name]. We are proud of [University Name].")
+    assert ok
+    assert text == "Join us at Zhejiang University Medical Center. We are proud of Zhejiang University Medical Center."
+
+
+def test_position_placeholders_use_offered_role():
+    text, ok = repair("We are hiring for the [Position] role ([Job Title]).")
+    assert ok
+    assert "科研助理 (RA)" in text
+    assert "Talent Acquisition Specialist" not in text
+
+
+def test_generic_name_after_greeting_is_candidate():
+    text, ok = repair("Hi [姓名]，您好！")
+    assert ok
+    assert text.startswith("Hi Li Wei")
+
+
+def test_signature_placeholders_use_sender():
+    text, ok = repair("Dear [Candidate Name],\n\nBest regards,\n[Your Name]\n[Your Title], [Organization]")
+    assert ok
+    assert text == ("Dear Li Wei,\n\nBest regards,\nHongli Ding\n"
+                    "Talent Acquisition Specialist, Zhejiang University Medical Center")
+
+
+def test_unrecognised_placeholders_are_kept_and_fail():
+    text, ok = repair("Please reply by [Date], thanks. Call at [Time].")
+    assert not ok
+    assert "[Date]" in text and "[Time]" in text
+
+
+def test_missing_value_is_not_deleted():
+    text, ok = repair_placeholders("Hi [Candidate Name],", SENDER, "", ROLE)
+    assert not ok
+    assert "[Candidate Name]" in text
+
+
+def test_email_cache_is_keyed_on_sender_info(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache.db"))
+    backend = MockBackend()
+    cand = {"name": "Li Wei", "email": "li.wei@example.com", "language_preference": "English", "technical_skills": ["qPCR"]}
+    generate_recruitment_email(cand, SENDER, ROLE, backend=backend, cache=cache)
+    generate_recruitment_email(cand, SENDER, ROLE, backend=backend, cache=cache)
+    assert backend.calls["email"] == 1
+    # 英文 prompt 不含职称，但职称变化仍需重新生成
+    generate_recruitment_email(cand, {**SENDER, "title": "PI"}, ROLE, backend=backend, cache=cache)
+    assert backend.calls["email"] == 2
+    generate_recruitment_email({**cand, "email": "other@example.com"}, SENDER, ROLE, backend=backend, cache=cache)
+    assert backend.calls["email"] == 3
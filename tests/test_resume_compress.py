@@ -0,0 +1,48 @@
+from resume_compress import compress_resume, estimate_tokens, split_sections, TOKEN_BUDGETS, _section_of
+
+
+def test_single_long_english_line_is_cut_not_dropped():
+    text = "John Smith, PhD. " + "Worked on CRISPR screening and single-cell sequencing. " * 730
+    assert len(text) > 40000 and "\n" not in text
+    compressed, stats = compress_resume(text, "🧪 PI / 博士后 (Postdoc)")
+    assert compressed.startswith("John Smith, PhD.")
+    assert 0 < stats["tokens_after"] <= TOKEN_BUDGETS["PI"]
+    assert text.startswith(compressed)
+    assert "header (截断)" in stats["dropped_sections"]
+
+
+def test_long_chinese_paragraph_under_admin_budget():
+    text = "张三，从事科研行政管理工作多年，负责经费报销与伦理审批。" * 320
+    assert len(text) > 8800
+    compressed, stats = compress_resume(text, "💼 行政管理 (Admin)")
+    assert compressed and text.startswith(compressed)
+    assert estimate_tokens(compressed) <= TOKEN_BUDGETS["Admin"]
+    assert estimate_tokens(compressed) > TOKEN_BUDGETS["Admin"] - 10
+
+
+def test_long_line_inside_section_keeps_earlier_lines():
+    text = "Li Wei\nli.wei@example.com\nEXPERIENCE\nPostdoc, 2019-2023\n" + "x" * 60000
+    compressed, stats = compress_resume(text, "🧬 科研助理 (RA)")
+    assert compressed.startswith("Li Wei\nli.wei@example.com")
+    assert "Postdoc, 2019-2023" in compressed
+    assert stats["tokens_after"] <= TOKEN_BUDGETS["RA"]
+
+
+def test_short_resume_is_unchanged():
+    text = "Li Wei\nEDUCATION\nPhD, Zhejiang University"
+    compressed, stats = compress_resume(text, "🧬 科研助理 (RA)")
+    assert compressed == text
+    assert stats["dropped_sections"] == []
+
+
+def test_section_keywords_need_a_word_boundary():
+    for line in ("EDUCATION", "Education:", "Education & Training", "教育背景", "二、专业技能", "工作经历与科研成果", "Awards/Honors"):
+        assert _section_of(line), line
+    for line in ("Experienced in qPCR and flow cytometry", "Education-related duties", "技术员", "技术员，负责仪器维护"):
+        assert _section_of(line) is None, line
+
+
+def test_body_lines_stay_in_their_section():
+    text = "王小明\n工作经历\n技术员，负责仪器维护\nExperienced in qPCR\n教育背景\n北京大学 硕士"
+    assert [s for s, _ in split_sections(text)] == ["header", "experience", "education"]
+    assert "技术员" in dict(split_sections(text))["experience"]
@@ -0,0 +1,50 @@
+import multiprocessing
+import time
+
+import pytest
+
+import text_extraction
+from text_extraction import iter_extract
+
+_extract_bytes = text_extraction.extract_bytes
+
+
+def _fake_extract(file_name, data, *args):
+    if file_name.startswith("hang"):
+        time.sleep(60)
+    if file_name.startswith("slow"):
+        time.sleep(1)
+    if file_name.startswith("long"):
+        time.sleep(3)
+    return _extract_bytes(file_name, data, *args)
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="需要 fork 让子进程继承 monkeypatch")
+def test_hung_file_times_out_and_others_finish(monkeypatch):
+    monkeypatch.setattr(text_extraction, "START_METHOD", "fork")
+    monkeypatch.setattr(text_extraction, "extract_bytes", _fake_extract)
+    sources = [("hang.txt", b"x")] + [(f"slow{i}.txt", b"hello") for i in range(4)]
+    t0 = time.monotonic()
+    results = dict(iter_extract(sources, max_workers=2, max_seconds=0))  # 硬超时 5s
+    assert time.monotonic() - t0 < 20
+    assert results[0]["error"].startswith("解析超时")
+    assert [results[i]["text"] for i in range(1, 5)] == ["hello"] * 4
+    assert all(results[i]["error"] is None for i in range(1, 5))
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="需要 fork 让子进程继承 monkeypatch")
+def test_queued_files_do_not_time_out(monkeypatch):
+    # 单进程串行解析：第二个文件从提交起 6s 才完成，超过 5s 硬超时，但从开始解析算起只用了 3s
+    monkeypatch.setattr(text_extraction, "START_METHOD", "fork")
+    monkeypatch.setattr(text_extraction, "extract_bytes", _fake_extract)
+    sources = [(f"long{i}.txt", b"hello") for i in range(3)]
+    results = dict(iter_extract(sources, max_workers=1, max_seconds=0))
+    assert all(r["error"] is None and r["text"] == "hello" for r in results.values())
+
+
+def test_default_pool_does_not_fork():
+    assert text_extraction.START_METHOD in ("forkserver", "spawn")
+    sources = [("a.txt", "张三".encode("utf-8")), ("b.doc", b"x")]
+    results = dict(iter_extract(sources, max_workers=2))
+    assert results[0]["text"] == "张三" and results[0]["error"] is None
+    assert results[1]["error"] == "不支持的文件类型"
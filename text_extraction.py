@@ -0,0 +1,207 @@
+import io
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import PyPDF2
+import docx
+
+# 单个文件的解析上限：防止 100+ 页的学术简历或扫描件拖垮进程
+MAX_PAGES = 40
+MAX_SECONDS = 20
+MAX_CHARS = 60000
+
+PAGE_BREAK = "\f"  # 页间分隔符，供后续去除页眉页脚使用
+
+DEFAULT_WORKERS = max(1, min(4, (os.cpu_count() or 1)))
+# 进程池的启动方式：不用 fork，避免复制 Streamlit 主进程中已启动的线程和持有的锁
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _result(file_name: str, **kwargs) -> dict:
+    res = {"file_name": file_name, "text": "", "pages": 0, "chars": 0, "truncated": False, "error": None, "seconds": 0.0}
+    res.update(kwargs)
+    return res
+
+
+def _iter_pdf_pages(data: bytes):
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+
+def _iter_docx_blocks(data: bytes):
+    doc = docx.Document(io.BytesIO(data))
+    for para in doc.paragraphs:
+        yield para.text
+
+
+def extract_bytes(file_name: str, data: bytes, max_pages: int = MAX_PAGES, max_seconds: float = MAX_SECONDS, max_chars: int = MAX_CHARS) -> dict:
+    """
+    解析单个文件，返回结构化结果 (失败时 error 非空、text 为空)。
+    按页流式写入缓冲区，达到页数 / 字符 / 时间上限即停止并标记 truncated。
+    """
+    t0 = time.monotonic()
+    lower = file_name.lower()
+    try:
+        if lower.endswith(".txt"):
+            text = data.decode("utf-8", errors="replace")
+            truncated = len(text) > max_chars
+            text = text[:max_chars]
+            return _result(file_name, text=text, pages=1, chars=len(text), truncated=truncated, seconds=time.monotonic() - t0)
+        if lower.endswith(".pdf"):
+            blocks, sep, limit = _iter_pdf_pages(data), PAGE_BREAK, max_pages
+        elif lower.endswith(".docx"):
+            blocks, sep, limit = _iter_docx_blocks(data), "\n", None
+        else:
+            return _result(file_name, error="不支持的文件类型")
+
+        buf = io.StringIO()
+        chars = pages = 0
+        truncated = False
+        for block in blocks:
+            if (limit is not None and pages >= limit) or chars >= max_chars or time.monotonic() - t0 > max_seconds:
+                truncated = True
+                break
+            if pages:
+                buf.write(sep)
+            block = block[:max_chars - chars]
+            buf.write(block)
+            chars += len(block)
+            pages += 1
+        text = buf.getvalue()
+        if not text.strip():
+            return _result(file_name, pages=pages, error="未提取到文字 (可能是扫描件)", seconds=time.monotonic() - t0)
+        return _result(file_name, text=text, pages=pages, chars=len(text), truncated=truncated, seconds=time.monotonic() - t0)
+    except Exception as e:
+        return _result(file_name, error=f"{type(e).__name__}: {e}", seconds=time.monotonic() - t0)
+
+
+_started = {"queue": None}  # 工作进程中：向主进程报告任务开始时间 (及进程号) 的队列
+
+
+def _init_extract_worker(started_queue):
+    _started["queue"] = started_queue
+
+
+def _extract_task(index: int, file_name: str, data: bytes, max_pages: int, max_seconds: float, max_chars: int) -> dict:
+    """在工作进程中运行：先报告开始时间 (超时从真正开始解析时算起，而不是提交时) 和进程号 (超时后用于结束进程)"""
+    _started["queue"].put((index, time.time(), os.getpid()))
+    return extract_bytes(file_name, data, max_pages, max_seconds, max_chars)
+
+
+def _kill_pool(pool, pids) -> None:
+    """强制结束进程池 (卡死的 PyPDF2 解析无法通过 future.cancel() 中断)。pids 为工作进程报告的进程号"""
+    terminate = getattr(pool, "terminate_workers", None)  # Python 3.14+
+    if terminate is not None:
+        terminate()
+    else:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:  # 已经退出
+                pass
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_extract(sources, max_workers: int = DEFAULT_WORKERS, max_pages: int = MAX_PAGES, max_seconds: float = MAX_SECONDS, max_chars: int = MAX_CHARS):
+    """
+    在进程池中并行解析 sources ((file_name, bytes) 的可迭代对象)，按完成顺序 yield (index, result)。
+    同时在途的文件不超过 2 * max_workers 个，大批量时内存保持有界。
+    单个文件从开始解析起超过硬超时仍未返回时，以错误结果返回，并结束、重建进程池，
+    其余在途文件重新提交 (已完成的直接返回)，卡死的子进程不会一直占用名额。
+    """
+    sources = iter(sources)
+    hard_timeout = max_seconds * 2 + 5
+    workers = max(1, max_workers)
+
+    ctx = multiprocessing.get_context(START_METHOD)
+
+    def new_pool():
+        # 每个进程池用新的队列：被结束的进程可能留下旧队列的锁，也不会再收到旧进程池的开始时间
+        started_queue = ctx.Queue()
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_extract_worker, initargs=(started_queue,))
+        return pool, started_queue
+
+    def close_pool():
+        _kill_pool(pool, pids)
+        pids.clear()
+        started_queue.close()
+        started_queue.cancel_join_thread()
+
+    pool, started_queue = new_pool()
+    pending = {}  # future -> (index, file_name, data)
+    started = {}  # index -> 开始解析的时间 (time.time())
+    pids = set()  # 当前进程池中报告过的工作进程
+
+    def submit(i, name, data):
+        started.pop(i, None)
+        pending[pool.submit(_extract_task, i, name, data, max_pages, max_seconds, max_chars)] = (i, name, data)
+
+    def finished(fut, name):
+        try:
+            return fut.result()
+        except Exception as e:
+            return _result(name, error=f"{type(e).__name__}: {e}")
+
+    try:
+        index = 0
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < 2 * workers:
+                try:
+                    name, data = next(sources)
+                except StopIteration:
+                    exhausted = True
+                    break
+                submit(index, name, data)
+                index += 1
+            if not pending:
+                break
+
+            done, _ = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+            for fut in done:
+                i, name, _ = pending.pop(fut)
+                started.pop(i, None)
+                yield i, finished(fut, name)
+
+            while True:
+                try:
+                    i, t, pid = started_queue.get_nowait()
+                except queue.Empty:
+                    break
+                started[i] = t
+                pids.add(pid)
+
+            now = time.time()
+            hung = [(fut, item) for fut, item in pending.items()
+                    if item[0] in started and now - started[item[0]] > hard_timeout and not fut.done()]
+            if not hung:
+                continue
+            # 结束整个进程池 (无法只结束某个工作进程)，其余在途文件在新进程池中重新解析
+            hung_ids = {item[0] for _, item in hung}
+            others = [(fut, item) for fut, item in pending.items() if item[0] not in hung_ids]
+            # 在结束进程池前已完成的结果仍然有效，其余重新提交
+            ready = [(fut, item) for fut, item in others if fut.done()]
+            rerun = [item for fut, item in others if not fut.done()]
+            close_pool()
+            pool, started_queue = new_pool()
+            pending.clear()
+            for _, (i, name, _) in hung:
+                yield i, _result(name, error=f"解析超时 (>{hard_timeout:.0f}s)", seconds=now - started.pop(i))
+            for fut, (i, name, _) in ready:
+                started.pop(i, None)
+                yield i, finished(fut, name)
+            for i, name, data in rerun:
+                submit(i, name, data)
+    finally:
+        if pending:
+            close_pool()  # 提前退出 (异常或调用方不再迭代)：不等待可能卡死的子进程
+        else:
+            # 正常结束时等工作进程退出：队列在子进程启动完成前被回收会导致其启动失败
+            pool.shutdown()
+            started_queue.close()
+
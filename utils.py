@@ -1,42 +1,126 @@
 import os
-import google.generativeai as genai
-import PyPDF2
-import docx
+import re
+import time
 import json
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from batch_engine import call_with_retry, run_batch, DEFAULT_CONCURRENCY
+from llm_backend import configure_api_key, get_backend
+from llm_scheduler import get_scheduler, RESPONSE_TOKEN_RESERVE
+from resume_compress import compress_resume, collapse_whitespace, estimate_tokens, role_key, TOKEN_BUDGETS
+from pipeline_metrics import PipelineTrace
+from output_schema import AGENT1_SCHEMA, agent3_schema, fused_schema, parse_json_lenient, validate, refetch_fields, fill_defaults, field_fix_prompt
+from mailer import SMTP_HOST, SMTP_PORT, build_message, open_session
+
+# 修改任一 Agent 的 prompt 时升级对应版本号，旧缓存会自动失效
+PROMPT_VERSIONS = {"agent1": "v3", "agent2": "v1", "agent3": "v2", "fused": "v2", "email": "v1"}
+
+# 分析模式：full = Agent 1 -> 2 -> 3 三次串行调用；fast = 风控与决策合并为一次调用 (有现成的 Agent 1 结果时两次)
+PIPELINE_MODES = {"full": "完整 (三 Agent)", "fast": "快速 (合并调用)"}
+# 各赛道默认的分析模式，根据 benchmarks/mode_agreement.py 的一致性报告调整
+DEFAULT_PIPELINE_MODE = {"PI": "full", "RA": "full", "Admin": "full"}
 
 def configure_ai(api_key: str):
-    if api_key: genai.configure(api_key=api_key)
+    if api_key: configure_api_key(api_key)
+
+def _generate(backend, prompt, stage, json_mode=False, span=None) -> str:
+    """
+    通过后端调用大模型，429/5xx 按指数退避重试。每次请求 (含重试) 先经进程级调度器按 RPM/TPM 排队，
+    通道取当前上下文 (llm_scheduler.priority)。传入 span 时累计重试次数与 (估算的) token 数
+    """
+    scheduler = get_scheduler()
+    prompt_tokens = estimate_tokens(prompt)
+    def call():
+        scheduler.acquire(prompt_tokens + RESPONSE_TOKEN_RESERVE)
+        text = backend.generate(prompt, json_mode=json_mode, stage=stage)
+        scheduler.settle(estimate_tokens(text) - RESPONSE_TOKEN_RESERVE)
+        return text
+    def on_retry(attempt, exc):
+        if span is not None: span["retries"] += 1
+    text = call_with_retry(call, on_retry=on_retry)
+    if span is not None:
+        span["prompt_tokens"] += prompt_tokens
+        span["response_tokens"] += estimate_tokens(text)
+    return text
 
-def extract_text_from_file(uploaded_file) -> str:
+def _generate_structured(backend, prompt, stage, schema, span=None) -> dict:
+    """
+    JSON 阶段的调用：本地修复 (代码块、前后说明文字、截断) -> 按 schema 校验和类型转换 ->
+    只对仍无效的关键字段补请求一次 -> 其余无效字段填默认值。必需字段 (如 fit_score) 仍无效时抛 ValueError。
+    修复 / 补请求 / 仍无效的次数累计到 span 中。
+    """
+    counters = span if span is not None else {}
     try:
-        if uploaded_file.name.endswith('.pdf'):
-            reader = PyPDF2.PdfReader(uploaded_file)
-            text = "\n".join(page.extract_text() or "" for page in reader.pages)
-            return text
-        elif uploaded_file.name.endswith('.docx'):
-            doc = docx.Document(uploaded_file)
-            text = "\n".join(para.text for para in doc.paragraphs)
-            return text
-        elif uploaded_file.name.endswith('.txt'):
-            return str(uploaded_file.read(), "utf-8")
-        return ""
-    except Exception as e:
-        return f"Error reading file: {str(e)}"
+        data, repaired = parse_json_lenient(_generate(backend, prompt, stage, json_mode=True, span=span))
+        counters["json_repairs"] = counters.get("json_repairs", 0) + repaired
+    except ValueError:
+        data = {}  # 完全无法解析：所有关键字段走补请求
+    data, invalid = validate(data, schema)
+    todo = refetch_fields(schema, invalid)
+    if todo:
+        counters["refetched_fields"] = counters.get("refetched_fields", 0) + len(todo)
+        sub_schema = {f: schema[f] for f in todo}
+        try:
+            patch, _ = parse_json_lenient(_generate(backend, field_fix_prompt(prompt, data, todo, schema), f"{stage}_fix", json_mode=True, span=span))
+            patch, still_invalid = validate(patch, sub_schema)
+            data.update({f: patch[f] for f in todo if f not in still_invalid})
+        except Exception:
+            pass  # 补请求失败时按仍无效处理
+        data, invalid = validate(data, schema)
+    if invalid:
+        counters["schema_errors"] = counters.get("schema_errors", 0) + len(invalid)
+    missing = fill_defaults(data, schema, invalid)
+    if missing:
+        raise ValueError(f"输出缺少必需字段: {', '.join(missing)}")
+    return data
 
-# --- 分析逻辑 (保持不变) ---
-def analyze_batch_candidate(resume_text: str, jd_text: str, must_haves: str, role_type: str) -> dict:
-    
-    model = genai.GenerativeModel('gemini-2.0-flash', generation_config={"response_mime_type": "application/json"})
-    
-    # 1. AGENT 1: 提取
+def _cached_stage(cache, backend, stage: str, parts: list, compute, span=None):
+    """有缓存时按 (阶段, prompt 版本, 模型, 输入) 取缓存，失败 (抛异常) 的结果不会写入。命中时 span 状态记为 cache_hit"""
+    if cache is None:
+        return compute()
+    called = []
+    def tracked():
+        called.append(True)
+        return compute()
+    value = cache.get_or_compute(stage, PROMPT_VERSIONS[stage], backend.model_name, parts, tracked)
+    if span is not None and not called: span["status"] = "cache_hit"
+    return value
+
+# --- 分析逻辑 ---
+def default_mode(role_type: str) -> str:
+    return DEFAULT_PIPELINE_MODE[role_key(role_type)]
+
+def analyze_batch_candidate(resume_text: str, jd_text: str, must_haves: str, role_type: str, cache=None, backend=None, prefetched=None,
+                            mode: str = "full") -> dict:
+    """
+    prefetched: prefetch_agent1_packed 预先 (打包) 提取的 Agent 1 结果，提供时跳过单独的 Agent 1 调用
+    mode: "full" (三 Agent) 或 "fast" (一次调用直接从简历得到同样结构的结果；有 prefetched 时在其基础上调用一次)
+    """
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"未知分析模式: {mode}")
+    backend = backend or get_backend()
+    trace = PipelineTrace()
+    trace.meta["pipeline_mode"] = mode
+
+    # 0. 预处理：按赛道 token 预算压缩简历 (取代原先的 resume_text[:15000])
+    resume_text, compress_stats = compress_resume(resume_text, role_type)
+    trace.meta["resume_tokens_before"] = compress_stats["tokens_before"]
+    trace.meta["resume_tokens_after"] = compress_stats["tokens_after"]
+
+    if mode == "fast" and prefetched is None:
+        result = _run_fused(None, jd_text, must_haves, role_type, trace, cache, backend, resume_text=resume_text)
+    else:
+        extracted_facts, ok = _run_agent_1(resume_text, trace, cache, backend, prefetched)
+        judge = _run_fused if mode == "fast" else _run_judgement
+        result = judge(extracted_facts, jd_text, must_haves, role_type, trace, cache if ok else None, backend)
+    result["metrics"] = trace.to_dict()
+    return result
+
+def _run_agent_1(resume_text: str, trace, cache, backend, prefetched=None) -> tuple:
+    """AGENT 1: 提取 (输入为压缩后的简历)。返回 (facts, 是否成功)，失败时 facts 为兜底值"""
     prompt_agent_1 = f"""
     ROLE: Data Extraction Specialist.
     TASK: Extract data from the CV.
     CRITICAL STEP - LANGUAGE DETECTION: Determine `language_preference` ("Chinese" or "English").
-    CV TEXT: {resume_text[:15000]}
+    CV TEXT: {resume_text}
     
     EXTRACT JSON:
     1. Name
@@ -49,11 +133,26 @@ def analyze_batch_candidate(resume_text: str, jd_text: str, must_haves: str, rol
     
     OUTPUT: JSON only.
     """
+    # Agent 1 只依赖 (压缩后的) 简历本身，修改 JD 不会让它失效
+    if prefetched is not None:
+        with trace.span("agent1") as sp:
+            extracted_facts = prefetched["facts"]
+            for k in ("prompt_tokens", "response_tokens", "retries"): sp[k] = prefetched[k]
+        sp["seconds"] = prefetched["seconds"]  # 打包请求的耗时按简历数分摊
+        trace.meta["agent1_pack_size"] = prefetched["pack_size"]
+        return extracted_facts, True
     try:
-        raw_data_response = model.generate_content(prompt_agent_1, generation_config={"response_mime_type": "application/json"})
-        extracted_facts = json.loads(raw_data_response.text)
-    except:
-        extracted_facts = {"language_preference": "English"}
+        with trace.span("agent1") as sp:
+            extracted_facts = _cached_stage(cache, backend, "agent1", [resume_text], lambda:
+                _generate_structured(backend, prompt_agent_1, "agent1", AGENT1_SCHEMA, span=sp), span=sp)
+        return extracted_facts, True
+    except Exception:
+        # 失败原因已记录在 trace 中
+        return {"language_preference": "English"}, False
+
+def _run_judgement(extracted_facts: dict, jd_text: str, must_haves: str, role_type: str, trace, cache, backend) -> dict:
+    """AGENT 2 + 3：依赖 JD 的风控与决策。cache 为 None 表示上游已降级，不缓存下游结果"""
+    jd_text = collapse_whitespace(jd_text)
 
     # 2. AGENT 2: 风控 (中文)
     prompt_agent_2 = f"""
@@ -62,18 +161,15 @@ def analyze_batch_candidate(resume_text: str, jd_text: str, must_haves: str, rol
     输出: 3个风险点 (Bullet points)。如无风险，回"无明显风险"。
     """
     try:
-        critique_text = model.generate_content(prompt_agent_2).text
-    except:
+        with trace.span("agent2") as sp:
+            critique_text = _cached_stage(cache, backend, "agent2", [extracted_facts, jd_text, must_haves],
+                                          lambda: _generate(backend, prompt_agent_2, "agent2", span=sp), span=sp)
+    except Exception:
         critique_text = "分析失败"
+        cache = None
 
     # 3. AGENT 3: 决策 (中文)
-    if "PI" in role_type or "Postdoc" in role_type:
-        json_struct = '"bibliometrics": {"h_index": "Val", "total_citations": "Val", "total_paper_count": "Val"}, "representative_papers": [{"title":"", "journal":"", "significance":""}],'
-    elif "Research Assistant" in role_type:
-        json_struct = '"technical_skills": ["Skill 1"], "lab_experience_years": "Val", "project_participation": ["Proj 1"],'
-    else: 
-        json_struct = '"core_competencies": ["Comp 1"], "software_tools": ["Tool 1"],'
-
+    json_struct = _role_json_struct(role_type)
     prompt_agent_3 = f"""
     角色: 招聘决策官。
     输入: JD: {jd_text} | 事实: {json.dumps(extracted_facts)} | 风险: {critique_text}
@@ -93,15 +189,285 @@ def analyze_batch_candidate(resume_text: str, jd_text: str, must_haves: str, rol
     }}
     """
     try:
-        data = json.loads(model.generate_content(prompt_agent_3, generation_config={"response_mime_type": "application/json"}).text)
-        if isinstance(data, list): return data[0]
-        return data
+        with trace.span("agent3") as sp:
+            result = _cached_stage(cache, backend, "agent3", [extracted_facts, critique_text, jd_text, role_type], lambda:
+                _generate_structured(backend, prompt_agent_3, "agent3", agent3_schema(role_type), span=sp), span=sp)
     except Exception as e:
         return {"name": "Error", "fit_score": 0, "summary": f"AI Error: {str(e)}"}
+    if not str(result.get("critique_notes") or "").strip():
+        # 决策输出漏掉了风险点：直接沿用 Agent 2 的结论
+        result = {**result, "critique_notes": critique_text}
+    return result
+
+def _role_json_struct(role_type: str) -> str:
+    """决策输出中的赛道专属字段，赛道判断与输出 schema 一致 (见 output_schema.AGENT3_SCHEMAS)"""
+    track = role_key(role_type)
+    if track == "PI":
+        return '"bibliometrics": {"h_index": "Val", "total_citations": "Val", "total_paper_count": "Val"}, "representative_papers": [{"title":"", "journal":"", "significance":""}],'
+    if track == "RA":
+        return '"technical_skills": ["Skill 1"], "lab_experience_years": "Val", "project_participation": ["Proj 1"],'
+    return '"core_competencies": ["Comp 1"], "software_tools": ["Tool 1"],'
+
+def _run_fused(extracted_facts, jd_text: str, must_haves: str, role_type: str, trace, cache, backend, resume_text: str = None) -> dict:
+    """
+    快速模式：风控 (Agent 2) 与决策 (Agent 3) 合并为一次调用，输出结构与 Agent 3 相同。
+    extracted_facts 为 None 时直接读 (压缩后的) resume_text，一次调用完成提取、风控和决策
+    """
+    jd_text = collapse_whitespace(jd_text)
+    from_resume = extracted_facts is None
+    evidence = resume_text if from_resume else json.dumps(extracted_facts)
+    if from_resume:
+        # 没有 Agent 1 结果：身份字段给出说明而不是具体值，避免模型照抄默认值
+        identity = '"name": "从简历提取的姓名", "email": "从简历提取的邮箱 (没有则为空字符串)", "language_preference": "Chinese" or "English",'
+    else:
+        identity = (f'"name": "{extracted_facts.get("name", "Candidate")}", "email": "{extracted_facts.get("email", "")}", '
+                    f'"language_preference": "{extracted_facts.get("language_preference", "English")}",')
+    prompt = f"""
+    角色: 招聘风控专家兼决策官。
+    输入: JD: {jd_text} | 必须: {must_haves}
+    任务 (一次完成，内容用中文):
+    1. 风控: 对照 JD 和必须条件，列出最多 3 个风险点 (Bullet points)，写入 critique_notes；如无风险写"无明显风险"。
+    2. 决策: 结合风险点给出评估 JSON。
+    {'CRITICAL - 姓名、邮箱从简历原文提取；LANGUAGE DETECTION: language_preference 按简历语言判断 ("Chinese" or "English")。' if from_resume else ""}
+
+    OUTPUT SCHEMA (JSON):
+    {{
+        {identity}
+        "fit_score": 0-100,
+        "summary": "中文画像总结",
+        "critique_notes": "风险点",
+        {_role_json_struct(role_type)}
+        "strengths": ["优势1"],
+        "gaps": ["劣势1"]
+    }}
+
+    {"CV TEXT" if from_resume else "事实"}: {evidence}
+    """
+    try:
+        with trace.span("fused") as sp:
+            result = _cached_stage(cache, backend, "fused", [evidence, jd_text, must_haves, role_type], lambda:
+                _generate_structured(backend, prompt, "fused", fused_schema(role_type, from_resume), span=sp), span=sp)
+    except Exception as e:
+        result = {"name": "Error", "fit_score": 0, "summary": f"AI Error: {str(e)}"}
+    return result
+
+def _fit(result: dict) -> float:
+    try:
+        return float(result.get("fit_score"))
+    except (TypeError, ValueError):
+        return 0.0
+
+def match_candidate_presets(resume_text: str, presets: dict, cache=None, backend=None, max_workers: int = DEFAULT_CONCURRENCY,
+                            mode: str = "full") -> dict:
+    """
+    多岗位匹配：一份简历对多个岗位模板 ({名称: {"jd", "must_haves", "role_type"}}) 打分。
+    Agent 1 只跑一次，Agent 2 / 3 (fast 模式下为合并调用) 按模板扇出 (最多 max_workers 个并发)。
+    返回最佳岗位的完整结果，另附 matches (各模板结果) 和 best_preset。没有模板时不调用 LLM，matches 为空。
+    """
+    backend = backend or get_backend()
+    trace = PipelineTrace()
+    trace.meta["pipeline_mode"] = mode
+    if not presets:
+        return {"fit_score": 0, "summary": "未选择岗位模板", "matches": {}, "best_preset": None, "metrics": trace.to_dict()}
+    judge_stage = _run_fused if mode == "fast" else _run_judgement
+    # 按所选模板中预算最大的赛道压缩，保证每个岗位都能看到足够的内容
+    budget_role = max((p["role_type"] for p in presets.values()), key=lambda r: TOKEN_BUDGETS[role_key(r)])
+    resume_text, compress_stats = compress_resume(resume_text, budget_role)
+    trace.meta["resume_tokens_before"] = compress_stats["tokens_before"]
+    trace.meta["resume_tokens_after"] = compress_stats["tokens_after"]
+    extracted_facts, ok = _run_agent_1(resume_text, trace, cache, backend)
+
+    def judge(name):
+        p = presets[name]
+        sub = PipelineTrace()
+        res = judge_stage(extracted_facts, p["jd"], p["must_haves"], p["role_type"], sub, cache if ok else None, backend)
+        res["role_type"] = p["role_type"]
+        trace.spans.extend(dict(sp, preset=name) for sp in sub.spans)
+        return res
+
+    names = list(presets)
+    matches = dict(zip(names, run_batch(names, judge, max_workers=max_workers)))
+    best = max(names, key=lambda n: _fit(matches[n]))
+    result = dict(matches[best])
+    result["matches"] = matches
+    result["best_preset"] = best
+    result["metrics"] = trace.to_dict()
+    return result
+
+# --- Agent 1 打包提取：多份短简历合并为一次请求 ---
+PACK_TOKEN_BUDGET = 6000  # 单个打包请求中简历部分的 token 上限
+PACK_MAX_RESUMES = 8
+PACK_MAX_RESUME_TOKENS = 1500  # 超过该长度的简历不打包，仍单独提取
+
+def _lower_keys(d: dict) -> dict:
+    return {str(k).lower().replace(" ", "_"): v for k, v in d.items()}
+
+def facts_match_resume(facts: dict, resume_text: str) -> bool:
+    """校验打包返回的记录确实来自这份简历：提取出的邮箱或姓名必须出现在原文中"""
+    f = _lower_keys(facts)
+    text = resume_text.lower()
+    email = str(f.get("email") or "").strip().lower()
+    if email and email in text:
+        return True
+    name = str(f.get("name") or "").strip().lower()
+    return bool(name) and all(part in text for part in name.split())
+
+def pack_resumes(resume_texts: list, budget: int = PACK_TOKEN_BUDGET, max_per_pack: int = PACK_MAX_RESUMES) -> tuple:
+    """按顺序把短简历装箱，返回 (packs: [[下标]], singles: [下标])"""
+    packs, singles, current, used = [], [], [], 0
+    for i, text in enumerate(resume_texts):
+        cost = estimate_tokens(text)
+        if cost > PACK_MAX_RESUME_TOKENS:
+            singles.append(i)
+            continue
+        if current and (used + cost > budget or len(current) >= max_per_pack):
+            packs.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += cost
+    if current:
+        packs.append(current)
+    # 只有一份的包没有意义，按单份处理
+    singles.extend(p[0] for p in packs if len(p) == 1)
+    return [p for p in packs if len(p) > 1], sorted(singles)
+
+def extract_facts_packed(resume_texts: list, backend=None) -> tuple:
+    """
+    一次请求提取多份 (已压缩的) 简历。返回 (每份简历的 facts 或 None, span)：
+    返回记录按 cv_id 对应输入，缺失、重复或校验不通过的位置为 None，由调用方回退单独提取。
+    """
+    backend = backend or get_backend()
+    blocks = "\n".join(f'<CV id="r{i}">\n{text}\n</CV>' for i, text in enumerate(resume_texts))
+    prompt = f"""
+    ROLE: Data Extraction Specialist.
+    TASK: Extract data from EACH of the {len(resume_texts)} CVs below. Never mix information between CVs.
+    CRITICAL STEP - LANGUAGE DETECTION: Determine `language_preference` ("Chinese" or "English") per CV.
+    {blocks}
+
+    OUTPUT: JSON array with exactly one object per CV. Each object MUST contain "cv_id" (the id attribute of its CV tag) and:
+    1. Name
+    2. Email
+    3. language_preference
+    4. Education
+    5. Total Years of Experience
+    6. List of Hard Skills / Core Competencies
+    7. Top 3 Papers (Title + Journal) or Key Projects
+
+    OUTPUT: JSON only.
+    """
+    span = {"prompt_tokens": 0, "response_tokens": 0, "retries": 0}
+    data, _ = parse_json_lenient(_generate(backend, prompt, "agent1_packed", json_mode=True, span=span))
+    if isinstance(data, dict):  # 偶尔包了一层 {"cvs": [...]}
+        data = next((v for v in data.values() if isinstance(v, list)), [])
+
+    by_id = {}
+    for item in data if isinstance(data, list) else []:
+        if not isinstance(item, dict):
+            continue
+        cv_id = str(_lower_keys(item).get("cv_id", ""))
+        by_id[cv_id] = None if cv_id in by_id else item  # 重复 id 视为不可信
+    facts = []
+    for i, text in enumerate(resume_texts):
+        item = by_id.get(f"r{i}")
+        if item is not None:
+            item = {k: v for k, v in item.items() if str(k).lower() != "cv_id"}
+            if not facts_match_resume(item, text):
+                item = None
+            else:
+                item, invalid = validate(item, AGENT1_SCHEMA)
+                fill_defaults(item, AGENT1_SCHEMA, invalid)
+        facts.append(item)
+    return facts, span
+
+def prefetch_agent1_packed(resume_texts: list, role_type: str, cache=None, backend=None, max_workers: int = DEFAULT_CONCURRENCY) -> list:
+    """
+    批量分析前的 Agent 1 打包预取 (适合 RA / 行政等短简历)。
+    返回与输入等长的列表：成功的位置为 analyze_batch_candidate 的 prefetched 参数，
+    其余 (长简历、已缓存、打包校验失败) 为 None，照常单独走 Agent 1。成功的结果同时写入 Agent 1 缓存。
+    """
+    backend = backend or get_backend()
+    compressed = [compress_resume(t, role_type)[0] for t in resume_texts]
+    keys = [cache.make_key("agent1", PROMPT_VERSIONS["agent1"], backend.model_name, [t]) if cache else None for t in compressed]
+    todo = [i for i in range(len(compressed)) if not (cache and cache.contains(keys[i]))]
+    packs, _ = pack_resumes([compressed[i] for i in todo])
+    packs = [[todo[j] for j in p] for p in packs]
+
+    prefetched = [None] * len(resume_texts)
+
+    def run_pack(pack):
+        t0 = time.perf_counter()
+        facts, span = extract_facts_packed([compressed[i] for i in pack], backend)
+        return facts, span, time.perf_counter() - t0
+
+    for pack, res in zip(packs, run_batch(packs, run_pack, max_workers=max_workers)):
+        if not isinstance(res, tuple):  # 整包失败 (error_result)，全部回退
+            continue
+        facts, span, seconds = res
+        n = len(pack)
+        for i, f in zip(pack, facts):
+            if f is None:
+                continue
+            prefetched[i] = {"facts": f, "seconds": seconds / n, "prompt_tokens": span["prompt_tokens"] // n,
+                             "response_tokens": span["response_tokens"] // n, "retries": span["retries"], "pack_size": n}
+            if cache:
+                cache.set(keys[i], "agent1", PROMPT_VERSIONS["agent1"], f)
+    return prefetched
 
 # --- 【核心修复】智能邮件生成器 (防占位符版) ---
-def generate_recruitment_email(candidate_data: dict, sender_info: dict, role_type: str) -> str:
-    model = genai.GenerativeModel('gemini-2.0-flash')
+# 占位符关键词 -> 可以直接填入的真实信息
+# 占位符整体匹配 (去掉 "insert" / "请填写" 等前缀后)，按顺序判断：单位和候选人先于泛指的 "name"
+_PLACEHOLDER_PATTERNS = [
+    (r"(your |the |our )?(company|organi[sz]ation|institution|institute|university|hospital|school|lab|org)( name)?"
+     r"|(贵|我|我们的?)?(单位|机构|公司|学校|医院|大学)(名称|名字)?", "org"),
+    (r"(the )?(candidate|recipient|applicant)('s)?( full)?( name)?|name of (the )?(candidate|recipient)"
+     r"|候选人(姓名|名字)?|收件人(姓名|名字)?|对方(姓名|名字)", "candidate"),
+    (r"(the )?(position|job title|job|role|vacancy|opening)( name| title)?|position title"
+     r"|职位(名称)?|岗位(名称)?|招聘岗位", "role"),
+    (r"(your |sender('s)? )?(title|job position)|头衔|职务|职称|(你|我|发信人)的?(头衔|职务|职称)", "title"),
+    (r"(your|sender('s)?|my) (full )?name|sender|signature|署名|(你|我|发信人)的?(姓名|名字)|发信人", "name"),
+]
+_GENERIC_NAME_RE = re.compile(r"(full )?name|姓名|名字")
+_GREETING_RE = re.compile(r"(hi|hello|dear|尊敬的|亲爱的|您好)[\s,，]*$", re.I)
+_PLACEHOLDER_PREFIX_RE = re.compile(r"^(insert|enter|add|fill in)\s+|^请?(填写|填入|输入)")
+_BRACKET_RE = re.compile(r"\[([^\[\]\n]{0,80})\]")
+
+def _placeholder_field(inner: str, before: str) -> str:
+    """占位符对应的字段 (org / candidate / role / title / name)，无法确定时返回 None。before 为同一行中占位符之前的文字"""
+    inner = _PLACEHOLDER_PREFIX_RE.sub("", inner.strip().lower()).strip(" :：")
+    for pattern, field in _PLACEHOLDER_PATTERNS:
+        if re.fullmatch(pattern, inner):
+            return field
+    if _GENERIC_NAME_RE.fullmatch(inner):
+        # 泛指的 [Name] / [姓名]：问候语之后是候选人，单独成行 (署名) 是发信人，其余位置无法判断
+        if _GREETING_RE.search(before):
+            return "candidate"
+        if not before.strip():
+            return "name"
+    return None
+
+def repair_placeholders(draft: str, sender_info: dict, candidate_name: str = "", role_type: str = "") -> tuple:
+    """
+    本地修复草稿中的 [xxx] 占位符：能确定含义的填入候选人 / 岗位 / 发信人信息。
+    无法识别 (如日期、时间) 或没有对应值的占位符保留原样，此时返回的是否成功为 False，由调用方回退到 LLM 清洗。
+    返回 (修复后文本, 是否修复成功)。
+    """
+    values = {"candidate": candidate_name, "role": re.sub(r"^[^\w(（]+", "", role_type or "").strip(),
+              **{k: sender_info.get(k, "") for k in ("name", "title", "org")}}
+
+    def fill(match):
+        line_start = match.string.rfind("\n", 0, match.start()) + 1
+        field = _placeholder_field(match.group(1), match.string[line_start:match.start()])
+        return values.get(field) or match.group(0)
+
+    text = _BRACKET_RE.sub(fill, draft)
+    text = re.sub(r"[ \t]+([,，.。!！?？;；:：])", r"\1", text)
+    text = re.sub(r"[ \t]{2,}", " ", text)
+    text = "\n".join(line.rstrip() for line in text.splitlines())
+    text = re.sub(r"\n{3,}", "\n\n", text).strip()
+    return text, "[" not in text and "]" not in text
+
+def generate_recruitment_email(candidate_data: dict, sender_info: dict, role_type: str, backend=None, cache=None) -> str:
+    backend = backend or get_backend()
     
     lang = candidate_data.get('language_preference', 'Chinese')
     
@@ -172,36 +538,49 @@ def generate_recruitment_email(candidate_data: dict, sender_info: dict, role_typ
         Output: Body text only.
         """
 
-    # 3. 生成初稿
-    draft = model.generate_content(draft_prompt).text
-    
-    # 4. 二次清洗 (Regenerate if placeholders exist)
-    # 如果发现 AI 还是不听话留了括号，强制清洗
-    if "[" in draft or "]" in draft:
-        fix_prompt = f"""
-        Fix this email immediately. Remove ANY text inside brackets [] and the brackets themselves.
-        Make the text flow smoothly without them.
-        
-        Original:
-        {draft}
-        """
-        draft = model.generate_content(fix_prompt).text
+    def write_draft():
+        # 3. 生成初稿
+        draft = _generate(backend, draft_prompt, "email")
+
+        # 4. 二次清洗：先在本地修复占位符，只有修复失败 (括号不成对等) 才再调用一次 LLM
+        if "[" in draft or "]" in draft:
+            draft, ok = repair_placeholders(draft, sender_info, candidate_data.get('name', ''), role_type)
+            if not ok:
+                fix_prompt = f"""
+                Fix this email immediately. Remove ANY text inside brackets [] and the brackets themselves.
+                Make the text flow smoothly without them.
+                
+                Original:
+                {draft}
+                """
+                draft = _generate(backend, fix_prompt, "email_fix")
+        return draft
 
-    return draft
+    # 缓存键：候选人、完整的发信人信息 (英文 prompt 不含职称，但本地修复占位符会用到)、岗位和语言，
+    # 重新打开候选人时不再重新生成
+    candidate_key = {k: candidate_data.get(k) for k in ("name", "email")}
+    return _cached_stage(cache, backend, "email", [draft_prompt, candidate_key, sender_info, role_type, lang], write_draft)
 
-def send_real_email(sender_email, sender_password, recipient_email, subject, body):
+def draft_emails_batch(candidates: list, sender_info: dict, cache=None, backend=None, max_workers: int = DEFAULT_CONCURRENCY, on_done=None) -> list:
+    """
+    并发为多个候选人生成邮件草稿，返回与 candidates 顺序一致的 {"draft", "error"} 列表。
+    单个失败不影响其他人；on_done 同 batch_engine.run_batch。
+    """
+    def worker(cand):
+        try:
+            return {"draft": generate_recruitment_email(cand, sender_info, cand.get('role_type', 'Role'), backend=backend, cache=cache), "error": None}
+        except Exception as e:
+            return {"draft": None, "error": f"{type(e).__name__}: {e}"}
+
+    results = run_batch(candidates, worker, max_workers=max_workers, on_done=on_done)
+    # 超时等情况 run_batch 会返回 error_result 结构，统一成草稿结构
+    return [r if "draft" in r else {"draft": None, "error": r.get("summary")} for r in results]
+
+def send_real_email(sender_email, sender_password, recipient_email, subject, body, host=SMTP_HOST, port=SMTP_PORT, use_tls=True):
     try:
-        message = MIMEMultipart()
-        message['From'] = sender_email
-        message['To'] = recipient_email
-        message['Subject'] = subject
-        message.attach(MIMEText(body, 'plain'))
-        session = smtplib.SMTP('smtp.gmail.com', 587) 
-        session.starttls()
-        session.login(sender_email, sender_password) 
-        session.sendmail(sender_email, recipient_email, message.as_string())
+        session = open_session(sender_email, sender_password, host, port, use_tls)
+        session.sendmail(sender_email, recipient_email, build_message(sender_email, recipient_email, subject, body).as_string())
         session.quit()
         return True, "发送成功"
     except Exception as e:
         return False, f"发送失败: {str(e)}"
-